@@ -0,0 +1,343 @@
+"""
+自适应预算分配：按卡片对变体跑 Thompson 采样（贝叶斯多臂老虎机），与均匀分配对比省下的预算。
+
+- 后验：IPM 目标用 Beta（每曝光安装率），CPI 目标用 Gamma（每美元安装数，CPI = 1/λ）
+- 每轮一次性批量抽 S 个后验样本，按「各变体为最优的概率」分本轮预算（含最低份额保底探索）
+- 停止：领先变体为最优的概率 ≥ stop_prob_best，或相对期望损失 ≤ stop_expected_loss，或预算轮数用尽
+- 环境：simulate_metrics 产出的 installs/impressions、spend/impressions 作为各变体真实率，每轮按 Poisson 回放
+- 均匀分配使用同一停止规则，二者花费之差即自适应分配节省的预算
+"""
+from __future__ import annotations
+
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Literal, Sequence
+
+from pydantic import BaseModel, Field
+
+from rng_streams import seeded
+
+Objective = Literal["cpi", "ipm"]
+Policy = Literal["thompson", "uniform"]
+
+
+# -------- 配置 --------
+
+
+@dataclass
+class BanditConfig:
+    """单卡分配参数（金额单位 USD）"""
+
+    objective: Objective = "cpi"
+    round_budget: float = 1000.0
+    max_rounds: int = 40
+    warmup_rounds: int = 1  # 前若干轮均匀分配，避免先验主导
+    min_share: float = 0.02  # 每臂每轮最低份额（保底探索）
+    posterior_samples: int = 48
+    stop_prob_best: float = 0.95
+    stop_expected_loss: float = 0.01  # 相对期望损失阈值（相对领先者目标值）
+    # 弱先验：IPM≈20（Beta），CPI≈3（Gamma）
+    prior_installs: float = 1.0
+    prior_impressions: float = 50.0
+    prior_spend: float = 3.0
+
+
+# -------- 输出模型 --------
+
+
+class CardAllocationResult(BaseModel):
+    """单卡单策略的分配结果"""
+
+    card_id: str = Field(..., description="卡片 ID")
+    policy: str = Field(..., description="thompson / uniform")
+    rounds: int = Field(..., description="实际投放轮数")
+    spend: float = Field(..., description="总花费")
+    installs: int = Field(..., description="总安装")
+    chosen_variant: str = Field(..., description="停止时判定的最优变体")
+    true_best_variant: str = Field(..., description="环境中真实最优变体")
+    correct: bool = Field(..., description="判定是否正确")
+    prob_best: float = Field(..., description="停止时领先变体为最优的后验概率")
+    regret_installs: float = Field(..., description="同样花费全投真实最优变体的期望安装 - 实际期望安装")
+    spend_by_variant: dict[str, float] = Field(default_factory=dict, description="各变体花费")
+    stopped_early: bool = Field(default=False, description="是否因置信达标提前停止")
+
+
+class AllocationBenchmark(BaseModel):
+    """多卡汇总：Thompson vs 均匀分配"""
+
+    n_cards: int = 0
+    objective: str = "cpi"
+    thompson_spend: float = 0.0
+    uniform_spend: float = 0.0
+    budget_saved: float = Field(0.0, description="uniform_spend - thompson_spend")
+    budget_saved_pct: float = Field(0.0, description="budget_saved / uniform_spend")
+    thompson_correct_rate: float = 0.0
+    uniform_correct_rate: float = 0.0
+    thompson_avg_rounds: float = 0.0
+    uniform_avg_rounds: float = 0.0
+    thompson_regret_installs: float = 0.0
+    uniform_regret_installs: float = 0.0
+    elapsed_ms: float = 0.0
+    cards: list[CardAllocationResult] = Field(default_factory=list, description="keep_cards=True 时保留逐卡结果")
+
+
+# -------- 环境 --------
+
+
+@dataclass(frozen=True)
+class ArmEnv:
+    """单变体真实率：每曝光安装率、千次曝光成本"""
+
+    variant_id: str
+    install_rate: float
+    cpm: float
+
+    @property
+    def installs_per_dollar(self) -> float:
+        return self.install_rate * 1000.0 / self.cpm if self.cpm > 0 else 0.0
+
+    def value(self, objective: Objective) -> float:
+        """目标值（越大越好）：CPI 目标为每美元安装数，IPM 目标为每曝光安装率"""
+        return self.installs_per_dollar if objective == "cpi" else self.install_rate
+
+
+def arms_from_metrics(metrics: Iterable[Any], *, os: str | None = "Android") -> list[ArmEnv]:
+    """SimulatedMetrics → ArmEnv（同一变体多行时取 os 行，os=None 时合并双端）"""
+    acc: dict[str, list[float]] = {}
+    for m in metrics:
+        if os is not None and getattr(m, "os", os) != os:
+            continue
+        a = acc.setdefault(m.variant_id, [0.0, 0.0, 0.0])
+        a[0] += m.impressions
+        a[1] += m.installs
+        a[2] += m.spend
+    return [
+        ArmEnv(variant_id=vid, install_rate=inst / imp, cpm=spend / imp * 1000.0)
+        for vid, (imp, inst, spend) in acc.items()
+        if imp > 0
+    ]
+
+
+def _poisson(lam: float, rng: random.Random) -> int:
+    """Poisson 抽样：小均值用乘法法，大均值用正态近似"""
+    if lam <= 0:
+        return 0
+    if lam < 30:
+        limit, k, p = math.exp(-lam), 0, rng.random()
+        while p > limit:
+            k += 1
+            p *= rng.random()
+        return k
+    return max(0, int(round(rng.gauss(lam, math.sqrt(lam)))))
+
+
+# -------- 后验抽样 --------
+
+
+def _gamma_sample(shape: float, rate: float, rng: random.Random) -> float:
+    """Gamma(shape, rate)；shape 较大时用 Wilson–Hilferty 近似（一次正态抽样）"""
+    if shape < 20:
+        return rng.gammavariate(shape, 1.0 / rate)
+    c = 1.0 / (9.0 * shape)
+    t = 1.0 - c + rng.gauss(0.0, 1.0) * math.sqrt(c)
+    return shape / rate * max(t, 0.0) ** 3
+
+
+def _beta_sample(a: float, b: float, rng: random.Random) -> float:
+    """Beta(a, b)；计数较大时用正态近似"""
+    if a < 20 or b < 20:
+        return rng.betavariate(a, b)
+    n = a + b
+    mean = a / n
+    sd = math.sqrt(mean * (1.0 - mean) / (n + 1.0))
+    return min(1.0, max(0.0, rng.gauss(mean, sd)))
+
+
+def posterior_draws(
+    installs: Sequence[float],
+    exposure: Sequence[float],
+    *,
+    objective: Objective,
+    config: BanditConfig,
+    rng: random.Random,
+) -> list[list[float]]:
+    """
+    批量后验抽样，返回 [S][K]。
+    exposure：CPI 目标为花费（Gamma 率参数），IPM 目标为曝光数（Beta 失败数 = 曝光 - 安装）。
+    """
+    S = config.posterior_samples
+    if objective == "cpi":
+        params = [(config.prior_installs + i, config.prior_spend + e) for i, e in zip(installs, exposure)]
+        return [[_gamma_sample(a, b, rng) for a, b in params] for _ in range(S)]
+    params = [
+        (config.prior_installs + i, config.prior_impressions + max(0.0, e - i))
+        for i, e in zip(installs, exposure)
+    ]
+    return [[_beta_sample(a, b, rng) for a, b in params] for _ in range(S)]
+
+
+def prob_best_and_loss(draws: list[list[float]]) -> tuple[list[float], int, float]:
+    """
+    由后验样本算：各臂为最优的概率、领先臂、领先臂相对期望损失 E[max θ - θ_leader] / E[θ_leader]
+    """
+    K = len(draws[0]) if draws else 0
+    wins = [0] * K
+    for row in draws:
+        wins[max(range(K), key=row.__getitem__)] += 1
+    S = len(draws)
+    probs = [w / S for w in wins]
+    leader = max(range(K), key=probs.__getitem__)
+    loss = sum(max(row) - row[leader] for row in draws) / S
+    mean_leader = sum(row[leader] for row in draws) / S
+    return probs, leader, (loss / mean_leader if mean_leader > 0 else math.inf)
+
+
+# -------- 单卡模拟 --------
+
+
+def simulate_card_allocation(
+    card_id: str,
+    arms: Sequence[ArmEnv],
+    *,
+    policy: Policy = "thompson",
+    config: BanditConfig | None = None,
+    seed: str = "bandit",
+) -> CardAllocationResult:
+    """按轮回放投放：每轮 round_budget 按策略分给各臂，环境按 Poisson 返回安装，直到停止条件满足"""
+    cfg = config or BanditConfig()
+    K = len(arms)
+    if K == 0:
+        raise ValueError("arms 为空")
+    obj = cfg.objective
+    # 环境噪声与后验抽样用独立流：两种策略面对同一卡的同一组真实率
+    env_rng = seeded(f"{seed}:{card_id}:{policy}:env")
+    ts_rng = seeded(f"{seed}:{card_id}:{policy}:ts")
+
+    spend = [0.0] * K
+    impressions = [0.0] * K
+    installs = [0] * K
+    exp_installs = 0.0
+    shares = [1.0 / K] * K
+    probs, leader, stopped_early, rounds = [1.0 / K] * K, 0, False, 0
+
+    for r in range(cfg.max_rounds):
+        rounds = r + 1
+        for k, arm in enumerate(arms):
+            budget = cfg.round_budget * shares[k]
+            if budget <= 0:
+                continue
+            imp = budget / arm.cpm * 1000.0
+            spend[k] += budget
+            impressions[k] += imp
+            installs[k] += _poisson(imp * arm.install_rate, env_rng)
+            exp_installs += imp * arm.install_rate
+
+        exposure = spend if obj == "cpi" else impressions
+        draws = posterior_draws(installs, exposure, objective=obj, config=cfg, rng=ts_rng)
+        probs, leader, loss = prob_best_and_loss(draws)
+        if rounds > cfg.warmup_rounds and (probs[leader] >= cfg.stop_prob_best or loss <= cfg.stop_expected_loss):
+            stopped_early = True
+            break
+        if policy == "thompson" and rounds >= cfg.warmup_rounds:
+            floor = min(cfg.min_share, 1.0 / K)
+            raw = [max(floor, p) for p in probs]
+            total = sum(raw)
+            shares = [x / total for x in raw]
+
+    values = [a.value(obj) for a in arms]
+    best = max(range(K), key=values.__getitem__)
+    total_spend = sum(spend)
+    best_installs = total_spend / arms[best].cpm * 1000.0 * arms[best].install_rate
+    return CardAllocationResult(
+        card_id=card_id,
+        policy=policy,
+        rounds=rounds,
+        spend=round(total_spend, 2),
+        installs=sum(installs),
+        chosen_variant=arms[leader].variant_id,
+        true_best_variant=arms[best].variant_id,
+        correct=leader == best,
+        prob_best=round(probs[leader], 4),
+        regret_installs=round(max(0.0, best_installs - exp_installs), 2),
+        spend_by_variant={a.variant_id: round(s, 2) for a, s in zip(arms, spend)},
+        stopped_early=stopped_early,
+    )
+
+
+# -------- 多卡对比 --------
+
+
+def benchmark_allocation(
+    cards: Iterable[tuple[str, Sequence[ArmEnv]]],
+    *,
+    config: BanditConfig | None = None,
+    seed: str = "bandit",
+    keep_cards: bool = False,
+) -> AllocationBenchmark:
+    """对每张卡分别跑 Thompson 与均匀分配，汇总花费 / 判定正确率 / 轮数 / regret"""
+    cfg = config or BanditConfig()
+    t0 = time.perf_counter()
+    out = AllocationBenchmark(objective=cfg.objective)
+    kept: list[CardAllocationResult] = []
+    ts_correct = uni_correct = 0
+    ts_rounds = uni_rounds = 0
+    for card_id, arms in cards:
+        if len(arms) < 2:
+            continue
+        ts = simulate_card_allocation(card_id, arms, policy="thompson", config=cfg, seed=seed)
+        uni = simulate_card_allocation(card_id, arms, policy="uniform", config=cfg, seed=seed)
+        out.n_cards += 1
+        out.thompson_spend += ts.spend
+        out.uniform_spend += uni.spend
+        out.thompson_regret_installs += ts.regret_installs
+        out.uniform_regret_installs += uni.regret_installs
+        ts_correct += ts.correct
+        uni_correct += uni.correct
+        ts_rounds += ts.rounds
+        uni_rounds += uni.rounds
+        if keep_cards:
+            kept.extend((ts, uni))
+    if out.n_cards:
+        n = out.n_cards
+        out.thompson_correct_rate = round(ts_correct / n, 4)
+        out.uniform_correct_rate = round(uni_correct / n, 4)
+        out.thompson_avg_rounds = round(ts_rounds / n, 2)
+        out.uniform_avg_rounds = round(uni_rounds / n, 2)
+    out.thompson_spend = round(out.thompson_spend, 2)
+    out.uniform_spend = round(out.uniform_spend, 2)
+    out.thompson_regret_installs = round(out.thompson_regret_installs, 2)
+    out.uniform_regret_installs = round(out.uniform_regret_installs, 2)
+    out.budget_saved = round(out.uniform_spend - out.thompson_spend, 2)
+    out.budget_saved_pct = round(out.budget_saved / out.uniform_spend, 4) if out.uniform_spend > 0 else 0.0
+    out.cards = kept
+    out.elapsed_ms = round((time.perf_counter() - t0) * 1000, 1)
+    return out
+
+
+def benchmark_eval_set(
+    records: Iterable[Any],
+    *,
+    config: BanditConfig | None = None,
+    os: str = "Android",
+    keep_cards: bool = False,
+) -> AllocationBenchmark:
+    """
+    评测集（eval_set_generator.CardEvalRecord）各卡以 simulate_metrics 指标为环境跑对比。
+    直接调 simulate_metrics 不走阶段缓存：一次性基准不应挤占共享 LRU / 写满磁盘层。
+    """
+    from simulate_metrics import simulate_metrics
+
+    def _cards():
+        for rec in records:
+            card = rec.card
+            mb = getattr(card, "motivation_bucket", "") or ""
+            vert = getattr(card, "vertical", "casual_game") or "casual_game"
+            metrics = [
+                simulate_metrics(v, os, baseline=(i == 0), motivation_bucket=mb, vertical=vert)
+                for i, v in enumerate(rec.variants)
+            ]
+            yield card.card_id, arms_from_metrics(metrics, os=os)
+
+    return benchmark_allocation(_cards(), config=config, keep_cards=keep_cards)
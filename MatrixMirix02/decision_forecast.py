@@ -0,0 +1,212 @@
+"""
+样本量 / 决策时间预测：INCONCLUSIVE 时不再只给「n≥6 或 窗口≥3」，而是按当前指标与方差估算
+每个变体还需多少花费、几个窗口才能可信地 PASS / FAIL，以及预计日期。
+
+- 方差（按曝光/安装计数的二项 / 泊松近似）：CTR p(1-p)/imp；IPM ipm²/installs；CPI cpi²/installs（Δ 法）
+- 变体 vs 同 OS baseline：z = d / se；花费放大 k 倍时 se 缩为 se/√k
+  → 单指标所需倍数 k = ((z_α + z_β) / |z|)²（已 |z| ≥ z_α 记 1）
+- Explore Gate 是「≥ min_better_metrics 个指标优于 baseline」：
+  k_PASS = 较优指标中第 min_better 小的 k；k_FAIL = 较差指标中第 (m - min_better + 1) 小的 k；取较小者
+- 所需花费超过 max_spend_multiple × 当前花费 → HOPELESS（差异小于预算内可检出的最小效应，建议停投）
+- 所有变体按列一次算完（列表列式计算，无 numpy 依赖）
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Sequence
+
+from pydantic import BaseModel, Field
+
+from explore_gate import ExploreGateConfig
+from simulate_metrics import SimulatedMetrics
+
+
+# -------- 配置 --------
+
+
+@dataclass
+class ForecastConfig:
+    """预测参数（金额单位 USD）"""
+
+    z_alpha: float = 1.96  # 双侧 95% 置信
+    z_beta: float = 0.84  # 80% 功效（按当前观测效应规划样本）
+    max_spend_multiple: float = 20.0  # 所需花费超过当前 × 倍数 → HOPELESS
+    daily_spend_per_variant: float = 500.0  # 每变体每端日花费
+    window_days: int = 1  # 一个验证窗口的天数
+    min_windows: int = 3  # 与 decision_summary.MIN_WINDOWS 一致
+
+
+# -------- 输出 --------
+
+
+class VariantForecast(BaseModel):
+    """单变体（单端）决策预测"""
+
+    variant_id: str = Field(..., description="变体 ID")
+    os: str = Field(..., description="iOS / Android")
+    spend: float = Field(..., description="当前花费")
+    z_scores: dict[str, float] = Field(default_factory=dict, description="各代理指标相对 baseline 的 z（正=优于 baseline）")
+    direction: str = Field(..., description="DECIDED_PASS / DECIDED_FAIL / PASS / FAIL / HOPELESS：当前已定论或预计走向")
+    spend_multiple: float = Field(..., description="达到可信结论所需花费 / 当前花费；inf 表示无法区分")
+    additional_spend: float = Field(0.0, description="还需追加的花费")
+    days_to_decision: float = Field(0.0, description="按日花费折算的天数")
+
+
+class CardForecast(BaseModel):
+    """整卡决策预测"""
+
+    variants: list[VariantForecast] = Field(default_factory=list, description="逐变体预测，按所需追加花费升序")
+    windows_needed: int = Field(0, description="还需的验证窗口数")
+    additional_spend: float = Field(0.0, description="可决策变体还需追加的总花费（不含 HOPELESS）")
+    days_to_first_decision: float = Field(0.0, description="最快一个变体得出结论的天数（含窗口约束）")
+    days_to_all_decisions: float = Field(0.0, description="全部可决策变体得出结论的天数（含窗口约束）")
+    expected_date: str = Field("", description="全部可决策变体预计得出结论的日期；无可决策变体时为空")
+    hopeless_variants: list[str] = Field(default_factory=list, description="预算内无法定论的变体（建议停投）")
+    closest_variants: list[str] = Field(default_factory=list, description="最接近结论的变体（优先补量）")
+
+
+# -------- 计算 --------
+
+
+def _kth(xs: Sequence[float], k: int) -> float:
+    """第 k 小（1 起）；不足 k 个返回 inf"""
+    if k <= 0:
+        return 1.0
+    return sorted(xs)[k - 1] if len(xs) >= k else math.inf
+
+
+def _metric_columns(ms: Sequence[SimulatedMetrics]) -> dict[str, tuple[list[float], list[float]]]:
+    """每指标的 (值列, 方差列)；方差按「越大越好」的口径"""
+    imp = [max(m.impressions, 1) for m in ms]
+    inst = [max(m.installs, 1) for m in ms]
+    ctr = [m.ctr for m in ms]
+    ipm = [m.ipm for m in ms]
+    cpi = [m.cpi for m in ms]
+    return {
+        "ctr": (ctr, [p * (1.0 - p) / n for p, n in zip(ctr, imp)]),
+        "ipm": (ipm, [x * x / n for x, n in zip(ipm, inst)]),
+        "cpi": ([-x for x in cpi], [x * x / n for x, n in zip(cpi, inst)]),
+    }
+
+
+def forecast_variants(
+    metrics: Sequence[SimulatedMetrics | dict],
+    *,
+    config: ForecastConfig | None = None,
+    gate_config: ExploreGateConfig | None = None,
+) -> list[VariantForecast]:
+    """所有非 baseline 变体（按 OS 对齐 baseline）的决策预测"""
+    cfg = config or ForecastConfig()
+    gcfg = gate_config or ExploreGateConfig()
+    ms = [SimulatedMetrics.model_validate(m) if isinstance(m, dict) else m for m in metrics]
+    baseline_by_os = {m.os: m for m in ms if m.baseline}
+    variants = [m for m in ms if not m.baseline and m.os in baseline_by_os]
+    if not variants:
+        return []
+    baselines = [baseline_by_os[m.os] for m in variants]
+
+    names = [k for k in ("ctr", "ipm", "cpi") if k in gcfg.proxy_metrics] or ["ctr", "ipm", "cpi"]
+    v_cols = _metric_columns(variants)
+    b_cols = _metric_columns(baselines)
+    z_cols: dict[str, list[float]] = {}
+    for name in names:
+        (vv, vs), (bv, bs) = v_cols[name], b_cols[name]
+        z_cols[name] = [(a - b) / math.sqrt(sa + sb) if sa + sb > 0 else 0.0 for a, b, sa, sb in zip(vv, bv, vs, bs)]
+
+    z_target = cfg.z_alpha + cfg.z_beta
+    n_metrics = len(names)
+    need_pass = min(gcfg.min_better_metrics, n_metrics)
+    need_fail = n_metrics - need_pass + 1
+    out: list[VariantForecast] = []
+    for i, m in enumerate(variants):
+        zs = [z_cols[name][i] for name in names]
+        ks = [1.0 if abs(z) >= cfg.z_alpha else ((z_target / abs(z)) ** 2 if z else math.inf) for z in zs]
+        k_pass = _kth([k for z, k in zip(zs, ks) if z > 0], need_pass)
+        k_fail = _kth([k for z, k in zip(zs, ks) if z <= 0], need_fail)
+        k = min(k_pass, k_fail)
+        spend = max(m.spend, 1e-9)
+        required = max(gcfg.min_spend, spend * k) if math.isfinite(k) else math.inf
+        extra = max(0.0, required - m.spend)
+        if k > cfg.max_spend_multiple:
+            direction = "HOPELESS"
+        elif extra <= 0.0 and k <= 1.0:
+            direction = "DECIDED_PASS" if k_pass <= k_fail else "DECIDED_FAIL"
+        else:
+            direction = "PASS" if k_pass <= k_fail else "FAIL"
+        hopeless = direction == "HOPELESS"
+        out.append(VariantForecast(
+            variant_id=m.variant_id,
+            os=m.os,
+            spend=round(m.spend, 2),
+            z_scores={name: round(z, 3) for name, z in zip(names, zs)},
+            direction=direction,
+            spend_multiple=round(k, 3) if math.isfinite(k) else math.inf,
+            additional_spend=0.0 if hopeless else round(extra, 2),
+            days_to_decision=0.0 if hopeless else round(extra / cfg.daily_spend_per_variant, 2),
+        ))
+    out.sort(key=lambda f: (f.direction == "HOPELESS", f.additional_spend))
+    return out
+
+
+def forecast_card(
+    metrics: Sequence[SimulatedMetrics | dict],
+    *,
+    n_windows: int = 0,
+    config: ForecastConfig | None = None,
+    gate_config: ExploreGateConfig | None = None,
+    today: date | None = None,
+) -> CardForecast:
+    """
+    整卡预测：变体预测 + 验证窗口约束（还差 min_windows - n_windows 个窗口）。
+    天数取「花费折算天数」与「窗口天数」的较大者。
+    """
+    cfg = config or ForecastConfig()
+    rows = forecast_variants(metrics, config=cfg, gate_config=gate_config)
+    windows_needed = max(0, cfg.min_windows - n_windows)
+    window_days = float(windows_needed * cfg.window_days)
+    live = [f for f in rows if f.direction != "HOPELESS"]
+    # 全部 HOPELESS 时预算内不会有结论，不给天数 / 日期
+    first = max(window_days, min(f.days_to_decision for f in live)) if live else 0.0
+    all_days = max(window_days, max(f.days_to_decision for f in live)) if live else 0.0
+    pending = [f for f in live if not f.direction.startswith("DECIDED")]
+    closest = [f"{f.variant_id}({f.os})" for f in pending[:3]]
+    return CardForecast(
+        variants=rows,
+        windows_needed=windows_needed,
+        additional_spend=round(sum(f.additional_spend for f in live), 2),
+        days_to_first_decision=round(first, 2),
+        days_to_all_decisions=round(all_days, 2),
+        expected_date=((today or date.today()) + timedelta(days=math.ceil(all_days))).isoformat() if live else "",
+        hopeless_variants=[f"{f.variant_id}({f.os})" for f in rows if f.direction == "HOPELESS"],
+        closest_variants=closest,
+    )
+
+
+def forecast_hint(fc: CardForecast, *, insufficient: bool = False) -> str:
+    """
+    一句话：还需多少花费 / 窗口、预计日期、建议停投的变体。
+    insufficient=True：整卡仍样本不足（变体数 / 窗口未达门槛），此时不说「已可下结论」。
+    """
+    n_hopeless = len(fc.hopeless_variants)
+    if not fc.expected_date:
+        if not n_hopeless:
+            return ""
+        return f"全部 {n_hopeless} 个变体预算内无法区分，预算内无法下结论，建议停投"
+    parts = []
+    if fc.additional_spend > 0:
+        parts.append(f"再投约 ${fc.additional_spend:,.0f}")
+    if fc.windows_needed:
+        parts.append(f"再跑 {fc.windows_needed} 个窗口")
+    if parts:
+        text = f"{'、'.join(parts)}，预计 {fc.expected_date} 可下结论（约 {math.ceil(fc.days_to_all_decisions)} 天）"
+    elif insufficient:
+        text = "变体间差异已可区分，但参与比较的变体数未达门槛，补足变体后再下结论"
+    else:
+        text = "当前样本已可下结论"
+    if fc.closest_variants:
+        text += f"；优先补量 {', '.join(fc.closest_variants)}"
+    if n_hopeless:
+        text += f"；{n_hopeless} 个变体预算内无法区分，建议停投"
+    return text
@@ -2,6 +2,7 @@
 30 秒决策结论：综合 iOS/Android Explore + Validate 状态。
 无 Streamlit 依赖，可单独测试。
 使用 diagnosis 模块输出 next_action，替代泛泛的「复测」。
+样本不足时用 decision_forecast 估算还需花费 / 窗口与预计日期，替代静态门槛提示。
 
 【门禁 ≠ 结论】
 - 样本不足 → 不下结论（仅提示补足数据）
@@ -11,7 +12,7 @@
 
 from __future__ import annotations
 
-from diagnosis import diagnose, diagnosis_to_next_action
+from diagnosis import DiagnosisResult, diagnose, diagnosis_to_next_action
 
 MIN_SAMPLES = 6
 MIN_WINDOWS = 3
@@ -19,10 +20,23 @@ IPM_CV_THRESHOLD_FOR_SCALE = 0.05
 DEFAULT_SCALE_UP_STEP = "20%"
 
 
+def _card_forecast(metrics: list, n_windows: int, *, insufficient: bool):
+    """决策预测（decision_forecast 不在路径上时跳过）"""
+    try:
+        from decision_forecast import forecast_card, forecast_hint
+    except ImportError:
+        return None, ""
+    if not any(m.baseline for m in metrics):
+        return None, ""
+    fc = forecast_card(metrics, n_windows=n_windows)
+    return fc, forecast_hint(fc, insufficient=insufficient)
+
+
 def compute_decision_summary(results: dict) -> dict:
     """
     30 秒决策结论：综合 iOS/Android Explore + Validate 状态。
-    返回: status(red/yellow/green), status_text, reason, risk, next_step, insufficient, diagnosis
+    results 可带 "diagnosis"（DiagnosisResult），存在时直接复用。
+    返回: status(red/yellow/green), status_text, reason, risk, next_step, insufficient, diagnosis, forecast
     """
     explore_ios = results.get("explore_ios")
     explore_android = results.get("explore_android")
@@ -64,13 +78,17 @@ def compute_decision_summary(results: dict) -> dict:
     risk_str = "；".join(risk_parts) if risk_parts else "暂无显著风险"
 
     # 诊断：failure_type, primary_signal, recommended_actions + 人话字段
-    diag = diagnose(
-        explore_ios=explore_ios,
-        explore_android=explore_android,
-        validate_result=validate_result,
-        metrics=metrics,
-    )
+    # 上游已诊断（results["diagnosis"]）时直接复用，避免同一张卡诊断两次
+    diag = results.get("diagnosis")
+    if not isinstance(diag, DiagnosisResult):
+        diag = diagnose(
+            explore_ios=explore_ios,
+            explore_android=explore_android,
+            validate_result=validate_result,
+            metrics=metrics,
+        )
     next_action = diagnosis_to_next_action(diag)
+    forecast, forecast_text = _card_forecast(metrics, n_windows, insufficient=insufficient)
 
     # 状态与下一步（使用 diagnosis 处方）
     # ✅额外：把 decision_state 放到 status_text 的语义里（让第一屏更像“决策系统”）
@@ -81,7 +99,7 @@ def compute_decision_summary(results: dict) -> dict:
     elif diag.decision_state == "INSUFFICIENT_DATA":
         status = "yellow"
         status_text = f"🟡 样本不足：继续跑({scale_up_step})"
-        next_step = next_action
+        next_step = f"{next_action}：{forecast_text}" if forecast_text else next_action
         reason_str += f"（{diag.detail}）"
     elif diag.decision_state in ("FIX_HANDOFF", "OS_TUNE", "CHANGE_STRUCTURE", "CHANGE_QUALITY", "REVIEW"):
         # 只要不是 READY_TO_SCALE / INSUFFICIENT_DATA，默认都不建议放量（红/黄由 val_pass 决定）
@@ -123,8 +141,9 @@ def compute_decision_summary(results: dict) -> dict:
             "decision_state": diag.decision_state,
             "diagnosis_title": diag.diagnosis_title,
             "diagnosis_explanation": list(diag.diagnosis_explanation or []),
-            "action_hint": diag.action_hint,
+            "action_hint": forecast_text if diag.failure_type == "INCONCLUSIVE" and forecast_text else diag.action_hint,
             "recommended_actions": actions_ser,
             "detail": diag.detail,
         },
+        "forecast": forecast.model_dump() if forecast is not None else None,
     }
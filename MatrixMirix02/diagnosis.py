@@ -11,7 +11,8 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any
+from functools import lru_cache
+from typing import Any, Iterable
 
 # -------- 枚举（与 spec 对齐）--------
 
@@ -78,22 +79,107 @@ class DiagnosisResult:
     action_hint: str = ""
 
 
+@dataclass(frozen=True)
+class DiagnosisSignals:
+    """
+    诊断输入信号：从 gate 输出一次性提取的结构化标志位。
+    diagnose / diagnose_batch 都只读这些字段，不再扫描 risk_notes 文案。
+    """
+
+    n_samples: int = 0
+    n_windows: int = 0
+    explore_ios_pass: bool = False
+    explore_android_pass: bool = False
+    validate_pass: bool = False
+    cpi_spike: bool = False       # CPI 回撤 / 抬升
+    ipm_drawdown: bool = False    # IPM 回撤
+    roas_mismatch: bool = False   # early_event 与 early_ROAS 方向不一致（质量存疑）
+    ipm_drop_pct: float = 0.0
+    cpi_increase_pct: float = 0.0
+    ipm_cv: float = 0.0
+
+    def decision_key(self) -> tuple:
+        """决定 failure_type / primary_signal 的离散键（批量诊断按此去重）"""
+        return (
+            self.n_samples < MIN_SAMPLES or self.n_windows < MIN_WINDOWS,
+            self.explore_ios_pass,
+            self.explore_android_pass,
+            self.validate_pass,
+            self.cpi_spike,
+            self.ipm_drawdown,
+            self.roas_mismatch,
+            self.ipm_drop_pct > 20,
+            self.cpi_increase_pct > 15,
+            self.ipm_cv < 0.05,
+        )
+
+
+def _get(obj: Any, name: str, default: Any = None) -> Any:
+    """兼容 pydantic 对象与 dict（JSON 反序列化的 gate 输出）"""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _flags_from_risk_notes(risk_notes: list[str]) -> dict[str, bool]:
+    """兼容旧 validate 结果（无 signal_flags）：按 risk_notes 文案推断信号"""
+    return {
+        "cpi_spike": any("CPI" in n for n in risk_notes),
+        "ipm_drawdown": any("IPM" in n and "回撤" in n for n in risk_notes),
+        "roas_mismatch": any("ROAS" in n or "转化" in n or "early" in n.lower() for n in risk_notes),
+    }
+
+
+def extract_signals(
+    *,
+    explore_ios: Any = None,
+    explore_android: Any = None,
+    validate_result: Any = None,
+    metrics: list[Any] | None = None,
+    n_samples: int | None = None,
+) -> DiagnosisSignals:
+    """
+    从 gate 输出提取诊断信号。
+    - n_samples：优先用传入值；否则数 metrics 中非 baseline 行（与单卡 diagnose 口径一致）
+    - 风险信号：优先读 validate_result.signal_flags；旧结果回退到 risk_notes 文案
+    """
+    if n_samples is None:
+        n_samples = len([m for m in (metrics or []) if not _get(m, "baseline", False)])
+    detail_rows = _get(validate_result, "detail_rows", None) or []
+    sm = _get(validate_result, "stability_metrics", None)
+    flags = _get(validate_result, "signal_flags", None)
+    if not flags:
+        flags = _flags_from_risk_notes(list(_get(validate_result, "risk_notes", None) or []))
+    return DiagnosisSignals(
+        n_samples=n_samples,
+        n_windows=len(detail_rows),
+        explore_ios_pass=_get(explore_ios, "gate_status", "") == "PASS",
+        explore_android_pass=_get(explore_android, "gate_status", "") == "PASS",
+        validate_pass=_get(validate_result, "validate_status", "") == "PASS",
+        cpi_spike=bool(flags.get("cpi_spike")),
+        ipm_drawdown=bool(flags.get("ipm_drawdown")),
+        roas_mismatch=bool(flags.get("roas_mismatch")),
+        ipm_drop_pct=_get(sm, "ipm_drop_pct", 0) or 0,
+        cpi_increase_pct=_get(sm, "cpi_increase_pct", 0) or 0,
+        ipm_cv=_get(sm, "ipm_cv", 0) or 0,
+    )
+
+
+_DECISION_STATE_BY_FAILURE = {
+    "": "READY_TO_SCALE",
+    "INCONCLUSIVE": "INSUFFICIENT_DATA",
+    "OS_DIVERGENCE": "OS_TUNE",
+    "HANDOFF_MISMATCH": "FIX_HANDOFF",
+    "EFFICIENCY_FAIL": "CHANGE_STRUCTURE",
+    "QUALITY_FAIL": "CHANGE_QUALITY",
+    "MIXED_SIGNALS": "REVIEW",
+}
+
+
 def _compute_decision_state(d: DiagnosisResult) -> str:
-    if not d.failure_type:
-        return "READY_TO_SCALE"
-    if d.failure_type == "INCONCLUSIVE":
-        return "INSUFFICIENT_DATA"
-    if d.failure_type == "OS_DIVERGENCE":
-        return "OS_TUNE"
-    if d.failure_type == "HANDOFF_MISMATCH":
-        return "FIX_HANDOFF"
-    if d.failure_type == "EFFICIENCY_FAIL":
-        return "CHANGE_STRUCTURE"
-    if d.failure_type == "QUALITY_FAIL":
-        return "CHANGE_QUALITY"
-    if d.failure_type == "MIXED_SIGNALS":
-        return "REVIEW"
-    return "REVIEW"
+    return _DECISION_STATE_BY_FAILURE.get(d.failure_type or "", "REVIEW")
 
 
 def _enrich_diagnosis_text(d: DiagnosisResult) -> DiagnosisResult:
@@ -168,22 +254,22 @@ def diagnose(
     Step 3: 承接断裂 → HANDOFF_MISMATCH
     Step 4: 混合信号 → MIXED_SIGNALS
     """
-    metrics = metrics or []
-    n_samples = len([m for m in metrics if not getattr(m, "baseline", False)])
-    detail_rows = getattr(validate_result, "detail_rows", None) or []
-    n_windows = len(detail_rows)
-
-    exp_ios_pass = (
-        getattr(explore_ios, "gate_status", "") == "PASS" if explore_ios else False
-    )
-    exp_android_pass = (
-        getattr(explore_android, "gate_status", "") == "PASS" if explore_android else False
-    )
-    val_pass = (
-        getattr(validate_result, "validate_status", "") == "PASS" if validate_result else False
+    signals = extract_signals(
+        explore_ios=explore_ios,
+        explore_android=explore_android,
+        validate_result=validate_result,
+        metrics=metrics or [],
     )
-    sm = getattr(validate_result, "stability_metrics", None)
-    risk_notes = list(getattr(validate_result, "risk_notes", None) or [])
+    return diagnose_from_signals(signals)
+
+
+def diagnose_from_signals(signals: DiagnosisSignals) -> DiagnosisResult:
+    """基于结构化信号执行诊断决策树（diagnose 与 diagnose_batch 共用）"""
+    n_samples = signals.n_samples
+    n_windows = signals.n_windows
+    exp_ios_pass = signals.explore_ios_pass
+    exp_android_pass = signals.explore_android_pass
+    val_pass = signals.validate_pass
 
     # ----- Step 0: 样本门槛 -----
     if n_samples < MIN_SAMPLES or n_windows < MIN_WINDOWS:
@@ -234,7 +320,7 @@ def diagnose(
     # Explore FAIL 且（IPM 低 或 CPI 高）→ EFFICIENCY_FAIL
     if (not exp_ios_pass) and (not exp_android_pass):
         primary = "IPM_DROP"
-        if any("CPI" in n for n in risk_notes) and not any("IPM" in n and "回撤" in n for n in risk_notes):
+        if signals.cpi_spike and not signals.ipm_drawdown:
             primary = "CPI_SPIKE"
         actions = [
             PrescriptionAction(
@@ -269,8 +355,8 @@ def diagnose(
 
     # Validate FAIL 且 early_roas 低 → QUALITY_FAIL 或 HANDOFF_MISMATCH
     if exp_ios_pass and exp_android_pass and (not val_pass):
-        early_roas_low = any("ROAS" in n or "转化" in n or "early" in n.lower() for n in risk_notes)
-        ipm_ok_cpi_bad = any("CPI" in n for n in risk_notes) and not any("IPM" in n and "回撤" in n for n in risk_notes)
+        early_roas_low = signals.roas_mismatch
+        ipm_ok_cpi_bad = signals.cpi_spike and not signals.ipm_drawdown
         ipm_ok_roas_bad = early_roas_low
 
         # ----- Step 3: 承接断裂 -----
@@ -341,11 +427,9 @@ def diagnose(
             return _enrich_diagnosis_text(d)
 
         # Validate FAIL 但非明确 ROAS/CPI 主导 → 可能是稳定性不足
-        ipm_drop = getattr(sm, "ipm_drop_pct", 0) or 0 if sm else 0
-        cpi_inc = getattr(sm, "cpi_increase_pct", 0) or 0 if sm else 0
-        if ipm_drop > 20:
+        if signals.ipm_drop_pct > 20:
             primary = "IPM_DROP"
-        elif cpi_inc > 15:
+        elif signals.cpi_increase_pct > 15:
             primary = "CPI_SPIKE"
         else:
             primary = "ROAS_DROP"
@@ -368,8 +452,7 @@ def diagnose(
 
     # ----- Step 4: 全部通过 → 放量 -----
     if exp_ios_pass and exp_android_pass and val_pass:
-        ipm_cv = getattr(sm, "ipm_cv", 0) if sm else 0
-        if ipm_cv < 0.05:
+        if signals.ipm_cv < 0.05:
             d = DiagnosisResult(
                 failure_type="",
                 primary_signal="",
@@ -438,3 +521,109 @@ def diagnosis_to_next_action(diag: DiagnosisResult) -> str:
     if diag.failure_type == "MIXED_SIGNALS":
         return "收敛人群/why_you"
     return "复核"
+
+
+# -------- 批量诊断 --------
+
+
+@dataclass
+class DiagnosisTable:
+    """批量诊断结果（列式）：每列等长，第 i 行对应第 i 张卡"""
+
+    card_ids: list[str] = field(default_factory=list)
+    failure_type: list[str] = field(default_factory=list)
+    primary_signal: list[str] = field(default_factory=list)
+    decision_state: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+    def rows(self) -> list[dict[str, str]]:
+        """转为行式（UI 表格 / 导出用）"""
+        return [
+            {"card_id": c, "failure_type": f, "primary_signal": p, "decision_state": d}
+            for c, f, p, d in zip(self.card_ids, self.failure_type, self.primary_signal, self.decision_state)
+        ]
+
+    def counts(self, column: str = "failure_type") -> dict[str, int]:
+        """某一列的取值分布"""
+        out: dict[str, int] = {}
+        for v in getattr(self, column):
+            out[v] = out.get(v, 0) + 1
+        return out
+
+
+@lru_cache(maxsize=256)
+def _classify_signals(signals: DiagnosisSignals) -> tuple[str, str, str]:
+    """同一 decision_key 的信号诊断结论相同，按代表样本只跑一次决策树"""
+    d = diagnose_from_signals(signals)
+    return d.failure_type, d.primary_signal, d.decision_state
+
+
+def _representative(signals: DiagnosisSignals) -> DiagnosisSignals:
+    """把连续字段压到 decision_key 的取值上，使缓存命中率与卡片数无关"""
+    insufficient = signals.n_samples < MIN_SAMPLES or signals.n_windows < MIN_WINDOWS
+    return DiagnosisSignals(
+        n_samples=0 if insufficient else MIN_SAMPLES,
+        n_windows=0 if insufficient else MIN_WINDOWS,
+        explore_ios_pass=signals.explore_ios_pass,
+        explore_android_pass=signals.explore_android_pass,
+        validate_pass=signals.validate_pass,
+        cpi_spike=signals.cpi_spike,
+        ipm_drawdown=signals.ipm_drawdown,
+        roas_mismatch=signals.roas_mismatch,
+        ipm_drop_pct=21.0 if signals.ipm_drop_pct > 20 else 0.0,
+        cpi_increase_pct=16.0 if signals.cpi_increase_pct > 15 else 0.0,
+        ipm_cv=0.0 if signals.ipm_cv < 0.05 else 1.0,
+    )
+
+
+def _decided_variant_count(explore_ios: Any, explore_android: Any) -> int:
+    """双端 Explore 中已判定（PASS / FAIL）的变体行数；INSUFFICIENT / INVALID 不计入样本"""
+    return sum(
+        1
+        for gate in (explore_ios, explore_android)
+        for status in (_get(gate, "variant_details", None) or {}).values()
+        if status in ("PASS", "FAIL")
+    )
+
+
+def diagnose_batch(items: Iterable[Any]) -> DiagnosisTable:
+    """
+    批量诊断：一次处理整个评测集，只输出 failure_type / primary_signal / decision_state 三列。
+
+    items 每项可为：
+    - CardEvalRecord（读 card / explore_ios / explore_android / validate_result）
+    - dict：{card_id?, explore_ios, explore_android, validate_result, metrics?, n_samples?}
+      （既无 n_samples 也无 metrics 时，样本数取双端 Explore 中已判定 PASS / FAIL 的变体行数）
+    - DiagnosisSignals（已预先提取的信号）
+
+    处方文案（recommended_actions 等）不在批量结果中生成；需要时对单卡调用 diagnose。
+    """
+    table = DiagnosisTable()
+    for i, item in enumerate(items):
+        if isinstance(item, DiagnosisSignals):
+            card_id = str(i)
+            signals = item
+        else:
+            card = _get(item, "card", None)
+            card_id = _get(item, "card_id", None) or _get(card, "card_id", None) or str(i)
+            explore_ios = _get(item, "explore_ios")
+            explore_android = _get(item, "explore_android")
+            metrics = _get(item, "metrics")
+            n_samples = _get(item, "n_samples")
+            if n_samples is None and not metrics:
+                n_samples = _decided_variant_count(explore_ios, explore_android)
+            signals = extract_signals(
+                explore_ios=explore_ios,
+                explore_android=explore_android,
+                validate_result=_get(item, "validate_result"),
+                metrics=metrics,
+                n_samples=n_samples,
+            )
+        ft, ps, ds = _classify_signals(_representative(signals))
+        table.card_ids.append(card_id)
+        table.failure_type.append(ft)
+        table.primary_signal.append(ps)
+        table.decision_state.append(ds)
+    return table
@@ -0,0 +1,192 @@
+"""
+元素贡献的 Bootstrap 区间：按变体整体重抽样（同一变体的 iOS / Android 行一起进出），
+给 avg_IPM_delta_vs_card_mean / avg_CPI_delta_vs_card_mean 加百分位区间。
+
+- 预聚合：每个变体的 IPM / CPI 行和与行数；每个元素的变体下标列表（与 compute_element_scores 同口径）
+- 每次重抽样只算一遍「变体权重 × 行和」，元素均值为下标列表上的求和，整卡 100+ 变体也在交互时间内
+- time_budget_s：到时即停（至少 min_resamples 次）；workers > 0 时分块交给进程池
+- 随机流取自 rng_streams.seeded(f"{seed}:{chunk}")，块间互不相关、可复现
+"""
+from __future__ import annotations
+
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from eval_schemas import ElementTag, Variant, decompose_variant_to_element_tags
+from element_scores import ElementScore, _interval_confidence, compute_element_scores
+from rng_streams import seeded
+from simulate_metrics import SimulatedMetrics
+
+
+@dataclass(frozen=True)
+class _BootstrapData:
+    """重抽样所需的紧凑数据（可 pickle 给子进程）"""
+
+    sum_ipm: tuple[float, ...]  # 每变体 IPM 行和
+    sum_cpi: tuple[float, ...]
+    n_rows: tuple[int, ...]  # 每变体行数
+    members: tuple[tuple[int, ...], ...]  # 每元素包含的变体下标
+
+
+def _prepare(
+    variant_metrics: Sequence[SimulatedMetrics | dict],
+    variant_to_tags: dict[str, list[ElementTag]],
+    keys: Sequence[tuple[str, str]],
+) -> _BootstrapData:
+    metrics = [SimulatedMetrics.model_validate(m) if isinstance(m, dict) else m for m in variant_metrics]
+    index: dict[str, int] = {}
+    s_ipm: list[float] = []
+    s_cpi: list[float] = []
+    n_rows: list[int] = []
+    for m in metrics:
+        if m.variant_id not in variant_to_tags:
+            continue
+        i = index.get(m.variant_id)
+        if i is None:
+            i = index[m.variant_id] = len(s_ipm)
+            s_ipm.append(0.0)
+            s_cpi.append(0.0)
+            n_rows.append(0)
+        s_ipm[i] += m.ipm
+        s_cpi[i] += m.cpi
+        n_rows[i] += 1
+    members: dict[tuple[str, str], list[int]] = {k: [] for k in keys}
+    for vid, i in index.items():
+        for key in {(t.element_type, t.element_value) for t in variant_to_tags.get(vid, [])}:
+            if key in members:
+                members[key].append(i)
+    return _BootstrapData(tuple(s_ipm), tuple(s_cpi), tuple(n_rows), tuple(tuple(members[k]) for k in keys))
+
+
+def _run_chunk(data: _BootstrapData, n: int, seed: str) -> tuple[list[list[float]], list[list[float]]]:
+    """n 次重抽样；返回每元素的 IPMΔ / CPIΔ 样本（元素在某次重抽样中缺席则不记）"""
+    rng = seeded(seed)
+    V = len(data.n_rows)
+    E = len(data.members)
+    out_ipm: list[list[float]] = [[] for _ in range(E)]
+    out_cpi: list[list[float]] = [[] for _ in range(E)]
+    population = range(V)
+    s_ipm, s_cpi, n_rows = data.sum_ipm, data.sum_cpi, data.n_rows
+    for _ in range(n):
+        w = [0] * V
+        for v in rng.choices(population, k=V):
+            w[v] += 1
+        a_ipm = [wi * x for wi, x in zip(w, s_ipm)]
+        a_cpi = [wi * x for wi, x in zip(w, s_cpi)]
+        a_n = [wi * x for wi, x in zip(w, n_rows)]
+        total_n = sum(a_n)
+        card_ipm = sum(a_ipm) / total_n
+        card_cpi = sum(a_cpi) / total_n
+        for e, idx in enumerate(data.members):
+            wn = sum(map(a_n.__getitem__, idx))
+            if not wn:
+                continue
+            out_ipm[e].append(sum(map(a_ipm.__getitem__, idx)) / wn - card_ipm)
+            out_cpi[e].append(sum(map(a_cpi.__getitem__, idx)) / wn - card_cpi)
+    return out_ipm, out_cpi
+
+
+def _percentile(sorted_xs: Sequence[float], q: float) -> float:
+    """线性插值百分位（q ∈ [0, 1]）"""
+    if not sorted_xs:
+        return math.nan
+    pos = q * (len(sorted_xs) - 1)
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(sorted_xs) - 1)
+    return sorted_xs[lo] + (sorted_xs[hi] - sorted_xs[lo]) * (pos - lo)
+
+
+def bootstrap_element_intervals(
+    scores: list[ElementScore],
+    variant_metrics: Sequence[SimulatedMetrics | dict],
+    variant_to_tags: dict[str, list[ElementTag]] | None = None,
+    variants: list[Variant] | None = None,
+    *,
+    n_resamples: int = 2000,
+    min_resamples: int = 200,
+    time_budget_s: float | None = 1.0,
+    level: float = 0.95,
+    workers: int = 0,
+    chunk_size: int = 100,
+    seed: str = "element_bootstrap",
+) -> list[ElementScore]:
+    """
+    为 compute_element_scores 的结果补 Bootstrap 百分位区间（点估计不变）。
+
+    - n_resamples：目标重抽样次数；time_budget_s 到时提前停止（None 为不限时），但至少 min_resamples 次
+    - workers > 0：分块（chunk_size 次 / 块）交给进程池；块种子固定，结果与块的完成顺序无关
+    - confidence_level 按区间重定级（与 EB 模式同一规则）
+    """
+    if not scores:
+        return scores
+    if variant_to_tags is None:
+        variant_to_tags = {v.variant_id: decompose_variant_to_element_tags(v) for v in (variants or [])}
+    keys = [(s.element_type, s.element_value) for s in scores]
+    data = _prepare(variant_metrics, variant_to_tags, keys)
+    if not data.n_rows:
+        return scores
+
+    n_chunks = max(1, math.ceil(n_resamples / chunk_size))
+    min_chunks = max(1, math.ceil(min_resamples / chunk_size))
+    deadline = None if time_budget_s is None else time.perf_counter() + time_budget_s
+    results: dict[int, tuple[list[list[float]], list[list[float]]]] = {}
+
+    if workers and workers > 0:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(_run_chunk, data, chunk_size, f"{seed}:{c}"): c for c in range(n_chunks)}
+            while pending:
+                timeout = None if deadline is None or len(results) < min_chunks else max(0.0, deadline - time.perf_counter())
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for f in done:
+                    results[pending.pop(f)] = f.result()
+            for f in pending:
+                f.cancel()
+    else:
+        for c in range(n_chunks):
+            if c >= min_chunks and deadline is not None and time.perf_counter() > deadline:
+                break
+            results[c] = _run_chunk(data, chunk_size, f"{seed}:{c}")
+
+    E = len(keys)
+    samples_ipm: list[list[float]] = [[] for _ in range(E)]
+    samples_cpi: list[list[float]] = [[] for _ in range(E)]
+    for c in sorted(results):
+        ipm_c, cpi_c = results[c]
+        for e in range(E):
+            samples_ipm[e].extend(ipm_c[e])
+            samples_cpi[e].extend(cpi_c[e])
+
+    alpha = (1.0 - level) / 2.0
+    out = []
+    for s, xs_ipm, xs_cpi in zip(scores, samples_ipm, samples_cpi):
+        if not xs_ipm:
+            out.append(s)
+            continue
+        xs_ipm.sort()
+        xs_cpi.sort()
+        ipm_ci = (round(_percentile(xs_ipm, alpha), 4), round(_percentile(xs_ipm, 1.0 - alpha), 4))
+        cpi_ci = (round(_percentile(xs_cpi, alpha), 4), round(_percentile(xs_cpi, 1.0 - alpha), 4))
+        out.append(s.model_copy(update={
+            "ipm_delta_ci": ipm_ci,
+            "cpi_delta_ci": cpi_ci,
+            "interval_method": "bootstrap",
+            "interval_samples": len(xs_ipm),
+            "confidence_level": _interval_confidence(ipm_ci, cpi_ci, s.cross_os_consistency),
+        }))
+    return out
+
+
+def bootstrap_card_element_scores(
+    variant_metrics: Sequence[SimulatedMetrics | dict],
+    variants: list[Variant],
+    **kwargs: Any,
+) -> list[ElementScore]:
+    """compute_element_scores + Bootstrap 区间（决策看板 element_mode="bootstrap" 入口）"""
+    variant_to_tags = {v.variant_id: decompose_variant_to_element_tags(v) for v in variants}
+    scores = compute_element_scores(variant_metrics=list(variant_metrics), variant_to_tags=variant_to_tags)
+    return bootstrap_element_intervals(scores, variant_metrics, variant_to_tags, **kwargs)
@@ -0,0 +1,203 @@
+"""
+元素效应回归：在「元素指示变量 + OS + 卡片固定效应」的稀疏设计矩阵上做岭回归。
+
+与 compute_element_scores 的「含元素组均值 - 卡片均值」相比：
+- 多元素同时变化的变体（自定义候选池、多因子设计）各元素效应分开归因
+- OS 作为协变量剔除，卡片固定效应吸收卡间水平差异，可直接跨知识库多卡联合估计
+- 行数 / 列数大时只按非零元计算（stats_utils.sparse_ridge_cg），数万行秒级
+
+输出与 compute_element_scores 同构的 ElementScore：Δ = β_元素 - 同类型元素按样本频率加权的 β 均值。
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Iterable, Sequence
+
+from eval_schemas import Variant, element_key, variant_element_ids
+from element_scores import ElementScore, _confidence_level, _consistency_from_deltas
+from scoring_eval import compute_element_normalized_score
+from simulate_metrics import SimulatedMetrics
+from stats_utils import sparse_ridge_cg
+
+
+@dataclass(frozen=True)
+class RegressionRow:
+    """回归行：一个 (卡片, 变体, OS) 的指标与元素"""
+
+    card_key: str
+    variant_id: str
+    os: str
+    ipm: float
+    cpi: float
+    elements: tuple[tuple[str, str], ...]
+
+
+@dataclass
+class ElementDesign:
+    """稀疏设计：每行非零列下标；列 = 卡片固定效应 | Android | 元素（别名元素合并为一列）"""
+
+    row_cols: list[list[int]]
+    n_cols: int
+    penalty: list[float]
+    element_col: dict[tuple[str, str], int]  # 元素 → 列（别名共享）
+    element_rows: dict[tuple[str, str], list[int]]  # 元素 → 行下标
+
+
+def build_design(rows: Sequence[RegressionRow], *, ridge: float = 1.0, os_term: bool = True) -> ElementDesign:
+    """
+    构建稀疏设计矩阵。固定效应与 OS 列只加极小惩罚（数值稳定），元素列惩罚 ridge。
+    在完全相同的 (卡片, 变体) 集合上出现的元素（如同源的 why_you / why_now / sell_point）合并为一列。
+    """
+    card_idx: dict[str, int] = {}
+    for r in rows:
+        card_idx.setdefault(r.card_key, len(card_idx))
+    use_os = os_term and len({r.os for r in rows}) > 1
+    base = len(card_idx) + (1 if use_os else 0)
+
+    element_rows: dict[tuple[str, str], list[int]] = defaultdict(list)
+    element_units: dict[tuple[str, str], set[tuple[str, str]]] = defaultdict(set)
+    for i, r in enumerate(rows):
+        for e in r.elements:
+            element_rows[e].append(i)
+            element_units[e].add((r.card_key, r.variant_id))
+
+    element_col: dict[tuple[str, str], int] = {}
+    by_support: dict[frozenset, int] = {}
+    n_cols = base
+    for e in element_rows:
+        support = frozenset(element_units[e])
+        col = by_support.get(support)
+        if col is None:
+            col = by_support[support] = n_cols
+            n_cols += 1
+        element_col[e] = col
+
+    row_cols: list[list[int]] = []
+    for r in rows:
+        cols = [card_idx[r.card_key]]
+        if use_os and r.os == "Android":
+            cols.append(len(card_idx))
+        cols.extend(sorted({element_col[e] for e in r.elements}))
+        row_cols.append(cols)
+    penalty = [1e-8] * base + [ridge] * (n_cols - base)
+    return ElementDesign(row_cols, n_cols, penalty, element_col, dict(element_rows))
+
+
+def _centered_effects(
+    design: ElementDesign,
+    beta: Sequence[float],
+) -> dict[tuple[str, str], float]:
+    """β_元素 - 同类型元素按出现行数加权的 β 均值（与「相对卡片均值」口径一致）"""
+    by_type: dict[str, list[tuple[str, str]]] = defaultdict(list)
+    for e in design.element_col:
+        by_type[e[0]].append(e)
+    out: dict[tuple[str, str], float] = {}
+    for _, elems in by_type.items():
+        weights = [len(design.element_rows[e]) for e in elems]
+        total = sum(weights) or 1
+        mean = sum(w * beta[design.element_col[e]] for w, e in zip(weights, elems)) / total
+        for e in elems:
+            out[e] = beta[design.element_col[e]] - mean
+    return out
+
+
+def _fit(rows: Sequence[RegressionRow], *, ridge: float, os_term: bool, tol: float, max_iter: int) -> tuple[ElementDesign, dict, dict]:
+    design = build_design(rows, ridge=ridge, os_term=os_term)
+    b_ipm, _ = sparse_ridge_cg(design.row_cols, design.n_cols, [r.ipm for r in rows], penalty=design.penalty, tol=tol, max_iter=max_iter)
+    b_cpi, _ = sparse_ridge_cg(design.row_cols, design.n_cols, [r.cpi for r in rows], penalty=design.penalty, tol=tol, max_iter=max_iter)
+    return design, _centered_effects(design, b_ipm), _centered_effects(design, b_cpi)
+
+
+def fit_element_effects(
+    rows: Sequence[RegressionRow],
+    *,
+    ridge: float = 1.0,
+    min_sample_size: int = 2,
+    cross_os: bool = True,
+    tol: float = 1e-8,
+    max_iter: int = 500,
+) -> list[ElementScore]:
+    """
+    岭回归元素效应（单卡或多卡）。cross_os=True 时 iOS / Android 各拟合一次判断方向一致性
+    （多卡大样本可关闭以省两次求解）。
+    """
+    if not rows:
+        return []
+    design, eff_ipm, eff_cpi = _fit(rows, ridge=ridge, os_term=True, tol=tol, max_iter=max_iter)
+    per_os: list[tuple[dict, dict]] = []
+    os_names = sorted({r.os for r in rows})
+    if cross_os and len(os_names) > 1:
+        for os_name in os_names:
+            sub = [r for r in rows if r.os == os_name]
+            _, e_ipm, e_cpi = _fit(sub, ridge=ridge, os_term=False, tol=tol, max_iter=max_iter)
+            per_os.append((e_ipm, e_cpi))
+
+    results: list[ElementScore] = []
+    for e in design.element_col:
+        n = len(design.element_rows[e])
+        ipm_d, cpi_d = eff_ipm[e], eff_cpi[e]
+        if per_os:
+            consistency = _consistency_from_deltas([(p_ipm.get(e, 0.0), p_cpi.get(e, 0.0)) for p_ipm, p_cpi in per_os])
+        else:
+            consistency = "mixed"
+        results.append(ElementScore(
+            element_type=e[0],
+            element_value=e[1],
+            avg_IPM_delta_vs_card_mean=round(ipm_d, 4),
+            avg_CPI_delta_vs_card_mean=round(cpi_d, 4),
+            sample_size=n,
+            stability_flag=n >= min_sample_size,
+            normalized_score=compute_element_normalized_score(ipm_d, cpi_d),
+            confidence_level=_confidence_level(n, consistency),
+            cross_os_consistency=consistency,
+        ))
+    return results
+
+
+# -------- 数据入口 --------
+
+
+def rows_from_card(
+    variant_metrics: Iterable[SimulatedMetrics | dict],
+    variants: Sequence[Variant],
+    *,
+    card_key: str = "card",
+) -> list[RegressionRow]:
+    """单卡 metrics + 变体 → 回归行"""
+    tags = {
+        v.variant_id: tuple(dict.fromkeys(map(element_key, variant_element_ids(v))))
+        for v in variants
+    }
+    rows = []
+    for m in variant_metrics:
+        m = SimulatedMetrics.model_validate(m) if isinstance(m, dict) else m
+        if m.variant_id in tags:
+            rows.append(RegressionRow(card_key, m.variant_id, m.os, m.ipm, m.cpi, tags[m.variant_id]))
+    return rows
+
+
+def element_effects_for_card(
+    variant_metrics: Iterable[SimulatedMetrics | dict],
+    variants: Sequence[Variant],
+    **kwargs: Any,
+) -> list[ElementScore]:
+    """单卡岭回归元素分（决策看板 element_mode="ridge" 入口）"""
+    return fit_element_effects(rows_from_card(variant_metrics, variants), **kwargs)
+
+
+def element_effects_from_store(
+    vertical: str | None = None,
+    *,
+    limit_experiments: int | None = None,
+    **kwargs: Any,
+) -> list[ElementScore]:
+    """知识库多卡联合估计（卡片固定效应按 exp_id）；默认不做分端拟合"""
+    from knowledge_store import load_element_rows
+
+    rows = [
+        RegressionRow(r["exp_id"], r["variant_id"], r["os"], float(r["ipm"]), float(r["cpi"]), tuple(r["elements"]))
+        for r in load_element_rows(vertical, limit_experiments=limit_experiments)
+    ]
+    kwargs.setdefault("cross_os", False)
+    return fit_element_effects(rows, **kwargs)
@@ -1,20 +1,31 @@
 """
 元素级贡献分析：基于多 Variant 的 metrics + ElementTag 拆解，
 计算「是否包含某元素」时的 IPM/CPI 均值差。
+
+多因子设计（ofaat_generator.generate_design_variants）下各元素同时变化，均值差会混入其他元素，
+改用 estimate_element_effects：主效应最小二乘，一次分解同时估 IPM / CPI。
+
+shrinkage="eb"：经验贝叶斯收缩，先验取同 vertical 历史实验（knowledge_store.load_element_priors），
+无历史时按本卡同类元素矩估计；输出后验均值与 95% 可信区间。
 """
 from __future__ import annotations
 
+import math
 from collections import defaultdict
-from typing import Any, Literal
+from typing import Any, Literal, Sequence
 
 from pydantic import BaseModel, Field
 
-from eval_schemas import ElementTag, Variant, decompose_variant_to_element_tags
+from eval_schemas import ElementTag, Variant, decompose_variant_to_element_tags, element_key, tag_element_id, variant_element_ids
 from simulate_metrics import SimulatedMetrics
 from scoring_eval import compute_element_normalized_score
+from stats_utils import least_squares
 
 ConfidenceLevel = Literal["low", "medium", "high"]
 CrossOSConsistency = Literal["pos", "neg", "mixed"]
+Shrinkage = Literal["none", "eb"]
+
+_Z95 = 1.959963984540054
 
 
 # -------- 输出模型 --------
@@ -50,6 +61,52 @@ class ElementScore(BaseModel):
         default="mixed",
         description="pos: 双端一致拉 | neg: 双端一致拖 | mixed: 双端不一致（mixed 降一级）",
     )
+    # 以下仅在收缩 / 区间估计时填充
+    avg_IPM_delta_raw: float | None = Field(default=None, description="收缩前的原始 IPM 均值差")
+    avg_CPI_delta_raw: float | None = Field(default=None, description="收缩前的原始 CPI 均值差")
+    ipm_delta_ci: tuple[float, float] | None = Field(default=None, description="IPMΔ 95% 区间")
+    cpi_delta_ci: tuple[float, float] | None = Field(default=None, description="CPIΔ 95% 区间")
+    interval_method: str | None = Field(default=None, description="区间方法：eb（经验贝叶斯可信区间）/ bootstrap（百分位区间）")
+    interval_samples: int | None = Field(default=None, description="bootstrap 有效重抽样次数")
+
+
+# -------- 置信度 / 双端一致性 --------
+
+
+def _direction(ipm_delta: float, cpi_delta: float) -> int:
+    """方向：拉 = IPMΔ>0 或 CPIΔ<0；拖 = IPMΔ<0 或 CPIΔ>0"""
+    if ipm_delta > 0 or cpi_delta < 0:
+        return 1
+    if ipm_delta < 0 or cpi_delta > 0:
+        return -1
+    return 0
+
+
+def _consistency_from_deltas(os_deltas: list[tuple[float, float]]) -> CrossOSConsistency:
+    """pos: 双端一致拉 | neg: 双端一致拖 | mixed: 双端不一致"""
+    if len(os_deltas) < 2:
+        return "mixed"
+    dirs = [_direction(ipm_d, cpi_d) for ipm_d, cpi_d in os_deltas]
+    if len(set(dirs)) > 1:
+        return "mixed"
+    if dirs[0] == 1:
+        return "pos"
+    return "neg"
+
+
+def _confidence_level(n: int, cross_os: CrossOSConsistency) -> ConfidenceLevel:
+    if n < 6:
+        base = "low"
+    elif n <= 15:
+        base = "medium"
+    else:
+        base = "high"
+    if cross_os == "mixed":
+        if base == "high":
+            return "medium"
+        if base == "medium":
+            return "low"
+    return base
 
 
 # -------- 贡献分析 --------
@@ -62,6 +119,9 @@ def compute_element_scores(
     *,
     parent_card_id: str | None = None,
     min_sample_size: int = 2,
+    shrinkage: Shrinkage = "none",
+    vertical: str | None = None,
+    priors: dict[str, dict] | None = None,
 ) -> list[ElementScore]:
     """
     元素级贡献分析：对同一 StrategyCard 下的 Variant，
@@ -73,6 +133,8 @@ def compute_element_scores(
     - variants: 可选，Variant 列表，用于自动拆解 ElementTag
     - parent_card_id: 可选，仅分析该 card 下的变体
     - min_sample_size: 样本足够阈值，默认 2
+    - shrinkage: "eb" 时做经验贝叶斯收缩（见 shrink_element_scores）
+    - vertical / priors: 收缩先验；priors 缺省时按 vertical 从知识库读取
 
     方法：
     - 卡片整体均值 = 所有 metrics 的 IPM/CPI 均值
@@ -85,16 +147,16 @@ def compute_element_scores(
         for m in variant_metrics
     ]
 
-    # 1. 构建 variant_id -> tags
+    # 1. 构建 variant_id -> 元素 id（拆解结果按内容缓存，元素以整数 id 参与聚合）
     if variant_to_tags is None and variants:
-        variant_to_tags = {}
-        for v in variants:
-            variant_to_tags[v.variant_id] = decompose_variant_to_element_tags(v)
-    if not variant_to_tags:
+        variant_to_ids = {v.variant_id: variant_element_ids(v) for v in variants}
+    else:
+        variant_to_ids = {vid: tuple(map(tag_element_id, tags)) for vid, tags in (variant_to_tags or {}).items()}
+    if not variant_to_ids:
         return []
 
     # 2. 筛选本 card 的 metrics
-    variant_ids_in_card = set(variant_to_tags.keys())
+    variant_ids_in_card = set(variant_to_ids.keys())
     if parent_card_id:
         pass  # 若 variants 有 parent_card_id 可过滤，此处简化：用 variant_to_tags 的 key
     metrics_in_scope = [m for m in metrics_list if m.variant_id in variant_ids_in_card]
@@ -105,18 +167,14 @@ def compute_element_scores(
     card_mean_ipm = sum(m.ipm for m in metrics_in_scope) / len(metrics_in_scope)
     card_mean_cpi = sum(m.cpi for m in metrics_in_scope) / len(metrics_in_scope)
 
-    # 4. 每个 (element_type, element_value) 对应的 metrics 行（含 os）
-    # key: (element_type, element_value), value: list of (ipm, cpi, os)
-    element_metrics: dict[tuple[str, str], list[tuple[float, float, str]]] = defaultdict(list)
+    # 4. 每个元素对应的 metrics 行（含 os）
+    # key: 元素 id, value: list of (ipm, cpi, os)
+    element_metrics: dict[int, list[tuple[float, float, str]]] = defaultdict(list)
 
     for m in metrics_in_scope:
-        tags = variant_to_tags.get(m.variant_id, [])
-        seen = set()
-        for t in tags:
-            key = (t.element_type, t.element_value)
-            if key not in seen:
-                seen.add(key)
-                element_metrics[key].append((m.ipm, m.cpi, m.os))
+        row = (m.ipm, m.cpi, m.os)
+        for eid in dict.fromkeys(variant_to_ids.get(m.variant_id, ())):
+            element_metrics[eid].append(row)
 
     def _cross_os_consistency(
         ipm_cpi_os_list: list[tuple[float, float, str]],
@@ -127,45 +185,18 @@ def compute_element_scores(
         by_os: dict[str, list[tuple[float, float]]] = defaultdict(list)
         for ipm, cpi, os_ in ipm_cpi_os_list:
             by_os[os_].append((ipm, cpi))
-        if len(by_os) < 2:
-            return "mixed"
         os_deltas: list[tuple[float, float]] = []
         for os_, rows in by_os.items():
             mean_ipm = sum(x[0] for x in rows) / len(rows)
             mean_cpi = sum(x[1] for x in rows) / len(rows)
             os_deltas.append((mean_ipm - card_ipm, mean_cpi - card_cpi))
-        # 方向：拉 = IPMΔ>0 或 CPIΔ<0；拖 = IPMΔ<0 或 CPIΔ>0
-        dirs = []
-        for ipm_d, cpi_d in os_deltas:
-            if ipm_d > 0 or cpi_d < 0:
-                dirs.append(1)  # 拉
-            elif ipm_d < 0 or cpi_d > 0:
-                dirs.append(-1)  # 拖
-            else:
-                dirs.append(0)
-        if len(set(dirs)) > 1:
-            return "mixed"
-        if dirs[0] == 1:
-            return "pos"
-        return "neg"
-
-    def _confidence_level(n: int, cross_os: CrossOSConsistency) -> ConfidenceLevel:
-        if n < 6:
-            base = "low"
-        elif n <= 15:
-            base = "medium"
-        else:
-            base = "high"
-        if cross_os == "mixed":
-            if base == "high":
-                return "medium"
-            if base == "medium":
-                return "low"
-        return base
+        return _consistency_from_deltas(os_deltas)
 
     # 5. 计算 ElementScore
     results: list[ElementScore] = []
-    for (et, ev), ipm_cpi_os_list in element_metrics.items():
+    sample_rows: list[list[tuple[float, float, str]]] = []
+    for eid, ipm_cpi_os_list in element_metrics.items():
+        et, ev = element_key(eid)
         n = len(ipm_cpi_os_list)
         mean_ipm = sum(x[0] for x in ipm_cpi_os_list) / n
         mean_cpi = sum(x[1] for x in ipm_cpi_os_list) / n
@@ -189,5 +220,320 @@ def compute_element_scores(
                 cross_os_consistency=cross_os,
             )
         )
+        sample_rows.append(ipm_cpi_os_list)
+
+    if shrinkage == "eb":
+        if priors is None:
+            priors = load_priors(vertical)
+        results = shrink_element_scores(results, sample_rows, metrics_in_scope, priors=priors)
+    return results
+
+
+# -------- 经验贝叶斯收缩 --------
+
+
+_PRIORS_CACHE: dict[str | None, tuple[tuple[int, int], dict[str, dict]]] = {}
+
+
+def _db_stamp(path: Any) -> tuple[int, int]:
+    try:
+        st = path.stat()
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_priors(vertical: str | None) -> dict[str, dict]:
+    """
+    知识库先验；知识库不可用（只读环境 / 旧版 knowledge_store）时返回空先验。
+    按 vertical 记忆，知识库文件 mtime / 大小变化（新实验入库）后重读，避免每次 rerun 都扫全表。
+    """
+    try:
+        from knowledge_store import DB_PATH, load_element_priors
+
+        stamp = _db_stamp(DB_PATH)
+        cached = _PRIORS_CACHE.get(vertical)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        priors = load_element_priors(vertical)
+        # 读取期间文件被改写（并发入库）则不记忆；首次读取建库时以建库后的状态为准
+        after = _db_stamp(DB_PATH)
+        if after == stamp or stamp == (0, 0):
+            _PRIORS_CACHE[vertical] = (after, priors)
+        return priors
+    except Exception:
+        return {"by_type": {}, "by_value": {}}
+
+
+def _metric_variance(values: Sequence[float]) -> float:
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean = sum(values) / n
+    return sum((x - mean) ** 2 for x in values) / (n - 1)
+
+
+def shrink_element_scores(
+    scores: list[ElementScore],
+    sample_rows: list[list[tuple[float, float, str]]],
+    metrics_in_scope: list[Any],
+    *,
+    priors: dict[str, dict] | None = None,
+    min_type_history: int = 5,
+) -> list[ElementScore]:
+    """
+    经验贝叶斯（正态-正态）收缩。对每个元素 e、指标 k：
+    - 观测 d_e ~ N(θ_e, s²_e)，s²_e = σ²_k · (1/n_e - 1/N)（σ²_k 为卡内行方差，N 为卡内行数）
+    - 先验 θ_e ~ N(μ_e, τ²)：μ_e 取该取值的历史均值，否则同类型历史均值；τ² 取同类型历史方差
+      （历史不足 min_type_history 时按本卡矩估计：τ² = max(0.1·mean(s²), mean(d²) - mean(s²))，μ = 0）
+    - 后验：B = s² / (s² + τ²)，均值 (1-B)·d + B·μ，方差 B·τ²，区间 ±1.96σ
+    所有元素按平行数组一次算完；sample_rows[i] 与 scores[i] 对应。
+    """
+    priors = priors or {}
+    by_type = priors.get("by_type") or {}
+    by_value = priors.get("by_value") or {}
+    N = len(metrics_in_scope)
+    if not scores or N == 0:
+        return scores
+
+    # 平行数组：每个元素一个位置
+    types = [s.element_type for s in scores]
+    values = [s.element_value for s in scores]
+    ns = [len(r) for r in sample_rows]
+    post: dict[str, tuple[list[float], list[float], list[float]]] = {}
+    for metric, attr in (("IPM", "avg_IPM_delta_vs_card_mean"), ("CPI", "avg_CPI_delta_vs_card_mean")):
+        sigma2 = _metric_variance([getattr(m, metric.lower()) for m in metrics_in_scope])
+        d = [getattr(s, attr) for s in scores]
+        s2 = [sigma2 * max(0.0, 1.0 / n - 1.0 / N) if n else sigma2 for n in ns]
+
+        # 本卡矩估计（无历史时的先验）：同类型信息元素 ≥ 3 个时按类型，否则全卡合并；
+        # 下限 0.1·mean(s²)，避免小卡矩估计为 0 时完全收缩、区间退化为一点
+        acc: dict[str, list[float]] = defaultdict(lambda: [0.0, 0.0, 0])
+        for t, di, si in zip(types, d, s2):
+            if si <= 0.0:
+                continue  # 全部变体都含该元素，无对照信息
+            for key in (t, "*"):
+                a = acc[key]
+                a[0] += di * di
+                a[1] += si
+                a[2] += 1
+        pooled = acc.get("*", [0.0, 0.0, 0])
+        tau2_floor = 0.1 * pooled[1] / pooled[2] if pooled[2] else 0.0
+        card_tau2: dict[str, float] = {}
+        for t in set(types):
+            sum_d2, sum_s2, k = acc[t] if acc.get(t, [0, 0, 0])[2] >= 3 else pooled
+            card_tau2[t] = max(tau2_floor, (sum_d2 - sum_s2) / k) if k else tau2_floor
+
+        mu, tau2 = [], []
+        for t, v in zip(types, values):
+            hist = by_type.get((t, metric))
+            if hist and hist.get("n", 0) >= min_type_history:
+                vh = by_value.get((t, v, metric))
+                mu.append(vh["mean"] if vh else hist["mean"])
+                tau2.append(max(hist["var"], 1e-12))
+            else:
+                mu.append(0.0)
+                tau2.append(card_tau2[t])
+
+        means, variances = [], []
+        for di, si, mi, ti in zip(d, s2, mu, tau2):
+            if si <= 0.0:
+                means.append(di)
+                variances.append(0.0)
+                continue
+            B = si / (si + ti)
+            means.append((1.0 - B) * di + B * mi)
+            variances.append(B * ti)
+        post[metric] = (d, means, variances)
+
+    out = []
+    for i, s in enumerate(scores):
+        d_ipm, m_ipm, v_ipm = (post["IPM"][0][i], post["IPM"][1][i], post["IPM"][2][i])
+        d_cpi, m_cpi, v_cpi = (post["CPI"][0][i], post["CPI"][1][i], post["CPI"][2][i])
+        h_ipm, h_cpi = _Z95 * math.sqrt(v_ipm), _Z95 * math.sqrt(v_cpi)
+        ipm_ci = (round(m_ipm - h_ipm, 4), round(m_ipm + h_ipm, 4))
+        cpi_ci = (round(m_cpi - h_cpi, 4), round(m_cpi + h_cpi, 4))
+        out.append(s.model_copy(update={
+            "avg_IPM_delta_vs_card_mean": round(m_ipm, 4),
+            "avg_CPI_delta_vs_card_mean": round(m_cpi, 4),
+            "avg_IPM_delta_raw": d_ipm,
+            "avg_CPI_delta_raw": d_cpi,
+            "ipm_delta_ci": ipm_ci,
+            "cpi_delta_ci": cpi_ci,
+            "interval_method": "eb",
+            "normalized_score": compute_element_normalized_score(m_ipm, m_cpi),
+            "confidence_level": _interval_confidence(ipm_ci, cpi_ci, s.cross_os_consistency),
+        }))
+    return out
+
+
+def _interval_confidence(
+    ipm_ci: tuple[float, float],
+    cpi_ci: tuple[float, float],
+    cross_os: CrossOSConsistency,
+) -> ConfidenceLevel:
+    """区间定级：IPM / CPI 区间均不跨 0 且方向一致为 high，仅一个不跨 0 为 medium；mixed 降一级"""
+    dirs = []
+    for (lo, hi), sign in ((ipm_ci, 1), (cpi_ci, -1)):
+        if lo > 0 or hi < 0:
+            dirs.append(sign if lo > 0 else -sign)
+    if len(dirs) == 2 and dirs[0] == dirs[1]:
+        base: ConfidenceLevel = "high"
+    elif dirs:
+        base = "medium"
+    else:
+        base = "low"
+    if cross_os == "mixed":
+        return "medium" if base == "high" else "low"
+    return base
+
+
+# -------- 多因子设计：主效应最小二乘 --------
+
 
+def _factor_key(tag: ElementTag) -> tuple[str, str]:
+    """ElementTag → (因子, 水平)；asset 按子变量拆成独立因子（subtitle_template / bgm / ...）"""
+    if tag.element_type == "asset" and "=" in tag.element_value:
+        return f"asset:{tag.element_value.split('=', 1)[0]}", tag.element_value
+    return tag.element_type, tag.element_value
+
+
+def _fit_main_effects(
+    rows: list[tuple[str, float, float, str]],
+    factor_levels: dict[str, dict[str, str]],
+    columns: list[tuple[str, str]],
+    *,
+    os_dummy: bool,
+    ridge: float,
+) -> dict[tuple[str, str], tuple[float, float]]:
+    """
+    rows: (variant_id, ipm, cpi, os)；factor_levels: 因子 → {variant_id: 水平}；columns: 非参照水平列。
+    返回各水平 (IPMΔ, CPIΔ)：β_水平 - Σ 水平频率·β（参照水平 β=0），即边际均值与整体均值之差。
+    """
+    col_idx = {c: j for j, c in enumerate(columns, start=2 if os_dummy else 1)}
+    p = 1 + (1 if os_dummy else 0) + len(columns)
+    X: list[list[float]] = []
+    for vid, _, _, os_ in rows:
+        x = [0.0] * p
+        x[0] = 1.0
+        if os_dummy and os_ == "Android":
+            x[1] = 1.0
+        for f, lv_map in factor_levels.items():
+            j = col_idx.get((f, lv_map.get(vid, "")))
+            if j is not None:
+                x[j] = 1.0
+        X.append(x)
+    (b_ipm, b_cpi), _ = least_squares(X, [[r[1] for r in rows], [r[2] for r in rows]], ridge=ridge)
+
+    out: dict[tuple[str, str], tuple[float, float]] = {}
+    for f, lv_map in factor_levels.items():
+        counts: dict[str, int] = defaultdict(int)
+        for vid, _, _, _ in rows:
+            counts[lv_map.get(vid, "")] += 1
+        n = len(rows)
+
+        def _beta(b: list[float], lv: str) -> float:
+            j = col_idx.get((f, lv))
+            return b[j] if j is not None else 0.0
+
+        mean_ipm = sum(c * _beta(b_ipm, lv) for lv, c in counts.items()) / n
+        mean_cpi = sum(c * _beta(b_cpi, lv) for lv, c in counts.items()) / n
+        for lv in counts:
+            out[(f, lv)] = (_beta(b_ipm, lv) - mean_ipm, _beta(b_cpi, lv) - mean_cpi)
+    return out
+
+
+def estimate_element_effects(
+    variant_metrics: list[SimulatedMetrics | dict],
+    variants: list[Variant] | None = None,
+    *,
+    variant_to_tags: dict[str, list[ElementTag]] | None = None,
+    min_sample_size: int = 2,
+    ridge: float = 1e-6,
+) -> list[ElementScore]:
+    """
+    多因子设计下的元素主效应（输出与 compute_element_scores 同构，下游无需区分）。
+
+    模型：y = 截距 + Android 哑变量 + Σ 各因子非参照水平哑变量（处理编码，首个变体的水平为参照）
+    - 设计矩阵只建一次，IPM / CPI 共用一次 Cholesky 分解
+    - 产生完全相同变体划分的因子（如 why_you / why_now / sell_point 同源）视为别名，只拟合一次
+    - avg_*_delta_vs_card_mean = 该水平边际均值 - 全体均值（其余因子按样本频率平均）
+    - cross_os_consistency：iOS / Android 各自拟合后比较方向；单端行数不足以估计时为 mixed
+    """
+    metrics_list = [
+        SimulatedMetrics.model_validate(m) if isinstance(m, dict) else m
+        for m in variant_metrics
+    ]
+    if variant_to_tags is None and variants:
+        variant_to_tags = {v.variant_id: decompose_variant_to_element_tags(v) for v in variants}
+    if not variant_to_tags:
+        return []
+    rows = [(m.variant_id, m.ipm, m.cpi, m.os) for m in metrics_list if m.variant_id in variant_to_tags]
+    if not rows:
+        return []
+
+    # 1. 因子 → {variant_id: 水平}，缺该因子的变体记为空水平
+    vids = list(dict.fromkeys(r[0] for r in rows))
+    all_levels: dict[str, dict[str, str]] = defaultdict(dict)
+    element_of: dict[tuple[str, str], tuple[str, str]] = {}
+    for vid in vids:
+        for t in variant_to_tags.get(vid, []):
+            f, lv = _factor_key(t)
+            all_levels[f].setdefault(vid, lv)
+            element_of[(f, lv)] = (t.element_type, t.element_value)
+
+    # 2. 别名：变体划分相同的因子共用一组参数
+    fitted: dict[str, dict[str, str]] = {}
+    alias_of: dict[str, str] = {}
+    by_partition: dict[tuple, str] = {}
+    for f, lv_map in all_levels.items():
+        first_seen: dict[str, int] = {}
+        partition = tuple(first_seen.setdefault(lv_map.get(vid, ""), len(first_seen)) for vid in vids)
+        if partition in by_partition:
+            alias_of[f] = by_partition[partition]
+        else:
+            by_partition[partition] = f
+            alias_of[f] = f
+            fitted[f] = lv_map
+
+    # 3. 非参照水平列（参照 = 首个变体的水平；单水平因子不入模）
+    ref = vids[0]
+    columns: list[tuple[str, str]] = []
+    for f, lv_map in fitted.items():
+        for lv in dict.fromkeys(lv_map.get(vid, "") for vid in vids):
+            if lv != lv_map.get(ref, ""):
+                columns.append((f, lv))
+
+    os_set = sorted({r[3] for r in rows})
+    effects = _fit_main_effects(rows, fitted, columns, os_dummy=len(os_set) > 1, ridge=ridge)
+    per_os: list[dict[tuple[str, str], tuple[float, float]]] = []
+    if len(os_set) > 1:
+        for os_name in os_set:
+            os_rows = [r for r in rows if r[3] == os_name]
+            if len(os_rows) >= len(columns) + 1:
+                per_os.append(_fit_main_effects(os_rows, fitted, columns, os_dummy=False, ridge=ridge))
+
+    # 4. 输出：每个出现过的 (element_type, element_value)
+    results: list[ElementScore] = []
+    for (f, lv), (et, ev) in element_of.items():
+        key = (alias_of[f], fitted[alias_of[f]].get(next(v for v in vids if all_levels[f].get(v) == lv), ""))
+        ipm_delta, cpi_delta = effects.get(key, (0.0, 0.0))
+        n = sum(1 for r in rows if all_levels[f].get(r[0]) == lv)
+        if len(per_os) == len(os_set) and len(per_os) > 1:
+            cross_os = _consistency_from_deltas([e.get(key, (0.0, 0.0)) for e in per_os])
+        else:
+            cross_os = "mixed"
+        results.append(
+            ElementScore(
+                element_type=et,
+                element_value=ev,
+                avg_IPM_delta_vs_card_mean=round(ipm_delta, 4),
+                avg_CPI_delta_vs_card_mean=round(cpi_delta, 4),
+                sample_size=n,
+                stability_flag=n >= min_sample_size,
+                normalized_score=compute_element_normalized_score(ipm_delta, cpi_delta),
+                confidence_level=_confidence_level(n, cross_os),
+                cross_os_consistency=cross_os,
+            )
+        )
     return results
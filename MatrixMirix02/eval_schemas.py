@@ -7,10 +7,12 @@
 """
 from __future__ import annotations
 
+import threading
+from collections import OrderedDict
 from enum import Enum
 from typing import Any, Literal
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 # -------- 枚举定义 --------
@@ -273,7 +275,9 @@ class Variant(BaseModel):
 
 
 class ElementTag(BaseModel):
-    """元素标签：用于元素级贡献分析"""
+    """元素标签：用于元素级贡献分析（不可变；decompose_variant_to_element_tags 返回进程内共享实例）"""
+
+    model_config = ConfigDict(frozen=True)
 
     element_type: ElementType = Field(..., description="hook / why_you / why_now / cta / asset")
     element_value: str = Field(default="", description="元素取值")
@@ -282,56 +286,181 @@ class ElementTag(BaseModel):
 # -------- 拆解函数 --------
 
 
-def decompose_variant_to_element_tags(variant: Variant) -> list[ElementTag]:
-    """
-    将 Variant 拆解为一组 ElementTag。
-    用于结构级 Gate 判断 + 元素级贡献分析。
-    """
-    tags: list[ElementTag] = []
+# 同一次重跑里 element_scores / variant_suggestions / app_demo 会对同一批变体反复拆解。
+# 元素 (element_type, element_value) 进程内驻留为整数 id，每个元素只建一个 ElementTag；
+# 变体拆解结果按参与拆解的字段内容缓存为 id 元组（LRU）。
+# 元素表分两代：当前代满 ELEMENT_TABLE_MAXSIZE 时整体降为上一代、旧的上一代丢弃（同时清空拆解缓存），
+# 上一代里再被用到的元素以原 id 提升回当前代。常驻元素 id 稳定，长驻进程里自由文本取值不会无限累积；
+# id 全局递增不复用，已丢弃的 id 查询时报 KeyError 而不是错配到别的元素。
+
+DECOMPOSE_CACHE_MAXSIZE = 65536
+ELEMENT_TABLE_MAXSIZE = 131072
+
+
+class _ElementGeneration:
+    """一代元素驻留表"""
+
+    __slots__ = ("ids", "keys", "tags", "tag_ids")
+
+    def __init__(self) -> None:
+        self.ids: dict[tuple[str, str], int] = {}
+        self.keys: dict[int, tuple[str, str]] = {}
+        self.tags: dict[int, ElementTag] = {}
+        # id(共享 ElementTag) → 元素 id；查表时再比对实例，防止 id() 被回收复用后错配
+        self.tag_ids: dict[int, int] = {}
+
+
+_element_lock = threading.Lock()
+_next_element_id = 0
+_element_gen = _ElementGeneration()
+_element_prev = _ElementGeneration()
+_decompose_cache: OrderedDict[tuple, tuple[int, ...]] = OrderedDict()
+
+
+def element_id(element_type: str, element_value: str) -> int:
+    """元素 → 驻留整数 id（首次出现时分配；上一代里有则沿用原 id）"""
+    global _next_element_id, _element_gen, _element_prev
+    key = (element_type, element_value)
+    eid = _element_gen.ids.get(key)
+    if eid is not None:
+        return eid
+    with _element_lock:
+        gen = _element_gen
+        eid = gen.ids.get(key)
+        if eid is not None:
+            return eid
+        eid = _element_prev.ids.get(key)
+        if eid is not None:
+            tag = _element_prev.tags[eid]
+        else:
+            eid = _next_element_id
+            _next_element_id += 1
+            tag = ElementTag(element_type=element_type, element_value=element_value)
+        if len(gen.ids) >= ELEMENT_TABLE_MAXSIZE:
+            _element_prev, _element_gen = gen, _ElementGeneration()
+            gen = _element_gen
+            _decompose_cache.clear()
+        gen.ids[key] = eid
+        gen.keys[eid] = key
+        gen.tags[eid] = tag
+        gen.tag_ids[id(tag)] = eid
+    return eid
+
+
+def element_key(eid: int) -> tuple[str, str]:
+    """元素 id → (element_type, element_value)"""
+    key = _element_gen.keys.get(eid)
+    return key if key is not None else _element_prev.keys[eid]
+
+
+def element_tag(eid: int) -> ElementTag:
+    """元素 id → 共享 ElementTag"""
+    tag = _element_gen.tags.get(eid)
+    return tag if tag is not None else _element_prev.tags[eid]
+
+
+def tag_element_id(tag: ElementTag) -> int:
+    """ElementTag → 元素 id（共享实例直接查表，外部构造的实例按内容驻留）"""
+    for gen in (_element_gen, _element_prev):
+        eid = gen.tag_ids.get(id(tag))
+        if eid is not None and gen.tags.get(eid) is tag:
+            return eid
+    return element_id(tag.element_type, tag.element_value)
+
+
+def _decompose_key(variant: Variant) -> tuple:
+    """参与拆解的字段内容（缓存键）"""
+    asset = variant.asset_variables
+    if isinstance(asset, dict):
+        asset_key: tuple = ("dict",) + tuple((k, v) for k, v in asset.items() if v and isinstance(v, str))
+    else:
+        asset_key = (asset.subtitle_template, asset.bgm, asset.rhythm, asset.shot_template)
+    return (
+        variant.hook_type, variant.why_you_expression, variant.why_now_expression,
+        variant.sell_point, variant.cta_type, asset_key,
+    )
+
+
+def _decompose_elements(variant: Variant) -> list[tuple[str, str]]:
+    """拆解规则：Variant → [(element_type, element_value)]"""
+    elements: list[tuple[str, str]] = []
 
     # hook
     if variant.hook_type:
-        tags.append(ElementTag(element_type="hook", element_value=variant.hook_type))
+        elements.append(("hook", variant.hook_type))
 
     # why_you：优先用 why_you_expression，否则用 sell_point
     why_you_val = variant.why_you_expression or variant.sell_point
     if why_you_val:
-        tags.append(ElementTag(element_type="why_you", element_value=why_you_val))
+        elements.append(("why_you", why_you_val))
 
     # why_now：优先用 why_now_expression，否则用 sell_point
     why_now_val = variant.why_now_expression or variant.sell_point
     if why_now_val:
-        tags.append(ElementTag(element_type="why_now", element_value=why_now_val))
+        elements.append(("why_now", why_now_val))
 
     # sell_point：说服层表达（why_you + why_now 的可读综合）
     if variant.sell_point:
-        tags.append(ElementTag(element_type="sell_point", element_value=variant.sell_point))
+        elements.append(("sell_point", variant.sell_point))
 
     # cta
     if variant.cta_type:
-        tags.append(ElementTag(element_type="cta", element_value=variant.cta_type))
+        elements.append(("cta", variant.cta_type))
 
     # asset：从 asset_variables 拆出多个 asset 标签
     asset = variant.asset_variables
     if isinstance(asset, dict):
         for k, v in asset.items():
             if v and isinstance(v, str):
-                tags.append(ElementTag(element_type="asset", element_value=f"{k}={v}"))
+                elements.append(("asset", f"{k}={v}"))
     else:
         if asset.subtitle_template:
-            tags.append(
-                ElementTag(element_type="asset", element_value=f"subtitle_template={asset.subtitle_template}")
-            )
+            elements.append(("asset", f"subtitle_template={asset.subtitle_template}"))
         if asset.bgm:
-            tags.append(ElementTag(element_type="asset", element_value=f"bgm={asset.bgm}"))
+            elements.append(("asset", f"bgm={asset.bgm}"))
         if asset.rhythm:
-            tags.append(ElementTag(element_type="asset", element_value=f"rhythm={asset.rhythm}"))
+            elements.append(("asset", f"rhythm={asset.rhythm}"))
         if asset.shot_template:
-            tags.append(
-                ElementTag(element_type="asset", element_value=f"shot_template={asset.shot_template}")
-            )
+            elements.append(("asset", f"shot_template={asset.shot_template}"))
+
+    return elements
 
-    return tags
+
+def variant_element_ids(variant: Variant) -> tuple[int, ...]:
+    """Variant → 元素 id 元组（按内容缓存，顺序与 decompose_variant_to_element_tags 一致）"""
+    key = _decompose_key(variant)
+    with _element_lock:
+        ids = _decompose_cache.get(key)
+        if ids is not None:
+            _decompose_cache.move_to_end(key)
+            return ids
+    ids = tuple(element_id(et, ev) for et, ev in _decompose_elements(variant))
+    with _element_lock:
+        _decompose_cache[key] = ids
+        while len(_decompose_cache) > DECOMPOSE_CACHE_MAXSIZE:
+            _decompose_cache.popitem(last=False)
+    return ids
+
+
+def clear_decompose_cache(*, reset_ids: bool = False) -> None:
+    """
+    清空变体拆解缓存。reset_ids=True 时同时清空元素驻留表（两代都丢弃），
+    之前拿到的元素 id 失效——只在两次评测 / DAG 运行之间调用。
+    """
+    global _element_gen, _element_prev
+    with _element_lock:
+        _decompose_cache.clear()
+        if reset_ids:
+            _element_gen, _element_prev = _ElementGeneration(), _ElementGeneration()
+
+
+def decompose_variant_to_element_tags(variant: Variant) -> list[ElementTag]:
+    """
+    将 Variant 拆解为一组 ElementTag。
+    用于结构级 Gate 判断 + 元素级贡献分析。
+    结果按变体内容缓存，返回的 ElementTag 为共享的不可变实例（列表本身每次新建）。
+    """
+    return [element_tag(eid) for eid in variant_element_ids(variant)]
 
 
 # -------- 三层评测集模型 --------
@@ -6,10 +6,11 @@
 """
 from __future__ import annotations
 
-import hashlib
+import gc
 import random
+from array import array
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Any, Iterable
 
 from eval_schemas import StrategyCard, Variant
 
@@ -42,10 +43,11 @@ def _normalize_card_fields(
     return mb_norm, wy_key_norm, wy_label_norm, wn_norm
 
 
-from explore_gate import evaluate_explore_gate
+from explore_gate import ExploreGateResult, evaluate_explore_gate
 from ofaat_generator import generate_ofaat_variants
+from rng_streams import seeded
 from simulate_metrics import simulate_metrics
-from validate_gate import WindowMetrics, evaluate_validate_gate
+from validate_gate import ValidateGateResult, WindowMetrics, evaluate_validate_gate
 from vertical_config import get_corpus, get_why_you_options
 
 # 状态：未测 -> 探索中 -> 进验证 -> 可放量
@@ -53,8 +55,7 @@ CARD_STATUSES = ("未测", "探索中", "进验证", "可放量")
 
 
 def _seeded(seed: str) -> random.Random:
-    h = hashlib.sha256(seed.encode()).hexdigest()
-    return random.Random(int(h[:16], 16) % (2**32))
+    return seeded(seed)
 
 
 @dataclass
@@ -71,21 +72,284 @@ class CardEvalRecord:
     expand_segment_metrics: WindowMetrics | None = None
 
 
+# -------- 紧凑表示（大评测集常驻内存）--------
+#
+# CardEvalRecord 每卡约 30KB（十几个 pydantic 对象 + 各自的字符串）。紧凑版把模型存为「按字段顺序的取值元组」，
+# 同一评测集内重复的字符串 / 纯字符串元组只保留一份，窗口指标存 array('d')；每卡约 3KB。
+# 访问 card / variants / explore_* / validate_result / window_metrics 时才构建 pydantic 对象（只读，每次返回新对象）。
+
+_MISSING = object()
+_CARD_FIELDS = tuple(StrategyCard.model_fields)
+_CARD_ID_INDEX = _CARD_FIELDS.index("card_id")
+_VARIANT_FIELDS = tuple(Variant.model_fields)
+_EXPLORE_FIELDS = tuple(ExploreGateResult.model_fields)
+_VALIDATE_FIELDS = tuple(ValidateGateResult.model_fields)
+_WINDOW_NUMERIC = tuple(f for f in WindowMetrics.model_fields if f != "window_id")
+_WINDOW_INT = frozenset(f for f in _WINDOW_NUMERIC if WindowMetrics.model_fields[f].annotation is int)
+
+
+class _Pairs(tuple):
+    """冻结后的 dict：((key, value), ...)，与普通 tuple（冻结后的 list）区分"""
+
+    __slots__ = ()
+
+
+class InternPool:
+    """
+    评测集级去重池：字符串、以及只含字符串 / None 的元组（含 dict 冻结后的键值对）相同即共用一个对象。
+    含数字的元组不入池（1 == 1.0 == True，入池会改变取值类型）。池只在构建期间需要，之后可丢弃。
+    """
+
+    __slots__ = ("_strings", "_tuples")
+
+    def __init__(self) -> None:
+        self._strings: dict[str, str] = {}
+        self._tuples: dict[tuple, tuple] = {}
+
+    def _freeze(self, v: Any) -> tuple[Any, bool]:
+        """→ (冻结值, 是否可入池)"""
+        t = type(v)
+        if t is str:
+            return self._strings.setdefault(v, v), True
+        if v is None:
+            return None, True
+        if t is dict:
+            strings = self._strings
+            tuples = self._tuples
+            items = []
+            shareable = True
+            for k, x in v.items():
+                # 字符串 / None 取值内联处理，只有嵌套结构才递归
+                if type(x) is str:
+                    fx, ok = strings.setdefault(x, x), True
+                elif x is None:
+                    fx, ok = None, True
+                else:
+                    fx, ok = self._freeze(x)
+                if ok and type(k) is str:
+                    pair = (strings.setdefault(k, k), fx)
+                    pair = tuples.setdefault((tuple, pair), pair)
+                else:
+                    pair = (k, fx)
+                    shareable = False
+                items.append(pair)
+            return self._share(_Pairs(items), shareable)
+        if t is list or t is tuple:
+            return self._freeze_seq(v)
+        return v, False
+
+    def _freeze_seq(self, v: Iterable[Any]) -> tuple[tuple, bool]:
+        strings = self._strings
+        out = []
+        shareable = True
+        for x in v:
+            if type(x) is str:
+                out.append(strings.setdefault(x, x))
+            elif x is None:
+                out.append(None)
+            else:
+                fx, ok = self._freeze(x)
+                out.append(fx)
+                shareable = shareable and ok
+        return self._share(tuple(out), shareable)
+
+    def _share(self, value: tuple, shareable: bool) -> tuple[tuple, bool]:
+        if not shareable:
+            return value, False
+        return self._tuples.setdefault((type(value), value), value), True
+
+    def freeze(self, v: Any) -> Any:
+        """model_dump 结果 → 不可变结构：dict → _Pairs，list → tuple，重复取值共用"""
+        return self._freeze(v)[0]
+
+    def freeze_model(self, fields: tuple[str, ...], data: dict[str, Any]) -> tuple:
+        """模型 dump → 按字段顺序的取值元组（缺失字段记哨兵，还原时交给模型默认值）"""
+        return self._freeze_seq([data.get(f, _MISSING) for f in fields])[0]
+
+
+def _thaw(v: Any) -> Any:
+    t = type(v)
+    if t is _Pairs:
+        return {k: _thaw(x) for k, x in v}
+    if t is tuple:
+        return [_thaw(x) for x in v]
+    return v
+
+
+def _thaw_model(fields: tuple[str, ...], values: tuple) -> dict[str, Any]:
+    return {f: _thaw(x) for f, x in zip(fields, values) if x is not _MISSING}
+
+
+class CompactCardEvalRecord:
+    """
+    CardEvalRecord 的紧凑只读版，属性与 CardEvalRecord 同名（UI / API 代码无需区分）。
+    to_record() 还原为普通 CardEvalRecord。
+    """
+
+    __slots__ = ("_card", "card_score", "status", "_variants", "_explore", "_validate", "_window_ids", "_windows", "_n_windows")
+
+    @classmethod
+    def from_dumps(
+        cls,
+        *,
+        card: dict[str, Any],
+        card_score: float,
+        status: str,
+        variants: Iterable[dict[str, Any]],
+        explore_ios: dict[str, Any] | None,
+        explore_android: dict[str, Any] | None,
+        validate_result: dict[str, Any] | None,
+        window_metrics: Iterable[dict[str, Any]],
+        expand_segment_metrics: dict[str, Any] | None,
+        pool: InternPool,
+    ) -> "CompactCardEvalRecord":
+        """由各模型的 model_dump（或快照行 dict）构建，不经过 pydantic 校验"""
+        self = cls.__new__(cls)
+        self._card = pool.freeze_model(_CARD_FIELDS, card)
+        self.card_score = float(card_score)
+        self.status = pool.freeze(status)
+        card_id = card.get("card_id")
+        vs = []
+        for v in variants:
+            # parent_card_id 与卡相同的记 None，同构变体（同 id / 同取值）即可跨卡共用
+            if v.get("parent_card_id") == card_id:
+                v = {**v, "parent_card_id": None}
+            vs.append(pool.freeze_model(_VARIANT_FIELDS, v))
+        self._variants = tuple(vs)
+        self._explore = tuple(
+            pool.freeze_model(_EXPLORE_FIELDS, e) if e is not None else None for e in (explore_ios, explore_android)
+        )
+        self._validate = pool.freeze_model(_VALIDATE_FIELDS, validate_result) if validate_result is not None else None
+        rows = list(window_metrics)
+        self._n_windows = len(rows)
+        if expand_segment_metrics is not None:
+            rows.append(expand_segment_metrics)
+        self._window_ids = pool.freeze(tuple(r.get("window_id", "") for r in rows))
+        self._windows = array("d", [float(r.get(f) or 0.0) for r in rows for f in _WINDOW_NUMERIC])
+        return self
+
+    @classmethod
+    def from_record(cls, record: CardEvalRecord, *, pool: InternPool) -> "CompactCardEvalRecord":
+        def _dump(m: Any) -> dict[str, Any] | None:
+            return m.model_dump() if m is not None else None
+
+        return cls.from_dumps(
+            card=record.card.model_dump(),
+            card_score=record.card_score,
+            status=record.status,
+            variants=[v.model_dump() for v in record.variants],
+            explore_ios=_dump(record.explore_ios),
+            explore_android=_dump(record.explore_android),
+            validate_result=_dump(record.validate_result),
+            window_metrics=[w.model_dump() for w in record.window_metrics],
+            expand_segment_metrics=_dump(record.expand_segment_metrics),
+            pool=pool,
+        )
+
+    # -- 按需构建的 pydantic 视图 --
+
+    @property
+    def card_id(self) -> str:
+        return self._card[_CARD_ID_INDEX]
+
+    @property
+    def card(self) -> StrategyCard:
+        return StrategyCard.model_validate(_thaw_model(_CARD_FIELDS, self._card))
+
+    @property
+    def variants(self) -> list[Variant]:
+        card_id = self.card_id
+        out = []
+        for values in self._variants:
+            data = _thaw_model(_VARIANT_FIELDS, values)
+            if data.get("parent_card_id") is None:
+                data["parent_card_id"] = card_id
+            out.append(Variant.model_validate(data))
+        return out
+
+    def _explore_at(self, i: int) -> ExploreGateResult | None:
+        values = self._explore[i]
+        return ExploreGateResult.model_validate(_thaw_model(_EXPLORE_FIELDS, values)) if values is not None else None
+
+    @property
+    def explore_ios(self) -> ExploreGateResult | None:
+        return self._explore_at(0)
+
+    @property
+    def explore_android(self) -> ExploreGateResult | None:
+        return self._explore_at(1)
+
+    @property
+    def validate_result(self) -> ValidateGateResult | None:
+        if self._validate is None:
+            return None
+        return ValidateGateResult.model_validate(_thaw_model(_VALIDATE_FIELDS, self._validate))
+
+    def _window(self, i: int) -> WindowMetrics:
+        w = len(_WINDOW_NUMERIC)
+        data: dict[str, Any] = {"window_id": self._window_ids[i]}
+        for f, x in zip(_WINDOW_NUMERIC, self._windows[i * w:(i + 1) * w]):
+            data[f] = int(x) if f in _WINDOW_INT else x
+        return WindowMetrics.model_validate(data)
+
+    @property
+    def window_metrics(self) -> list[WindowMetrics]:
+        return [self._window(i) for i in range(self._n_windows)]
+
+    @property
+    def expand_segment_metrics(self) -> WindowMetrics | None:
+        return self._window(self._n_windows) if len(self._window_ids) > self._n_windows else None
+
+    def to_record(self) -> CardEvalRecord:
+        return CardEvalRecord(
+            card=self.card,
+            card_score=self.card_score,
+            status=self.status,
+            variants=self.variants,
+            explore_ios=self.explore_ios,
+            explore_android=self.explore_android,
+            validate_result=self.validate_result,
+            window_metrics=self.window_metrics,
+            expand_segment_metrics=self.expand_segment_metrics,
+        )
+
+    def __repr__(self) -> str:
+        return f"CompactCardEvalRecord(card_id={self.card_id!r}, status={self.status!r}, variants={len(self._variants)})"
+
+
+def compact_eval_set(records: Iterable[CardEvalRecord], *, pool: InternPool | None = None) -> list[CompactCardEvalRecord]:
+    """CardEvalRecord 列表 → 紧凑列表（共用一个去重池）"""
+    pool = pool or InternPool()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return [
+            r if isinstance(r, CompactCardEvalRecord) else CompactCardEvalRecord.from_record(r, pool=pool)
+            for r in records
+        ]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
 def generate_eval_set(
     n_cards: int = 75,
     variants_per_card: int = 12,
     *,
     status_dist: dict[str, float] | None = None,
-) -> list[CardEvalRecord]:
+    compact: bool = False,
+) -> list[CardEvalRecord] | list[CompactCardEvalRecord]:
     """
     生成评测集：n_cards 张 StrategyCard，每张至少 variants_per_card 个变体。
     状态分布：未测/探索中/进验证/可放量，默认各约 25%。
+    compact=True 时逐卡转为 CompactCardEvalRecord（大评测集峰值内存只多一张卡的完整对象）。
     """
     status_dist = status_dist or {
         "未测": 0.25, "探索中": 0.30, "进验证": 0.25, "可放量": 0.20,
     }
     rng = _seeded("eval_set_v1")
-    records: list[CardEvalRecord] = []
+    records: list[Any] = []
+    pool = InternPool() if compact else None
 
     for i in range(n_cards):
         cid = f"sc_{i+1:03d}"
@@ -196,7 +460,7 @@ def generate_eval_set(
             )
             validate_result = evaluate_validate_gate(window_metrics, expand_metrics)
 
-        records.append(CardEvalRecord(
+        record = CardEvalRecord(
             card=card,
             card_score=card_score,
             status=status,
@@ -206,6 +470,7 @@ def generate_eval_set(
             validate_result=validate_result,
             window_metrics=window_metrics,
             expand_segment_metrics=expand_metrics,
-        ))
+        )
+        records.append(CompactCardEvalRecord.from_record(record, pool=pool) if pool is not None else record)
 
     return records
@@ -4,15 +4,22 @@
 【核心】CreativeSet / EvaluationSet 本质是 CreativeCard 的组合。
 - 每张卡 = 一组结构变量（hook / sell_point / CTA / 动机桶 等）
 - 不是一个 mp4；视频是渲染结果，不参与结构胜率统计
+
+【大卡库】allocation="proportional" / "neyman" 时只枚举卡库中实际出现的层：
+每层一个卡列表，部分 Fisher–Yates 洗牌 O(1) 取一张，50 万卡库抽 1000 张 < 1s。
+allocation="collapsed" 时稀疏层逐级并入上一级、合成卡封顶；卡库稀疏时可能少于 target_n（见 shortfall）。
 """
 from __future__ import annotations
 
-import hashlib
+import math
 import random
 from dataclasses import dataclass, field
-from typing import Any
+from operator import attrgetter
+from typing import Any, Callable
 
 from eval_schemas import StrategyCard
+from rng_streams import seeded
+from strata_alloc import WILDCARD, allocate_capped, collapse_strata
 
 # 分层维度可选值
 VERTICALS = ("casual_game", "ecommerce")
@@ -22,8 +29,7 @@ MOTIVATION_BUCKETS = ("省钱", "体验", "成就感", "爽感", "品质", "口
 
 
 def _seeded(seed: str) -> random.Random:
-    h = hashlib.sha256(seed.encode()).hexdigest()
-    return random.Random(int(h[:16], 16) % (2**32))
+    return seeded(seed)
 
 
 @dataclass
@@ -36,6 +42,9 @@ class StructureEvaluationSet:
     cards: list[StrategyCard] = field(default_factory=list)
     baseline_by_layer: dict[str, StrategyCard] = field(default_factory=dict)
     stratum_keys: list[str] = field(default_factory=list)
+    quota: dict[str, int] = field(default_factory=dict)
+    # 实际张数比 target_n 少的数量（proportional / neyman 卡库不足，或 collapsed 合成卡已达上限时 > 0）
+    shortfall: int = 0
 
 
 def _stratum_key(vertical: str, country: str, segment: str, mb: str) -> str:
@@ -77,6 +86,171 @@ def _make_synthetic_card(
     )
 
 
+# -------- 大卡库：只枚举有卡的层 --------
+
+
+def _partial_shuffle_take(items: list, k: int, rng: random.Random) -> list:
+    """部分 Fisher–Yates：原地把随机 k 个换到前面，每次 O(1)，不复制整层"""
+    n = len(items)
+    for i in range(min(k, n)):
+        j = rng.randrange(i, n)
+        items[i], items[j] = items[j], items[i]
+    return items[:k]
+
+
+def _stratum_sd(cards: list, value_fn: Callable[[Any], float], rng: random.Random, *, max_n: int = 500) -> float:
+    """Welford 单遍方差 → 标准差（Neyman 分配用）；大层只看随机 max_n 张，估 S_h 足够"""
+    if len(cards) > max_n:
+        cards = rng.sample(cards, max_n)
+    n, mean, m2 = 0, 0.0, 0.0
+    for c in cards:
+        x = float(value_fn(c))
+        n += 1
+        d = x - mean
+        mean += d / n
+        m2 += d * (x - mean)
+    return math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+
+
+def _bucket_pool(
+    card_pool: list,
+    verticals: tuple[str, ...],
+    countries: tuple[str, ...],
+    segments: tuple[str, ...],
+    motivation_buckets: tuple[str, ...],
+) -> dict[tuple[str, str, str, str], list]:
+    """卡库按 (vertical, country, segment, mb) 分桶，只保留各维取值在给定范围内的卡"""
+    allowed = (set(verticals), set(countries), set(segments), set(motivation_buckets))
+    # 单遍分桶：attrgetter 一次取四个字段；空值归一只在少见的 None / 空动机桶上走慢路径
+    get_key = attrgetter("vertical", "country", "segment", "motivation_bucket")
+    by_id = {c.card_id: c for c in card_pool}  # 同 card_id 只保留一张
+    pool_by_stratum: dict[tuple[str, str, str, str], list] = {}
+    rejected: set[tuple] = set()
+    for c in by_id.values():
+        key = get_key(c)
+        bucket = pool_by_stratum.get(key)
+        if bucket is None:
+            if key in rejected:
+                continue
+            if None in key or not key[3]:
+                key = (key[0] or "", key[1] or "", key[2] or "", key[3] or "其他")
+                bucket = pool_by_stratum.get(key)
+            if bucket is None:
+                if not all(k in a for k, a in zip(key, allowed)):
+                    rejected.add(get_key(c))
+                    continue
+                bucket = pool_by_stratum[key] = []
+        bucket.append(c)
+    return pool_by_stratum
+
+
+def _sample_populated(
+    target_n: int,
+    *,
+    allocation: str,
+    pool_by_stratum: dict[tuple[str, str, str, str], list],
+    value_fn: Callable[[Any], float] | None,
+    min_per_stratum: int,
+    rng: random.Random,
+) -> StructureEvaluationSet:
+    keys = sorted(pool_by_stratum)
+    sizes = [len(pool_by_stratum[k]) for k in keys]
+    if allocation == "neyman" and value_fn is not None:
+        weights = [sz * _stratum_sd(pool_by_stratum[k], value_fn, rng) for k, sz in zip(keys, sizes)]
+        if not any(weights):
+            weights = [float(sz) for sz in sizes]
+    else:
+        weights = [float(sz) for sz in sizes]
+    min_per = min_per_stratum if target_n >= len(keys) * min_per_stratum else 0
+    quotas = allocate_capped(target_n, sizes, weights, min_per=min_per)
+
+    cards: list[StrategyCard] = []
+    baseline_by_layer: dict[str, StrategyCard] = {}
+    quota_out: dict[str, int] = {}
+    for key, q in zip(keys, quotas):
+        if q <= 0:
+            continue
+        skey = _stratum_key(*key)
+        chosen = _partial_shuffle_take(pool_by_stratum[key], q, rng)
+        cards.extend(chosen)
+        baseline_by_layer[skey] = chosen[0]
+        quota_out[skey] = q
+    return StructureEvaluationSet(
+        cards=cards,
+        baseline_by_layer=baseline_by_layer,
+        stratum_keys=list(quota_out),
+        quota=quota_out,
+        shortfall=max(0, target_n - len(cards)),
+    )
+
+
+def _sample_collapsed(
+    target_n: int,
+    *,
+    dims: tuple[tuple[str, ...], ...],
+    pool_by_stratum: dict[tuple[str, str, str, str], list],
+    min_stratum_size: int,
+    max_synthetic: int,
+    rng: random.Random,
+) -> StructureEvaluationSet:
+    """
+    稀疏层合并：卡数 < min_stratum_size 的层逐级并入上一级（mb → segment → country），
+    层数不超过 target_n；每层 ≥1 张、其余按卡数比例。卡库不足时合成卡至多 max_synthetic 张，
+    仍凑不满 target_n 的缺口记入 shortfall。
+    """
+    counts = {k: len(v) for k, v in pool_by_stratum.items()}
+    for v in dims[0]:
+        # 每个 vertical 至少保留一层；无卡的 vertical 只能靠合成卡覆盖
+        if not any(k[0] == v for k in counts):
+            counts[(v, WILDCARD, WILDCARD, WILDCARD)] = 0
+    key_of = collapse_strata(counts, min_size=min_stratum_size, max_strata=target_n, keep_levels=1)
+    groups: dict[tuple[str, ...], list] = {}
+    for leaf, g in key_of.items():
+        groups.setdefault(g, []).extend(pool_by_stratum.get(leaf, ()))
+
+    keys = sorted(groups)
+    sizes = [len(groups[k]) for k in keys]
+    # 合成卡：先给无卡层各留 1 张（覆盖优先），再补卡库总量不足的缺口，合计不超过 max_synthetic
+    synth = [0] * len(keys)
+    budget = max_synthetic
+    for i, sz in enumerate(sizes):
+        if sz == 0 and budget > 0 and sum(synth) < target_n:
+            synth[i] = 1
+            budget -= 1
+    pool_target = target_n - sum(synth)
+    n_populated = sum(1 for sz in sizes if sz)
+    quotas = allocate_capped(pool_target, sizes, [float(sz) for sz in sizes], min_per=1 if pool_target >= n_populated else 0)
+    total = sum(quotas) + sum(synth)
+    shortfall = min(budget, target_n - total)
+    if shortfall > 0:
+        extra = allocate_capped(shortfall, [shortfall] * len(keys), [float(max(sz, 1)) for sz in sizes])
+        synth = [a + b for a, b in zip(synth, extra)]
+
+    cards: list[StrategyCard] = []
+    baseline_by_layer: dict[str, StrategyCard] = {}
+    quota_out: dict[str, int] = {}
+    card_idx = 0
+    for key, q, n_syn in zip(keys, quotas, synth):
+        if q + n_syn <= 0:
+            continue
+        skey = _stratum_key(*key)
+        chosen = _partial_shuffle_take(groups[key], q, rng) if q else []
+        for _ in range(n_syn):
+            card_idx += 1
+            concrete = [rng.choice(vals) if x == WILDCARD else x for x, vals in zip(key, dims)]
+            chosen.append(_make_synthetic_card(f"sc_sampled_{card_idx:04d}", *concrete, rng))
+        cards.extend(chosen)
+        baseline_by_layer[skey] = chosen[0]
+        quota_out[skey] = q + n_syn
+    return StructureEvaluationSet(
+        cards=cards,
+        baseline_by_layer=baseline_by_layer,
+        stratum_keys=list(quota_out),
+        quota=quota_out,
+        shortfall=max(0, target_n - len(cards)),
+    )
+
+
 def sample_eval_set(
     target_n: int = 75,
     *,
@@ -87,14 +261,53 @@ def sample_eval_set(
     card_pool: list[StrategyCard] | None = None,
     use_card_library: bool = True,
     seed: str = "evalset_sampler",
+    allocation: str = "uniform",
+    value_fn: Callable[[Any], float] | None = None,
+    min_per_stratum: int = 1,
+    min_stratum_size: int = 5,
+    max_synthetic: int | None = None,
 ) -> StructureEvaluationSet:
     """
     分层抽样生成评测集。
-    - 每层至少 1 张卡；配额不足则回退到「其他」桶
+    - allocation="uniform"（默认）：枚举全部层，每层至少 1 张卡；卡库不足用合成卡补齐
+    - allocation="proportional"：只用卡库中出现的层，配额 ∝ 层内卡数 N_h；不合成、不抬高 target_n（卡库不足时缺口见 shortfall）
+    - allocation="neyman"：配额 ∝ N_h·S_h，S_h 为 value_fn(card)（如历史卡分）的层内标准差
+      （min_per_stratum 仅在 target_n 足够覆盖所有有卡的层时生效）
+    - allocation="collapsed"：卡数 < min_stratum_size 的稀疏层逐级并入上一级，层数 ≤ target_n；
+      合成卡至多 max_synthetic 张（默认 target_n 的 10%），评测集大小不再被层数抬高；
+      卡库稀疏时张数可能不足 target_n，缺口见返回值 shortfall
     - 若 card.os=all，则自动视为支持 iOS/Android 双端实验
     """
+    if allocation not in ("uniform", "proportional", "neyman", "collapsed"):
+        raise ValueError(f"未知 allocation: {allocation}")
     rng = _seeded(seed)
 
+    if allocation != "uniform":
+        if card_pool is None and use_card_library:
+            try:
+                from card_library import load_cards
+                card_pool = load_cards()
+            except Exception:
+                card_pool = []
+        pool_by_stratum = _bucket_pool(card_pool or [], verticals, countries, segments, motivation_buckets)
+        if allocation == "collapsed":
+            return _sample_collapsed(
+                target_n,
+                dims=(verticals, countries, segments, motivation_buckets),
+                pool_by_stratum=pool_by_stratum,
+                min_stratum_size=min_stratum_size,
+                max_synthetic=math.ceil(0.1 * target_n) if max_synthetic is None else max_synthetic,
+                rng=rng,
+            )
+        return _sample_populated(
+            target_n,
+            allocation=allocation,
+            pool_by_stratum=pool_by_stratum,
+            value_fn=value_fn,
+            min_per_stratum=min_per_stratum,
+            rng=rng,
+        )
+
     # 1. 构建层级与配额
     strata: list[tuple[str, str, str, str]] = []
     for v in verticals:
@@ -132,11 +345,14 @@ def sample_eval_set(
     # 3. 从 card_pool 或合成卡片填充
     cards: list[StrategyCard] = []
     baseline_by_layer: dict[str, StrategyCard] = {}
-    used_from_pool: set[str] = set()
+    seen_ids: set[str] = set()
     pool_by_stratum: dict[str, list[StrategyCard]] = {}
 
     if card_pool:
         for c in card_pool:
+            if c.card_id in seen_ids:
+                continue
+            seen_ids.add(c.card_id)
             v = getattr(c, "vertical", "") or ""
             cn = getattr(c, "country", "") or ""
             seg = getattr(c, "segment", "") or ""
@@ -149,16 +365,12 @@ def sample_eval_set(
         key = _stratum_key(v, c, s, mb)
         q = quota.get(key, 1)
         pool = pool_by_stratum.get(key, [])
-        for _ in range(q):
-            if pool:
-                cand = [x for x in pool if x.card_id not in used_from_pool]
-                if cand:
-                    chosen = rng.choice(cand)
-                    used_from_pool.add(chosen.card_id)
-                    cards.append(chosen)
-                    if key not in baseline_by_layer:
-                        baseline_by_layer[key] = chosen
-                    continue
+        # 每层一次部分洗牌取 q 张（卡各属唯一一层，不会跨层重复），不足部分再合成
+        taken = _partial_shuffle_take(pool, q, rng) if pool else []
+        cards.extend(taken)
+        if taken:
+            baseline_by_layer[key] = taken[0]
+        for _ in range(q - len(taken)):
             card_idx += 1
             cid = f"sc_sampled_{card_idx:04d}"
             synthetic = _make_synthetic_card(cid, v, c, s, mb, rng)
@@ -170,4 +382,5 @@ def sample_eval_set(
         cards=cards,
         baseline_by_layer=baseline_by_layer,
         stratum_keys=list(quota.keys()),
+        quota=quota,
     )
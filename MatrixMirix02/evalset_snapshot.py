@@ -0,0 +1,526 @@
+"""
+评测集二进制快照：把 generate_eval_set 产出的 CardEvalRecord 列表存成紧凑的列式文件，
+新会话直接加载，不必重新模拟（5 万张卡的评测集重新生成要数分钟，加载约 1 秒）。
+
+文件布局（小端）：
+- 头部：magic b"EVSNAP\\0\\0" | 格式版本 u16 | 压缩方式 u8（0 无 / 1 zlib / 2 zstd）| 清单长度 u32 | 清单 CRC32 u32
+- 清单：JSON（不压缩），记录各表行数、各列类型与数据段的偏移 / 长度
+- 数据段：8 字节对齐，每列一段（按头部压缩方式单独压缩）
+  - str 列：u32 字典下标（全文件共用一个字符串字典，0 号表示 None）
+  - i64 / f64 / bool 列：定长数组原始字节
+  - json 列：嵌套结构（list / dict / 子模型）序列化为 JSON 后按 str 列存（重复值只存一份）
+- 字符串字典：UTF-8，以 \\0 分隔，加载时整段一次解码 + split
+
+表：
+- records：每卡一行（card.* 字段、card_score、status、变体 / 窗口起止偏移、validate / expand 行号）
+- variants / explore（每卡 iOS、Android 两行）/ validate / windows / expand
+
+加载：
+- 未压缩时直接 mmap + memoryview.cast，零拷贝；压缩时逐段解压
+- load_eval_set 返回 EvalSetSnapshot（只读序列）：按下标懒构建 pydantic 对象；
+  column() 直接取列值（看板筛选 / 统计不必构建对象）；to_list(compact=True) 直接构建紧凑记录
+- magic / 格式版本 / 清单校验不符 → ValueError
+"""
+from __future__ import annotations
+
+import gc
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from path_config import REPO_ROOT
+except ImportError:
+    REPO_ROOT = Path(__file__).resolve().parent.parent
+
+from eval_schemas import StrategyCard, Variant
+from eval_set_generator import CardEvalRecord, CompactCardEvalRecord, InternPool
+from explore_gate import ExploreGateResult
+from validate_gate import ValidateGateResult, WindowMetrics
+
+SNAPSHOT_MAGIC = b"EVSNAP\0\0"
+# 布局或表结构变更时递增，旧快照加载时报错（需重新生成）
+SNAPSHOT_FORMAT_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = REPO_ROOT / "data" / "eval_snapshots"
+SNAPSHOT_SUFFIX = ".evs"
+
+_HEADER = struct.Struct("<8sHBxII")
+_ALIGN = 8
+_CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+_CODEC_NAMES = {v: k for k, v in _CODECS.items()}
+# 列类型 → array typecode
+_TYPECODES = {"str": "I", "json": "I", "i64": "q", "f64": "d", "bool": "B"}
+# 迭代 / to_list 时每批构建的卡数
+_ITER_CHUNK = 512
+
+
+# -------- 写入 --------
+
+
+class _StringPool:
+    """字符串字典：0 号保留给 None"""
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.values: list[str] = [""]
+
+    def id_of(self, s: str | None) -> int:
+        if s is None:
+            return 0
+        i = self.ids.get(s)
+        if i is None:
+            if "\0" in s:
+                raise ValueError(f"字符串含 \\0，无法写入快照：{s[:40]!r}")
+            i = self.ids[s] = len(self.values)
+            self.values.append(s)
+        return i
+
+
+def _infer_kind(values: list[Any]) -> str:
+    """按整列取值推断列类型；含 None 的非字符串列、嵌套结构一律按 json 存"""
+    types = {type(v) for v in values}
+    if types <= {str, type(None)}:
+        return "str"
+    if types == {bool}:
+        return "bool"
+    if types == {int}:
+        return "i64"
+    if types <= {int, float}:
+        return "f64"
+    return "json"
+
+
+_EMPTY_JSON = {list: "[]", dict: "{}"}
+
+
+def _encode_column(kind: str, values: list[Any], pool: _StringPool) -> bytes:
+    if kind == "str":
+        return array("I", [pool.id_of(v) for v in values]).tobytes()
+    if kind == "json":
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str).encode
+        # 空 list / dict 占 json 列的大多数，跳过编码器
+        return array("I", [
+            pool.id_of(None if v is None else (_EMPTY_JSON[type(v)] if not v and type(v) in _EMPTY_JSON else dumps(v)))
+            for v in values
+        ]).tobytes()
+    if kind == "bool":
+        return array("B", [1 if v else 0 for v in values]).tobytes()
+    return array(_TYPECODES[kind], values).tobytes()
+
+
+def _table_columns(rows: list[dict[str, Any]]) -> dict[str, list[Any]]:
+    """行 dict → 列（列名取所有行的并集，缺失记 None）"""
+    names: dict[str, None] = {}
+    for row in rows:
+        for k in row:
+            names.setdefault(k)
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def _compressor(codec: int, level: int | None):
+    if codec == 1:
+        return lambda b: zlib.compress(b, 6 if level is None else level)
+    if codec == 2:
+        cctx = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return cctx.compress
+    return None
+
+
+def _resolve_codec(compression: str) -> int:
+    if compression == "auto":
+        return _CODECS["zstd" if zstandard is not None else "zlib"]
+    if compression not in _CODECS:
+        raise ValueError(f"未知压缩方式：{compression}，可选 auto / none / zlib / zstd")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("未安装 zstandard，请改用 compression='zlib' 或 pip install zstandard")
+    return _CODECS[compression]
+
+
+def _record_tables(records: Iterable[CardEvalRecord]) -> dict[str, list[dict[str, Any]]]:
+    """CardEvalRecord → 各表行（嵌套对象按表展开，records 表记录行号 / 起止偏移）"""
+    tables: dict[str, list[dict[str, Any]]] = {
+        "records": [], "variants": [], "explore": [], "validate": [], "windows": [], "expand": [],
+    }
+    for r in records:
+        row: dict[str, Any] = {f"card.{k}": v for k, v in r.card.model_dump().items()}
+        row["card_score"] = float(r.card_score)
+        row["status"] = r.status
+        row["variant_start"] = len(tables["variants"])
+        tables["variants"].extend(v.model_dump() for v in r.variants)
+        row["window_start"] = len(tables["windows"])
+        tables["windows"].extend(w.model_dump() for w in r.window_metrics)
+        for exp in (r.explore_ios, r.explore_android):
+            tables["explore"].append(exp.model_dump() if exp is not None else {"gate_status": None})
+        row["validate_row"] = len(tables["validate"]) if r.validate_result is not None else -1
+        if r.validate_result is not None:
+            tables["validate"].append(r.validate_result.model_dump())
+        row["expand_row"] = len(tables["expand"]) if r.expand_segment_metrics is not None else -1
+        if r.expand_segment_metrics is not None:
+            tables["expand"].append(r.expand_segment_metrics.model_dump())
+        tables["records"].append(row)
+    return tables
+
+
+def save_eval_set(
+    records: Iterable[CardEvalRecord],
+    path: str | Path,
+    *,
+    compression: str = "auto",
+    level: int | None = None,
+) -> Path:
+    """
+    把评测集写成快照文件，返回路径。
+    compression：auto（有 zstandard 用 zstd，否则 zlib）/ none（可 mmap 零拷贝）/ zlib / zstd。
+    先写临时文件再 os.replace，写一半中断不会留下损坏的快照。
+    """
+    codec = _resolve_codec(compression)
+    compress = _compressor(codec, level)
+    # 展开时创建上百万个行 dict，暂停分代 GC
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        tables = _record_tables(records)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    pool = _StringPool()
+
+    segments: list[bytes] = []
+    manifest: dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "record_type": "CardEvalRecord",
+        "tables": {},
+    }
+    # 段偏移相对数据区起点（清单 data_offset），清单长度不影响段内容
+    pos = 0
+
+    def _add_segment(raw: bytes) -> dict[str, int]:
+        nonlocal pos
+        data = compress(raw) if compress is not None else raw
+        spec = {"offset": pos, "length": len(data), "raw_length": len(raw)}
+        pad = -len(data) % _ALIGN
+        segments.append(data + b"\0" * pad)
+        pos += len(data) + pad
+        return spec
+
+    for name, rows in tables.items():
+        cols: dict[str, Any] = {}
+        for col, values in _table_columns(rows).items():
+            kind = _infer_kind(values)
+            cols[col] = {"kind": kind, **_add_segment(_encode_column(kind, values, pool))}
+        manifest["tables"][name] = {"rows": len(rows), "columns": cols}
+    manifest["strings"] = {"count": len(pool.values), **_add_segment("\0".join(pool.values).encode("utf-8"))}
+
+    # 数据区起点依赖清单长度，清单长度又依赖偏移的位数：迭代到稳定
+    base = 0
+    while True:
+        manifest["data_offset"] = base
+        blob = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        start = _HEADER.size + len(blob)
+        start += -start % _ALIGN
+        if start == base:
+            break
+        base = start
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, codec, len(blob), zlib.crc32(blob))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(blob)
+        f.write(b"\0" * (base - _HEADER.size - len(blob)))
+        for seg in segments:
+            f.write(seg)
+    os.replace(tmp, path)
+    return path
+
+
+# -------- 加载 --------
+
+
+class EvalSetSnapshot(Sequence):
+    """
+    快照的只读视图：len / 下标 / 切片 / 迭代得到 CardEvalRecord（按需构建，不缓存），
+    column(name, table=...) 取整列原始值。未压缩快照底层为 mmap，用完可 close()。
+    """
+
+    def __init__(self, path: str | Path, *, use_mmap: bool = True) -> None:
+        self.path = Path(path)
+        self._mmap: mmap.mmap | None = None
+        with open(self.path, "rb") as f:
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                raise ValueError(f"{self.path} 不是评测集快照（文件过短）")
+            magic, version, codec, manifest_len, crc = _HEADER.unpack(head)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.path} 不是评测集快照（magic 不符）")
+            if version != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"快照格式版本 {version} 与当前 {SNAPSHOT_FORMAT_VERSION} 不符，请重新生成")
+            if codec not in _CODEC_NAMES:
+                raise ValueError(f"未知压缩方式编号：{codec}")
+            if codec == 2 and zstandard is None:
+                raise ValueError("该快照为 zstd 压缩，请先 pip install zstandard")
+            blob = f.read(manifest_len)
+            if zlib.crc32(blob) != crc:
+                raise ValueError(f"{self.path} 清单校验失败（文件损坏）")
+            self.manifest: dict[str, Any] = json.loads(blob)
+            self.compression = _CODEC_NAMES[codec]
+            if use_mmap and codec == 0:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._buf: bytes | memoryview = memoryview(self._mmap)
+            else:
+                f.seek(0)
+                self._buf = f.read()
+        self._decompress = None
+        if codec == 1:
+            self._decompress = zlib.decompress
+        elif codec == 2:
+            self._decompress = zstandard.ZstdDecompressor().decompress
+
+        self._base = self.manifest["data_offset"]
+        self._columns: dict[tuple[str, str], Any] = {}
+        self._field_cache: dict[tuple[str, str], list[tuple[str, Any, str]]] = {}
+        self._json: dict[int, Any] = {}
+        spec = self.manifest["strings"]
+        self.strings: list[str | None] = bytes(self._segment(spec)).decode("utf-8").split("\0")
+        if len(self.strings) != spec["count"]:
+            raise ValueError(f"{self.path} 字符串字典条数不符（文件损坏）")
+        self.strings[0] = None
+
+        rec = self.manifest["tables"]["records"]
+        self._n = rec["rows"]
+        self._variant_start = self._raw("records", "variant_start")
+        self._window_start = self._raw("records", "window_start")
+        self._validate_row = self._raw("records", "validate_row")
+        self._expand_row = self._raw("records", "expand_row")
+
+    # -- 基础读取 --
+
+    def _segment(self, spec: dict[str, int]) -> bytes | memoryview:
+        start = self._base + spec["offset"]
+        data = self._buf[start:start + spec["length"]]
+        if self._decompress is not None:
+            data = self._decompress(data)
+        if len(data) != spec["raw_length"]:
+            raise ValueError(f"{self.path} 数据段长度不符（文件损坏）")
+        return data
+
+    def _raw(self, table: str, name: str) -> Any:
+        """列的原始数组（str / json 列为字典下标）；未压缩时是 mmap 上的 memoryview"""
+        key = (table, name)
+        col = self._columns.get(key)
+        if col is None:
+            spec = self.manifest["tables"][table]["columns"].get(name)
+            if spec is None:
+                col = [None] * self.manifest["tables"][table]["rows"]
+            else:
+                data = self._segment(spec)
+                col = memoryview(data).cast(_TYPECODES[spec["kind"]]) if len(data) else []
+            self._columns[key] = col
+        return col
+
+    def _json_value(self, v: int) -> Any:
+        """json 列取值，按字典下标缓存解析结果（model_validate 会为 list / dict 字段重建容器，缓存对象不会被改写）"""
+        if not v:
+            return None
+        out = self._json.get(v)
+        if out is None:
+            out = self._json[v] = json.loads(self.strings[v])
+        return out
+
+    def _decode_slice(self, kind: str, raw: Any) -> list[Any]:
+        if kind == "str":
+            # strings[0] 为 None
+            return list(map(self.strings.__getitem__, raw))
+        if kind in ("i64", "f64"):
+            return raw.tolist() if isinstance(raw, memoryview) else list(raw)
+        if kind == "json":
+            return [self._json_value(v) for v in raw]
+        return [bool(v) for v in raw]
+
+    def _fields(self, table: str, prefix: str = "") -> list[tuple[str, Any, str]]:
+        """表（或带前缀的列组）的 (字段名, 原始列, 类型)，按表缓存"""
+        key = (table, prefix)
+        fields = self._field_cache.get(key)
+        if fields is None:
+            fields = self._field_cache[key] = [
+                (name[len(prefix):], self._raw(table, name), spec["kind"])
+                for name, spec in self.manifest["tables"][table]["columns"].items()
+                if name.startswith(prefix)
+            ]
+        return fields
+
+    def _rows(self, table: str, start: int, stop: int, *, prefix: str = "") -> list[dict[str, Any]]:
+        """[start, stop) 行 → dict 列表：逐列切片解码后按行 zip（比逐格取值快一个量级）"""
+        if stop <= start:
+            return []
+        fields = self._fields(table, prefix)
+        names = [f[0] for f in fields]
+        cols = [self._decode_slice(kind, col[start:stop]) for _, col, kind in fields]
+        return [dict(zip(names, vals)) for vals in zip(*cols)]
+
+    def _end(self, starts: Any, table: str, i: int) -> int:
+        """第 i 卡在子表中的终止行（末卡取子表行数）"""
+        return starts[i + 1] if i + 1 < self._n else self.manifest["tables"][table]["rows"]
+
+    def _build(self, start: int, stop: int, *, pool: InternPool | None = None) -> list[Any]:
+        """
+        构建 [start, stop) 张卡：各子表按卡的行范围一次切出，再逐卡组装。
+        给 pool 时直接由行 dict 构建 CompactCardEvalRecord（跳过 pydantic 校验）。
+        """
+        if pool is None:
+            def _one(model, row):
+                return model.model_validate(row)
+
+            make = CardEvalRecord
+        else:
+            def _one(model, row):
+                return row
+
+            def make(**kw):
+                return CompactCardEvalRecord.from_dumps(**kw, pool=pool)
+
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            vs, ws = self._variant_start, self._window_start
+            v0, w0 = vs[start], ws[start]
+            variants = [_one(Variant, r) for r in self._rows("variants", v0, self._end(vs, "variants", stop - 1))]
+            windows = [_one(WindowMetrics, r) for r in self._rows("windows", w0, self._end(ws, "windows", stop - 1))]
+            explore = [
+                _one(ExploreGateResult, r) if r.get("gate_status") is not None else None
+                for r in self._rows("explore", 2 * start, 2 * stop)
+            ]
+            cards = [_one(StrategyCard, r) for r in self._rows("records", start, stop, prefix="card.")]
+            scores = self._decode_slice("f64", self._raw("records", "card_score")[start:stop])
+            statuses = self._decode_slice("str", self._raw("records", "status")[start:stop])
+            vrows = self._validate_row[start:stop].tolist()
+            erows = self._expand_row[start:stop].tolist()
+            # validate / expand 行号随卡单调递增，区间内有值的行连续
+            vlo = next((x for x in vrows if x >= 0), 0)
+            vhi = max(vrows, default=-1) + 1
+            elo = next((x for x in erows if x >= 0), 0)
+            ehi = max(erows, default=-1) + 1
+            validates = [_one(ValidateGateResult, r) for r in self._rows("validate", vlo, vhi)]
+            expands = [_one(WindowMetrics, r) for r in self._rows("expand", elo, ehi)]
+
+            out: list[Any] = []
+            for k, i in enumerate(range(start, stop)):
+                vr, er = vrows[k], erows[k]
+                out.append(make(
+                    card=cards[k],
+                    card_score=scores[k],
+                    status=statuses[k],
+                    variants=variants[vs[i] - v0:self._end(vs, "variants", i) - v0],
+                    explore_ios=explore[2 * k],
+                    explore_android=explore[2 * k + 1],
+                    validate_result=validates[vr - vlo] if vr >= 0 else None,
+                    window_metrics=windows[ws[i] - w0:self._end(ws, "windows", i) - w0],
+                    expand_segment_metrics=expands[er - elo] if er >= 0 else None,
+                ))
+            return out
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    # -- 公共接口 --
+
+    def tables(self) -> dict[str, int]:
+        """各表行数"""
+        return {name: t["rows"] for name, t in self.manifest["tables"].items()}
+
+    def column(self, name: str, *, table: str = "records") -> list[Any]:
+        """整列取值（已解码，json 列每次重新解析）；records 表的卡片字段带 card. 前缀，如 column("card.vertical")"""
+        spec = self.manifest["tables"][table]["columns"].get(name)
+        if spec is None:
+            raise KeyError(f"{table} 表无列 {name}")
+        raw = self._raw(table, name)
+        if spec["kind"] == "json":
+            strings = self.strings
+            return [json.loads(strings[v]) if v else None for v in raw]
+        return self._decode_slice(spec["kind"], raw)
+
+    def record(self, i: int) -> CardEvalRecord:
+        """第 i 张卡的完整 CardEvalRecord"""
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self._build(i, i + 1)[0]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._n)
+            if step == 1:
+                return self._build(start, stop) if stop > start else []
+            return [self.record(j) for j in range(start, stop, step)]
+        return self.record(i)
+
+    def __iter__(self) -> Iterator[CardEvalRecord]:
+        for start in range(0, self._n, _ITER_CHUNK):
+            yield from self._build(start, min(start + _ITER_CHUNK, self._n))
+
+    def to_list(self, *, compact: bool = False) -> list[CardEvalRecord] | list[CompactCardEvalRecord]:
+        """
+        全部构建为对象（与 generate_eval_set 返回值等价）。
+        compact=True 返回 CompactCardEvalRecord（不经 pydantic 校验，常驻内存约为完整对象的 1/20）。
+        """
+        if not compact:
+            return list(self)
+        pool = InternPool()
+        out: list[CompactCardEvalRecord] = []
+        for start in range(0, self._n, _ITER_CHUNK):
+            out.extend(self._build(start, min(start + _ITER_CHUNK, self._n), pool=pool))
+        return out
+
+    def close(self) -> None:
+        """释放 mmap（之后不可再访问未缓存的列）"""
+        # mmap 上仍有 memoryview 时 close 会报 BufferError，先逐个释放
+        for col in self._columns.values():
+            if isinstance(col, memoryview):
+                col.release()
+        self._columns.clear()
+        self._field_cache.clear()
+        self._variant_start = self._window_start = self._validate_row = self._expand_row = []
+        if isinstance(self._buf, memoryview):
+            self._buf.release()
+        self._buf = b""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "EvalSetSnapshot":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def load_eval_set(path: str | Path, *, use_mmap: bool = True) -> EvalSetSnapshot:
+    """打开快照；记录按需构建，需要普通 list 时调用 .to_list()"""
+    return EvalSetSnapshot(path, use_mmap=use_mmap)
+
+
+def list_snapshots(directory: str | Path | None = None) -> list[Path]:
+    """快照目录下的快照文件（按修改时间倒序）"""
+    d = Path(directory) if directory is not None else DEFAULT_SNAPSHOT_DIR
+    if not d.exists():
+        return []
+    return sorted(d.glob(f"*{SNAPSHOT_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
@@ -0,0 +1,668 @@
+"""
+实验队列后台执行：SQLite 持久化的本地任务队列 + 线程 worker 池。
+
+- 队列：data/experiment_jobs.db（WAL），每个实验包一行；状态 queued → running → done / failed / cancelled
+- 领取：BEGIN IMMEDIATE 内「选最早 queued → 置 running」，多线程 / 多进程 worker 不会重复领取
+- 执行：实验包 → OFAAT 变体（只改 changed_field）→ 决策 DAG（模拟 metrics / 双端 Explore Gate /
+  Validate Gate / 诊断 / 元素分 / 下一轮建议），结果 JSON 回写队列
+- 租约：运行中每个阶段刷新 heartbeat；超过 lease_timeout_s 未刷新（进程被杀、页面所在进程重启）的任务
+  重新排队，超过 max_attempts 次记为 failed
+- Streamlit 脚本线程只入队 / 轮询，不阻塞；也可 `python experiment_jobs.py --workers 2` 单独起进程消费同一队列
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping
+
+from pydantic import BaseModel, Field
+
+try:
+    from path_config import REPO_ROOT
+except ImportError:
+    REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# 环境变量 DS_JOB_DB 可改队列文件位置
+JOB_DB_PATH = Path(os.environ.get("DS_JOB_DB") or REPO_ROOT / "data" / "experiment_jobs.db")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+JOB_STATUSES = (QUEUED, RUNNING, DONE, FAILED, CANCELLED)
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+DEFAULT_SUGGESTED_N = 12
+
+
+# -------- 配置 / 输出 --------
+
+
+@dataclass
+class WorkerPoolConfig:
+    """worker 池参数"""
+
+    workers: int = 2
+    poll_interval_s: float = 0.5  # 队列为空时的轮询间隔
+    lease_timeout_s: float = 600.0  # running 超过该时长未刷新 heartbeat 视为丢失
+    max_attempts: int = 2  # 丢失后重新排队的次数上限（含首次）
+
+
+class ExperimentJob(BaseModel):
+    """队列中的一个实验包"""
+
+    job_id: str = Field(..., description="任务 ID")
+    status: str = Field(default=QUEUED, description="queued / running / done / failed / cancelled")
+    label: str = Field(default="", description="展示用摘要，如：hook_type: 当前 → 候选")
+    package: dict[str, Any] = Field(default_factory=dict, description="实验包（build_experiment_package 输出 + card / vertical）")
+    stage: str = Field(default="", description="当前执行阶段")
+    attempts: int = Field(default=0, description="已领取次数")
+    worker: str = Field(default="", description="执行中的 worker")
+    created_at: float = Field(default=0.0, description="入队时间（epoch 秒）")
+    started_at: float | None = Field(default=None, description="最近一次开始执行时间")
+    finished_at: float | None = Field(default=None, description="结束时间")
+    result: dict[str, Any] | None = Field(default=None, description="执行结果摘要")
+    error: str = Field(default="", description="失败原因")
+
+
+class JobCancelled(Exception):
+    """任务在执行中被取消（或租约已被回收）"""
+
+
+# -------- 队列 --------
+
+
+_COLUMNS = (
+    "job_id", "status", "label", "package", "stage", "attempts", "worker",
+    "created_at", "started_at", "finished_at", "result", "error",
+)
+
+
+def _row_to_job(row: sqlite3.Row) -> ExperimentJob:
+    d = dict(row)
+    d["package"] = json.loads(d["package"] or "{}")
+    d["result"] = json.loads(d["result"]) if d["result"] else None
+    d["worker"] = d["worker"] or ""
+    d["stage"] = d["stage"] or ""
+    d["error"] = d["error"] or ""
+    return ExperimentJob.model_validate(d)
+
+
+def package_label(package: Mapping[str, Any]) -> str:
+    """实验包一行摘要"""
+    field = package.get("changed_field") or "-"
+    curr = str(package.get("current_value") or "")[:12]
+    alts = [str(a) for a in (package.get("candidate_alternatives") or [])[:2]]
+    return f"{field}: {curr} → {', '.join(alts) or '-'}"
+
+
+class JobQueue:
+    """
+    SQLite 任务队列。每个线程各用一条连接（sqlite3 连接不跨线程共享），WAL 下读写互不阻塞；
+    写操作短事务，busy 时由 timeout 等待。
+    """
+
+    def __init__(self, db_path: Path | str | None = None, *, timeout_s: float = 30.0) -> None:
+        self.db_path = Path(db_path) if db_path is not None else JOB_DB_PATH
+        self._timeout_s = timeout_s
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=self._timeout_s, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        c = self._conn()
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                label TEXT,
+                package TEXT NOT NULL,
+                stage TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT
+            )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+
+    def close(self) -> None:
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- 入队 / 查询 ----
+
+    def enqueue(self, package: Mapping[str, Any], *, label: str | None = None) -> str:
+        """实验包入队，返回 job_id"""
+        job_id = f"job_{uuid.uuid4().hex[:12]}"
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, status, label, package, created_at) VALUES (?,?,?,?,?)",
+            (job_id, QUEUED, label if label is not None else package_label(package),
+             json.dumps(dict(package), ensure_ascii=False, default=str), time.time()),
+        )
+        return job_id
+
+    def enqueue_many(self, packages: Iterable[Mapping[str, Any]]) -> list[str]:
+        """批量入队（单事务）"""
+        now = time.time()
+        rows = [
+            (f"job_{uuid.uuid4().hex[:12]}", QUEUED, package_label(p), json.dumps(dict(p), ensure_ascii=False, default=str), now + i * 1e-6)
+            for i, p in enumerate(packages)
+        ]
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            c.executemany("INSERT INTO jobs (job_id, status, label, package, created_at) VALUES (?,?,?,?,?)", rows)
+            c.execute("COMMIT")
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        return [r[0] for r in rows]
+
+    def get(self, job_id: str) -> ExperimentJob | None:
+        row = self._conn().execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list_jobs(self, *, statuses: Iterable[str] | None = None, limit: int = 50) -> list[ExperimentJob]:
+        """最近的任务（新 → 旧）"""
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params: list[Any] = []
+        statuses = list(statuses or [])
+        if statuses:
+            sql += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [_row_to_job(r) for r in self._conn().execute(sql, params).fetchall()]
+
+    def counts(self) -> dict[str, int]:
+        """各状态任务数"""
+        out = dict.fromkeys(JOB_STATUSES, 0)
+        for row in self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            out[row["status"]] = row["n"]
+        return out
+
+    # ---- worker 侧 ----
+
+    def claim(self, worker: str) -> ExperimentJob | None:
+        """原子领取最早入队的任务；队列为空返回 None"""
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            row = c.execute(
+                "SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,),
+            ).fetchone()
+            if row is None:
+                c.execute("COMMIT")
+                return None
+            now = time.time()
+            c.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ?, stage = ?, error = ''"
+                " WHERE job_id = ?",
+                (RUNNING, worker, now, now, "已领取", row["job_id"]),
+            )
+            c.execute("COMMIT")
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        return self.get(row["job_id"])
+
+    def heartbeat(self, job_id: str, worker: str, stage: str) -> bool:
+        """刷新租约并记录阶段；任务已不归该 worker（被取消 / 被回收）时返回 False"""
+        cur = self._conn().execute(
+            "UPDATE jobs SET stage = ?, heartbeat_at = ? WHERE job_id = ? AND status = ? AND worker = ?",
+            (stage, time.time(), job_id, RUNNING, worker),
+        )
+        return cur.rowcount > 0
+
+    def complete(self, job_id: str, worker: str, result: Mapping[str, Any]) -> bool:
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = ?, stage = '', finished_at = ?, result = ? WHERE job_id = ? AND status = ? AND worker = ?",
+            (DONE, time.time(), json.dumps(dict(result), ensure_ascii=False, default=str), job_id, RUNNING, worker),
+        )
+        return cur.rowcount > 0
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE job_id = ? AND status = ? AND worker = ?",
+            (FAILED, time.time(), error, job_id, RUNNING, worker),
+        )
+        return cur.rowcount > 0
+
+    # ---- 管理 ----
+
+    def cancel(self, job_id: str) -> bool:
+        """取消排队中 / 运行中的任务（运行中的在下一个阶段边界停止）"""
+        cur = self._conn().execute(
+            f"UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))})",
+            (CANCELLED, time.time(), job_id, *ACTIVE_STATUSES),
+        )
+        return cur.rowcount > 0
+
+    def retry(self, job_id: str) -> bool:
+        """失败 / 已取消的任务重新排队"""
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = ?, attempts = 0, worker = NULL, stage = '', error = '', result = NULL, finished_at = NULL, created_at = ?"
+            " WHERE job_id = ? AND status IN (?, ?)",
+            (QUEUED, time.time(), job_id, FAILED, CANCELLED),
+        )
+        return cur.rowcount > 0
+
+    def requeue_stale(self, *, lease_timeout_s: float, max_attempts: int) -> int:
+        """回收租约过期的 running 任务：未超次数的重新排队，否则记为 failed；返回处理条数"""
+        cutoff = time.time() - lease_timeout_s
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            n_fail = c.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (FAILED, time.time(), "执行中断（租约过期）且已达重试上限", RUNNING, cutoff, max_attempts),
+            ).rowcount
+            n_requeue = c.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, stage = '' WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, cutoff),
+            ).rowcount
+            c.execute("COMMIT")
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        return n_fail + n_requeue
+
+    def purge(self, *, statuses: Iterable[str] = (DONE, FAILED, CANCELLED)) -> int:
+        """删除已结束的任务"""
+        statuses = list(statuses)
+        if not statuses:
+            return 0
+        cur = self._conn().execute(f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(statuses))})", statuses)
+        return cur.rowcount
+
+
+# -------- 实验包执行 --------
+
+
+# changed_field → variant_suggestions 候选索引的 element_type
+_FIELD_TO_ELEMENT = {
+    "hook_type": "hook",
+    "sell_point": "sell_point",
+    "cta": "cta",
+    "asset_var": "asset",
+    "why_you_bucket": "why_you",
+    "why_now_trigger": "why_now",
+}
+# 元素贡献区直接入队时 changed_field 是 element_type
+_ELEMENT_TO_FIELD = {et: field for field, et in _FIELD_TO_ELEMENT.items()} | {"sell_point_copy": "sell_point"}
+# 生成器不直接轮换的字段：改基线变体上的对应表述（表述 → 标签 → 候选索引为空时回退的语料键）
+_EXPRESSION_FIELDS = {
+    "why_you_bucket": ("why_you_expression", "why_you", "why_you_phrases"),
+    "why_now_trigger": ("why_now_expression", "why_now", "why_now_phrases"),
+}
+
+
+def _clean_value(v: Any) -> str:
+    """去掉看板展示用的截断 / 提示后缀"""
+    s = str(v or "").replace("⚠️ 样本不足", "").strip()
+    return s[:-1].strip() if s.endswith("…") else s
+
+
+def _first_str(pool: Any, default: str) -> str:
+    for x in pool or ():
+        if isinstance(x, str) and x.strip():
+            return x.strip()
+    return default
+
+
+def _field_pool(
+    field: str, current: str, alternatives: list[str], n: int, vertical: str, *, lookup: str | None = None,
+) -> list[str]:
+    """当前值 + 处方候选，不足 n 个时从同 vertical 候选池补齐（去重、保序；素材变量按 lookup=「变量=值」查池）"""
+    from variant_suggestions import candidate_index
+
+    pool = list(dict.fromkeys(x for x in [current, *alternatives] if x))
+    if len(pool) < n:
+        et = _FIELD_TO_ELEMENT.get(field, "hook")
+        extra = candidate_index(vertical).alternatives(et, lookup if lookup is not None else current, n)
+        pool.extend(x for x in map(str, extra) if x not in pool)
+    return pool[:n]
+
+
+def _asset_key(current: str, alternatives: list[str], asset_pool: Mapping[str, Any]) -> str:
+    """素材变量字段：current_value 不带变量名时按候选值所在的素材池反查"""
+    if "=" in current:
+        return current.split("=", 1)[0]
+    wanted = {current, *alternatives}
+    best, best_hits = "", 0
+    for key, vals in asset_pool.items():
+        hits = len(wanted & {str(v) for v in vals or ()})
+        if hits > best_hits:
+            best, best_hits = key, hits
+    if not best:
+        # 没有可反查的值：取第一个可轮换的素材变量
+        best = next((k for k, vals in asset_pool.items() if len(vals or ()) > 1), "")
+    return best
+
+
+def _phrases(corpus_value: Any) -> list[str]:
+    """语料表述池（dict 为 桶 → 表述列表）拍平"""
+    if isinstance(corpus_value, Mapping):
+        return [str(x) for vals in corpus_value.values() for x in (vals if isinstance(vals, (list, tuple)) else [vals]) if x]
+    return [str(x) for x in corpus_value or () if isinstance(x, str) and x]
+
+
+def build_package_variants(package: Mapping[str, Any], *, card_id: str, vertical: str) -> list:
+    """
+    实验包 → OFAAT 变体：基线取当前值（缺省为候选池首个），其余变体只改 changed_field，
+    依次取处方候选、同池其他取值，共 suggested_n 个（含基线）。
+    changed_field 缺失或不可轮换时抛 ValueError（worker 据此把任务标为 failed，而不是只跑基线）。
+    """
+    from ofaat_generator import generate_ofaat_variants
+    from vertical_config import get_corpus
+
+    raw_field = package.get("changed_field") or ""
+    field = _ELEMENT_TO_FIELD.get(raw_field, raw_field)
+    if field not in _FIELD_TO_ELEMENT:
+        raise ValueError(f"实验包 changed_field 不可轮换: {raw_field!r}（可选 {', '.join(_FIELD_TO_ELEMENT)}）")
+    n = max(2, int(package.get("suggested_n") or DEFAULT_SUGGESTED_N))
+    alternatives = [a for a in (_clean_value(x) for x in package.get("candidate_alternatives") or []) if a]
+    current = _clean_value(package.get("current_value"))
+    if current == "当前值":
+        current = ""
+    corp = get_corpus(vertical)
+    hooks = [_first_str(corp.get("hook_type"), "冲突/悬念")]
+    sells = [_first_str(corp.get("sell_point"), "新赛季冲分黄金期")]
+    ctas = [_first_str(corp.get("cta"), "立即下载")]
+    asset_pool: dict[str, list[str]] = {}
+
+    if field == "hook_type":
+        hooks = _field_pool(field, current or hooks[0], alternatives, n, vertical)
+    elif field == "sell_point":
+        sells = _field_pool(field, current or sells[0], alternatives, n, vertical)
+    elif field == "cta":
+        ctas = _field_pool(field, current or ctas[0], alternatives, n, vertical)
+    elif field == "asset_var":
+        corp_assets = corp.get("asset_var") or {}
+        key = _asset_key(current, alternatives, corp_assets)
+        if key:
+            cur_val = current.split("=", 1)[-1] or _first_str(corp_assets.get(key), "")
+            asset_pool[key] = _field_pool(field, cur_val, alternatives, n, vertical, lookup=f"{key}={cur_val}")
+
+    variants = generate_ofaat_variants(card_id, hooks, sells, ctas, n=n, asset_pool=asset_pool)
+    if field in _EXPRESSION_FIELDS:
+        attr, label, corpus_key = _EXPRESSION_FIELDS[field]
+        base = variants[0]
+        cur = current or getattr(base, attr, "")
+        pool = _field_pool(field, cur, alternatives, n, vertical)
+        if len(pool) < n:
+            pool.extend(x for x in dict.fromkeys(_phrases(corp.get(corpus_key))) if x not in pool)
+            pool = pool[:n]
+        variants = [base] + [
+            base.model_copy(update={
+                "variant_id": f"v{i + 2:03d}", attr: alt, "changed_field": field,
+                "delta_desc": f"{label}: {cur[:20]}{'…' if len(cur) > 20 else ''} -> {alt[:20]}{'…' if len(alt) > 20 else ''}",
+            })
+            for i, alt in enumerate(x for x in pool if x != cur)
+        ]
+    return variants
+
+
+def _package_card(package: Mapping[str, Any], vertical: str):
+    """实验包里的卡片（看板入队时带上）；没有时用该 vertical 的示例卡"""
+    from eval_schemas import StrategyCard
+    from vertical_config import get_sample_strategy_card
+
+    raw = package.get("card")
+    if isinstance(raw, Mapping):
+        return StrategyCard.model_validate(dict(raw))
+    sample = get_sample_strategy_card(vertical) or {}
+    return StrategyCard.model_validate({
+        **sample, "card_id": sample.get("card_id") or f"queue_{vertical}", "vertical": vertical,
+        "objective": sample.get("objective") or ("purchase" if vertical == "ecommerce" else "install"),
+    })
+
+
+def _package_windows(metrics: list, seed: str):
+    """验证窗口：首测窗为整卡 metrics 汇总，跨天复测 / 轻扩人群按固定种子做温和漂移（与评测集生成同口径）"""
+    from rng_streams import seeded
+    from validate_gate import WindowMetrics
+
+    r = seeded(f"experiment_job:{seed}")
+    imp = sum(m.impressions for m in metrics) or 1
+    inst = sum(m.installs for m in metrics)
+    spend = sum(m.spend for m in metrics)
+    ev = sum(m.early_events for m in metrics)
+    rev = sum(m.early_revenue for m in metrics)
+    clicks = sum(m.clicks for m in metrics)
+    ipm1 = inst / imp * 1000
+    cpi1 = spend / inst if inst else 0.0
+    roas1 = rev / spend if spend else 0.0
+
+    def _window(window_id: str, scale: float, ipm: float, cpi: float, roas: float) -> WindowMetrics:
+        w_imp = max(1, int(imp * scale))
+        w_inst = max(1, int(w_imp * ipm / 1000))
+        return WindowMetrics(
+            window_id=window_id, impressions=w_imp, clicks=int(clicks * scale), installs=w_inst,
+            spend=round(w_inst * cpi, 2), early_events=int(ev * scale), early_revenue=round(w_inst * cpi * roas, 2),
+            ipm=round(ipm, 2), cpi=round(cpi, 2), early_roas=round(roas, 4),
+        )
+
+    w1 = _window("window_1", 1.0, ipm1, cpi1, roas1)
+    ipm2, cpi2 = ipm1 * (0.85 + r.uniform(0, 0.2)), cpi1 * (1.0 + r.uniform(-0.05, 0.15))
+    roas2 = roas1 * (0.95 + r.uniform(-0.1, 0.2))
+    w2 = _window("window_2", 1.04, ipm2, cpi2, roas2)
+    light = _window("expand_segment", 0.4, ipm2 * (0.80 + r.uniform(0, 0.15)), cpi2 * (1.0 + r.uniform(0, 0.2)), roas2 * (0.9 + r.uniform(-0.1, 0.15)))
+    return [w1, w2], light
+
+
+def _job_result(package: Mapping[str, Any], card: Any, variants: list, data: Mapping[str, Any], elapsed_ms: float) -> dict[str, Any]:
+    """DAG 输出 → 可 JSON 化的结果摘要"""
+    diag = data.get("diagnosis")
+    summary = data.get("summary") or {}
+    validate = data.get("validate_result")
+    card_score = data.get("card_score_result") or {}
+    return {
+        "card_id": card.card_id,
+        "vertical": card.vertical,
+        "changed_field": package.get("changed_field", ""),
+        "n_variants": len(variants),
+        "variants": [{"variant_id": v.variant_id, "changed_field": v.changed_field, "delta_desc": v.delta_desc} for v in variants],
+        "explore": {
+            os_name: {"gate_status": g.gate_status, "eligible_variants": list(g.eligible_variants or [])}
+            for os_name, g in (("iOS", data.get("explore_ios")), ("Android", data.get("explore_android"))) if g is not None
+        },
+        "validate_status": getattr(validate, "validate_status", ""),
+        "risk_notes": list(getattr(validate, "risk_notes", []) or []),
+        "diagnosis": {
+            k: getattr(diag, k, "") for k in ("failure_type", "primary_signal", "diagnosis_title", "action_hint")
+        } if diag is not None else {},
+        "summary": {k: summary.get(k) for k in ("status", "status_text", "reason", "risk", "next_step") if k in summary},
+        "card_score": card_score.get("card_score"),
+        "top_variants": list(card_score.get("top_variants") or []),
+        "suggestions": [s.model_dump() for s in data.get("suggestions") or []],
+        "elapsed_ms": round(elapsed_ms, 1),
+    }
+
+
+def run_experiment_package(
+    package: Mapping[str, Any],
+    *,
+    progress: Callable[[str], None] | None = None,
+    element_mode: str = "raw",
+) -> dict[str, Any]:
+    """
+    执行一个实验包：OFAAT 生成 → 决策 DAG（模拟 / 门禁 / 诊断 / 元素分 / 建议），返回结果摘要。
+    progress(stage) 在每个阶段开始时调用（worker 用它刷新租约、响应取消）。
+    """
+    from pipeline_cache import cached_card_metrics, content_hash
+    from pipeline_dag import build_decision_dag
+    from vertical_config import config_version
+
+    step = progress or (lambda _stage: None)
+    t0 = time.perf_counter()
+    vertical = (package.get("vertical") or "casual_game").lower()
+    if vertical not in ("ecommerce", "casual_game"):
+        vertical = "casual_game"
+
+    step("生成变体")
+    card = _package_card(package, vertical)
+    variants = build_package_variants(package, card_id=card.card_id, vertical=vertical)
+    mb = package.get("motivation_bucket") or card.motivation_bucket
+
+    step("模拟投放")
+    metrics = cached_card_metrics(variants, motivation_bucket=mb, vertical=vertical)
+    windows = _package_windows(metrics, content_hash(dict(package)))
+
+    step("门禁 / 诊断 / 建议")
+    dag = build_decision_dag()
+    dag.set_inputs(
+        card=card, variants=variants, motivation_bucket=mb, vertical=vertical, windows=windows,
+        config_version=config_version(), element_mode=package.get("element_mode") or element_mode,
+    )
+    data = dag.run()
+
+    step("汇总结果")
+    return _job_result(package, card, variants, data, (time.perf_counter() - t0) * 1000)
+
+
+# -------- worker 池 --------
+
+
+class JobWorkerPool:
+    """守护线程 worker 池：循环领取 → 执行 → 回写；空闲时回收过期租约"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        config: WorkerPoolConfig | None = None,
+        *,
+        runner: Callable[..., dict[str, Any]] = run_experiment_package,
+    ) -> None:
+        self.queue = queue
+        self.config = config or WorkerPoolConfig()
+        self._runner = runner
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    @property
+    def alive(self) -> int:
+        return sum(t.is_alive() for t in self._threads)
+
+    def start(self) -> "JobWorkerPool":
+        """启动（已在运行则补齐退出的线程）"""
+        with self._lock:
+            self._stop.clear()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), max(1, self.config.workers)):
+                t = threading.Thread(target=self._loop, args=(f"{self._prefix}-w{i}",), name=f"experiment-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def stop(self, *, wait: bool = True, timeout: float | None = None) -> None:
+        """停止领取新任务；执行中的任务跑完当前阶段后结束"""
+        self._stop.set()
+        if wait:
+            for t in self._threads:
+                t.join(timeout)
+
+    def _run_one(self, job: ExperimentJob, worker: str) -> None:
+        def _progress(stage: str) -> None:
+            if not self.queue.heartbeat(job.job_id, worker, stage):
+                raise JobCancelled(job.job_id)
+
+        try:
+            result = self._runner(job.package, progress=_progress)
+        except JobCancelled:
+            return
+        except Exception as e:
+            tb = traceback.format_exc(limit=3)
+            self.queue.fail(job.job_id, worker, f"{type(e).__name__}: {e}\n{tb}")
+            return
+        self.queue.complete(job.job_id, worker, result)
+
+    def _loop(self, worker: str) -> None:
+        cfg = self.config
+        try:
+            while not self._stop.is_set():
+                try:
+                    job = self.queue.claim(worker)
+                except sqlite3.OperationalError:
+                    job = None  # 锁竞争超时：下一轮再领
+                if job is None:
+                    try:
+                        self.queue.requeue_stale(lease_timeout_s=cfg.lease_timeout_s, max_attempts=cfg.max_attempts)
+                    except sqlite3.OperationalError:
+                        pass
+                    self._stop.wait(cfg.poll_interval_s)
+                    continue
+                self._run_one(job, worker)
+        finally:
+            self.queue.close()
+
+
+_pools: dict[Path, JobWorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_pool(db_path: Path | str | None = None, *, config: WorkerPoolConfig | None = None) -> JobWorkerPool:
+    """进程内每个队列文件一个 worker 池（Streamlit 每次 rerun 复用同一个），按需启动"""
+    path = (Path(db_path) if db_path is not None else JOB_DB_PATH).resolve()
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = JobWorkerPool(JobQueue(path), config)
+    if pool.alive < max(1, pool.config.workers):
+        pool.start()
+    return pool
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="实验队列 worker：消费 SQLite 队列中的实验包")
+    parser.add_argument("--db", type=str, default=None, help="队列文件（默认 data/experiment_jobs.db）")
+    parser.add_argument("--workers", type=int, default=2, help="worker 线程数")
+    parser.add_argument("--drain", action="store_true", help="队列清空后退出")
+    args = parser.parse_args()
+
+    pool = JobWorkerPool(JobQueue(args.db), WorkerPoolConfig(workers=args.workers)).start()
+    print(f"队列: {pool.queue.db_path} | workers={args.workers}")
+    try:
+        while True:
+            time.sleep(1.0)
+            counts = pool.queue.counts()
+            if args.drain and counts[QUEUED] == 0 and counts[RUNNING] == 0:
+                break
+    except KeyboardInterrupt:
+        pass
+    pool.stop(timeout=30)
+    print(" | ".join(f"{k}={v}" for k, v in pool.queue.counts().items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -84,6 +84,15 @@ def init_schema(conn: sqlite3.Connection | None = None) -> None:
             cross_os TEXT
         )
     """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS variant_elements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exp_id TEXT,
+            variant_id TEXT,
+            element_type TEXT,
+            element_value TEXT
+        )
+    """)
     c.execute("""
         CREATE TABLE IF NOT EXISTS decisions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -95,7 +104,7 @@ def init_schema(conn: sqlite3.Connection | None = None) -> None:
         )
     """)
 
-    for t in ("variant_metrics", "diagnosis", "element_scores", "decisions"):
+    for t in ("variant_metrics", "variant_elements", "diagnosis", "element_scores", "decisions"):
         c.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_exp_id ON {t}(exp_id)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_experiments_card ON experiments(card_id)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_cards_vertical ON cards(vertical)")
@@ -117,6 +126,32 @@ def _next_exp_id() -> str:
         conn.close()
 
 
+def _variant_element_rows(exp_id: str, variants: list[Any]) -> list[tuple]:
+    """变体 → (exp_id, variant_id, element_type, element_value) 行（与 compute_element_scores 同口径拆解）"""
+    try:
+        from eval_schemas import decompose_variant_to_element_tags
+    except ImportError:
+        return []
+    rows = []
+    for v in variants or []:
+        try:
+            tags = decompose_variant_to_element_tags(v)
+        except Exception:
+            continue
+        seen = set()
+        for t in tags:
+            key = (t.element_type, t.element_value)
+            if key not in seen:
+                seen.add(key)
+                rows.append((exp_id, getattr(v, "variant_id", ""), t.element_type, t.element_value))
+    return rows
+
+
+def _raw_or(obj: Any, attr: str, default: Any) -> Any:
+    v = getattr(obj, attr, None)
+    return default if v is None else v
+
+
 def write_experiment(
     card: Any,
     variants: list[Any],
@@ -173,6 +208,11 @@ def write_experiment(
                     getattr(obj, "early_roas", 0),
                 ),
             )
+        # variant_elements
+        c.executemany(
+            "INSERT INTO variant_elements (exp_id, variant_id, element_type, element_value) VALUES (?,?,?,?)",
+            _variant_element_rows(exp_id, variants),
+        )
         # diagnosis
         if diagnosis:
             diag = diagnosis
@@ -205,8 +245,9 @@ def write_experiment(
                     exp_id,
                     getattr(obj, "element_type", ""),
                     getattr(obj, "element_value", ""),
-                    getattr(obj, "avg_IPM_delta_vs_card_mean", 0) or getattr(obj, "avg_ipm_delta", 0),
-                    getattr(obj, "avg_CPI_delta_vs_card_mean", 0) or getattr(obj, "avg_cpi_delta", 0),
+                    # 原始均值差入库（EB 收缩后的后验值不回写，避免先验自我强化）
+                    _raw_or(obj, "avg_IPM_delta_raw", getattr(obj, "avg_IPM_delta_vs_card_mean", 0) or getattr(obj, "avg_ipm_delta", 0)),
+                    _raw_or(obj, "avg_CPI_delta_raw", getattr(obj, "avg_CPI_delta_vs_card_mean", 0) or getattr(obj, "avg_cpi_delta", 0)),
                     getattr(obj, "confidence_level", ""),
                     getattr(obj, "cross_os_consistency", ""),
                 ),
@@ -327,3 +368,88 @@ def query_review(
         }
     finally:
         conn.close()
+
+
+def load_element_priors(vertical: str | None = None, *, min_value_experiments: int = 2) -> dict[str, dict]:
+    """
+    元素分经验贝叶斯先验：同 vertical 历史实验的元素 Δ 分布（SQL 聚合）。
+    返回 by_type: {(element_type, metric): {"mean", "var", "n"}}；
+    by_value: {(element_type, element_value, metric): {"mean", "n"}}（≥ min_value_experiments 次实验）。
+    """
+    init_schema()
+    conn = _get_conn()
+    try:
+        c = conn.cursor()
+        where_sql, params = ("c.vertical=?", [vertical]) if vertical else ("1=1", [])
+        by_type: dict[tuple, dict] = {}
+        by_value: dict[tuple, dict] = {}
+        for metric, col in (("IPM", "avg_ipm_delta"), ("CPI", "avg_cpi_delta")):
+            c.execute(
+                f"""
+                SELECT es.element_type, COUNT(*) AS n, AVG(es.{col}) AS m, AVG(es.{col} * es.{col}) AS m2
+                FROM element_scores es
+                JOIN experiments e ON es.exp_id=e.exp_id
+                LEFT JOIN cards c ON e.card_id=c.card_id
+                WHERE {where_sql} AND es.{col} IS NOT NULL
+                GROUP BY es.element_type
+                """,
+                params,
+            )
+            for row in c.fetchall():
+                n, m, m2 = row["n"], row["m"] or 0.0, row["m2"] or 0.0
+                var = max(0.0, m2 - m * m) * n / (n - 1) if n > 1 else 0.0
+                by_type[(row["element_type"], metric)] = {"mean": m, "var": var, "n": n}
+            c.execute(
+                f"""
+                SELECT es.element_type, es.element_value, COUNT(DISTINCT es.exp_id) AS n, AVG(es.{col}) AS m
+                FROM element_scores es
+                JOIN experiments e ON es.exp_id=e.exp_id
+                LEFT JOIN cards c ON e.card_id=c.card_id
+                WHERE {where_sql} AND es.{col} IS NOT NULL
+                GROUP BY es.element_type, es.element_value
+                HAVING n >= ?
+                """,
+                params + [min_value_experiments],
+            )
+            for row in c.fetchall():
+                by_value[(row["element_type"], row["element_value"], metric)] = {"mean": row["m"] or 0.0, "n": row["n"]}
+        return {"by_type": by_type, "by_value": by_value}
+    finally:
+        conn.close()
+
+
+def load_element_rows(vertical: str | None = None, *, limit_experiments: int | None = None) -> list[dict[str, Any]]:
+    """
+    元素回归用的行级数据：每个 (实验, 变体, OS) 一行，附该变体的元素列表。
+    返回 [{"exp_id", "variant_id", "os", "ipm", "cpi", "elements": [(element_type, element_value), ...]}]；
+    未记录 variant_elements 的旧实验跳过。
+    """
+    init_schema()
+    conn = _get_conn()
+    try:
+        c = conn.cursor()
+        where_sql, params = ("c.vertical=?", [vertical]) if vertical else ("1=1", [])
+        exp_sql = f"SELECT e.exp_id FROM experiments e LEFT JOIN cards c ON e.card_id=c.card_id WHERE {where_sql} ORDER BY e.created_at DESC"
+        if limit_experiments:
+            exp_sql += f" LIMIT {int(limit_experiments)}"
+        c.execute(f"""
+            SELECT ve.exp_id, ve.variant_id, ve.element_type, ve.element_value
+            FROM variant_elements ve
+            WHERE ve.exp_id IN ({exp_sql})
+        """, params)
+        elements: dict[tuple[str, str], list[tuple[str, str]]] = {}
+        for row in c.fetchall():
+            elements.setdefault((row["exp_id"], row["variant_id"]), []).append((row["element_type"], row["element_value"]))
+        c.execute(f"""
+            SELECT vm.exp_id, vm.variant_id, vm.os, vm.ipm, vm.cpi
+            FROM variant_metrics vm
+            WHERE vm.exp_id IN ({exp_sql})
+        """, params)
+        return [
+            {"exp_id": row["exp_id"], "variant_id": row["variant_id"], "os": row["os"], "ipm": row["ipm"] or 0.0,
+             "cpi": row["cpi"] or 0.0, "elements": elements[(row["exp_id"], row["variant_id"])]}
+            for row in c.fetchall()
+            if (row["exp_id"], row["variant_id"]) in elements
+        ]
+    finally:
+        conn.close()
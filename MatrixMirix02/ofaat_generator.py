@@ -1,12 +1,29 @@
 """
 OFAAT（One Factor At A Time）变体生成器。
 从 hook/sell_point/cta/asset 候选池生成变体，每个变体仅改一个元素。
+
+另提供多因子实验设计（同一批候选池）：
+- 两水平部分因子设计（分辨率 III / IV），一次筛选全部因子主效应
+- 多水平 D-optimal 设计（坐标交换 + Sherman–Morrison 秩一更新），用远少于全因子的臂数估全部主效应
+配套估计：element_scores.estimate_element_effects（最小二乘主效应 → ElementScore）
 """
 from __future__ import annotations
 
-from typing import Any
+import itertools
+import math
+from typing import Any, Sequence
 
 from eval_schemas import AssetVariables, Variant
+from rng_streams import seeded
+from stats_utils import cholesky, gram, log_det_from_cholesky, spd_inverse
+
+ASSET_KEYS = ("subtitle_template", "bgm", "rhythm", "shot_template")
+_ASSET_DEFAULTS = {
+    "subtitle_template": "大字+高亮关键词",
+    "bgm": "电子/节奏感",
+    "rhythm": "快切，3秒一镜",
+    "shot_template": "游戏画面+字幕叠加",
+}
 
 
 def generate_ofaat_variants(
@@ -204,3 +221,268 @@ def generate_ofaat_variants(
         vid += 1
 
     return variants[:n]
+
+
+# -------- 多因子实验设计 --------
+
+
+def _design_factors(
+    hook_types: list[str],
+    sell_points: list[str],
+    ctas: list[str],
+    asset_pool: dict[str, list[str]] | None,
+) -> list[tuple[str, list[str]]]:
+    """候选池 → 因子列表 [(字段, 水平)]，各池首个为基线水平（与 OFAAT 一致）"""
+
+    def _clean(xs: Any) -> list[str]:
+        return list(dict.fromkeys(str(x).strip() for x in (xs or []) if x and str(x).strip()))
+
+    factors = [
+        ("hook_type", _clean(hook_types) or [""]),
+        ("sell_point", _clean(sell_points) or [""]),
+        ("cta", _clean(ctas) or [""]),
+    ]
+    asset_pool = asset_pool or {}
+    for k in ASSET_KEYS:
+        factors.append((f"asset_var.{k}", _clean(asset_pool.get(k)) or [_ASSET_DEFAULTS[k]]))
+    return factors
+
+
+def fractional_factorial_design(n_factors: int, *, resolution: int = 3) -> list[list[int]]:
+    """
+    两水平部分因子设计（0=基线水平，1=备选水平）。
+
+    - 分辨率 III：取最小 m 使 2^m - 1 ≥ n_factors，前 m 列为基础全因子，
+      其余列为基础列的交互（高阶优先）；主效应彼此不混杂
+    - 分辨率 IV：对分辨率 III 设计做折叠（foldover），主效应不与二阶交互混杂
+    """
+    if n_factors <= 0:
+        return []
+    if resolution not in (3, 4):
+        raise ValueError("resolution 仅支持 3 或 4")
+    m = 1
+    while (1 << m) - 1 < n_factors:
+        m += 1
+    generators: list[tuple[int, ...]] = [(i,) for i in range(m)]
+    for size in range(m, 1, -1):
+        generators.extend(itertools.combinations(range(m), size))
+    generators = generators[:n_factors]
+    rows: list[list[int]] = []
+    for base in itertools.product((-1, 1), repeat=m):
+        coded = [math.prod(base[i] for i in g) for g in generators]
+        rows.append([1 if c > 0 else 0 for c in coded])
+    if resolution == 4:
+        rows += [[1 - x for x in r] for r in rows]
+    return rows
+
+
+def _param_offsets(levels: Sequence[int]) -> tuple[list[int], int]:
+    """处理编码（基线为参照）下各因子的列偏移与总参数数（含截距）"""
+    offsets, p = [], 1
+    for L in levels:
+        offsets.append(p)
+        p += max(0, L - 1)
+    return offsets, p
+
+
+def _row_support(row: Sequence[int], offsets: Sequence[int]) -> list[int]:
+    """0/1 设计行的非零列下标（截距 + 各非基线水平）"""
+    return [0] + [offsets[f] + lv - 1 for f, lv in enumerate(row) if lv > 0]
+
+
+def _quad(Minv: list[list[float]], a: list[int], b: list[int]) -> float:
+    return sum(Minv[i][j] for i in a for j in b)
+
+
+def _rank_one(Minv: list[list[float]], support: list[int], sign: float) -> None:
+    """Sherman–Morrison：M ← M + sign·xx'，原地更新 M⁻¹（x 为 0/1 稀疏向量）"""
+    p = len(Minv)
+    u = [sum(Minv[i][j] for j in support) for i in range(p)]
+    denom = 1.0 + sign * sum(u[j] for j in support)
+    if abs(denom) < 1e-12:
+        return
+    c = sign / denom
+    for i in range(p):
+        ui = u[i] * c
+        if ui:
+            Mi = Minv[i]
+            for j in range(p):
+                Mi[j] -= ui * u[j]
+
+
+def d_optimal_design(
+    levels: Sequence[int],
+    n_runs: int,
+    *,
+    fixed_rows: Sequence[Sequence[int]] = (),
+    seed: str = "d_optimal",
+    n_starts: int = 3,
+    max_passes: int = 20,
+) -> list[list[int]]:
+    """
+    多水平 D-optimal 设计：最大化主效应模型（截距 + 处理编码）信息矩阵行列式。
+
+    坐标交换：逐行逐因子尝试替换水平，用 Fedorov Δ = (1+d(x'))(1-d(x)) + d(x,x')² 判断
+    行列式增益，接受后用两次 Sherman–Morrison 秩一更新 M⁻¹。fixed_rows（如基线臂）不参与交换。
+    返回 n_runs 行（含 fixed_rows），每行为各因子水平下标。
+    """
+    levels = [max(1, int(L)) for L in levels]
+    offsets, p = _param_offsets(levels)
+    fixed = [list(r) for r in fixed_rows]
+    n_free = n_runs - len(fixed)
+    if n_free < 0:
+        raise ValueError("n_runs 小于固定行数")
+    if n_runs < p:
+        raise ValueError(f"n_runs={n_runs} 少于主效应参数数 {p}，无法估计全部主效应")
+
+    best_rows: list[list[int]] | None = None
+    best_logdet = -math.inf
+    for start in range(max(1, n_starts)):
+        rng = seeded(f"{seed}:{start}")
+        # 初始：各因子水平轮转后随机打散，保证每个水平至少出现一次
+        cols = []
+        for L in levels:
+            col = [i % L for i in range(n_free)]
+            rng.shuffle(col)
+            cols.append(col)
+        rows = fixed + [[cols[f][r] for f in range(len(levels))] for r in range(n_free)]
+
+        # M = X'X + εI（ε 保证初始可逆）
+        M = [[0.0] * p for _ in range(p)]
+        for row in rows:
+            sup = _row_support(row, offsets)
+            for i in sup:
+                for j in sup:
+                    M[i][j] += 1.0
+        for i in range(p):
+            M[i][i] += 1e-6
+        Minv = spd_inverse(cholesky(M))
+
+        for _ in range(max_passes):
+            improved = False
+            for r in range(len(fixed), len(rows)):
+                for f, Lf in enumerate(levels):
+                    if Lf < 2:
+                        continue
+                    row = rows[r]
+                    old_sup = _row_support(row, offsets)
+                    d_old = _quad(Minv, old_sup, old_sup)
+                    best_gain, best_lv = 1.0 + 1e-9, None
+                    for lv in range(Lf):
+                        if lv == row[f]:
+                            continue
+                        cand = row[:f] + [lv] + row[f + 1:]
+                        new_sup = _row_support(cand, offsets)
+                        d_new = _quad(Minv, new_sup, new_sup)
+                        d_cross = _quad(Minv, new_sup, old_sup)
+                        gain = (1.0 + d_new) * (1.0 - d_old) + d_cross * d_cross
+                        if gain > best_gain:
+                            best_gain, best_lv = gain, lv
+                    if best_lv is not None:
+                        new_row = row[:f] + [best_lv] + row[f + 1:]
+                        _rank_one(Minv, _row_support(new_row, offsets), 1.0)
+                        _rank_one(Minv, old_sup, -1.0)
+                        rows[r] = new_row
+                        improved = True
+            if not improved:
+                break
+
+        X = [[0.0] * p for _ in rows]
+        for xr, row in zip(X, rows):
+            for j in _row_support(row, offsets):
+                xr[j] = 1.0
+        try:
+            logdet = log_det_from_cholesky(cholesky(gram(X)))
+        except ValueError:
+            logdet = -math.inf
+        if best_rows is None or logdet > best_logdet:
+            best_rows, best_logdet = rows, logdet
+    return best_rows or []
+
+
+def is_factorial_design(variants: Sequence[Variant]) -> bool:
+    """是否为多因子设计产出的变体（任一变体同时改了多个字段）"""
+    return any("+" in (getattr(v, "changed_field", "") or "") for v in variants)
+
+
+def generate_design_variants(
+    parent_card_id: str,
+    hook_types: list[str],
+    sell_points: list[str],
+    ctas: list[str],
+    *,
+    n: int | None = None,
+    asset_pool: dict[str, list[str]] | None = None,
+    method: str = "d_optimal",
+    resolution: int = 3,
+    seed: str = "design",
+) -> list[Variant]:
+    """
+    多因子实验设计生成变体（与 OFAAT 同一批候选池，v001 固定为基线）。
+
+    - method="fractional"：两水平部分因子设计，每个因子取基线 + 首个备选
+    - method="d_optimal"：多水平 D-optimal；n 缺省为主效应参数数 + 2。
+      n 不足以估计全部水平时，从水平最多的因子起依次裁掉末尾水平
+    fractional 的设计行数多于 n 时不截断（截断后设计奇异），改走 d_optimal。
+    返回的变体 changed_field 形如 "hook_type+cta"，delta_desc 列出全部改动。
+    """
+    factors = [(f, lv) for f, lv in _design_factors(hook_types, sell_points, ctas, asset_pool)]
+    active = [i for i, (_, lv) in enumerate(factors) if len(lv) > 1]
+    baseline = [0] * len(factors)
+
+    if method == "fractional":
+        design = fractional_factorial_design(len(active), resolution=resolution)
+        if n is not None and n < 1 + sum(1 for d in design if any(d)):
+            method = "d_optimal"
+
+    if method == "fractional":
+        for i in active:
+            factors[i] = (factors[i][0], factors[i][1][:2])
+        rows = []
+        for d in design:
+            row = list(baseline)
+            for k, i in enumerate(active):
+                row[i] = d[k]
+            rows.append(row)
+        rows = [baseline] + [r for r in rows if any(r)]
+    elif method == "d_optimal":
+        levels = [len(lv) for _, lv in factors]
+        _, p = _param_offsets(levels)
+        n_runs = n if n is not None else p + 2
+        while p > n_runs and any(levels[i] > 1 for i in active):
+            i = max(active, key=lambda k: levels[k])
+            levels[i] -= 1
+            factors[i] = (factors[i][0], factors[i][1][: levels[i]])
+            _, p = _param_offsets(levels)
+        rows = d_optimal_design(levels, max(n_runs, p), fixed_rows=[baseline], seed=f"{seed}:{parent_card_id}")
+    else:
+        raise ValueError(f"未知设计方法: {method}")
+
+    base_vals = {f: lv[0] for f, lv in factors}
+    field_label = {"hook_type": "Hook", "sell_point": "卖点", "cta": "CTA"}
+    variants: list[Variant] = []
+    for idx, row in enumerate(rows, start=1):
+        vals = {f: factors[i][1][row[i]] for i, (f, _) in enumerate(factors)}
+        changed = [f for f in vals if vals[f] != base_vals[f]]
+        asset = AssetVariables(**{k: vals[f"asset_var.{k}"] for k in ASSET_KEYS})
+        descs = []
+        for f in changed:
+            label = field_label.get(f) or f"素材({f.split('.', 1)[-1]})"
+            descs.append(f"{label}: {str(base_vals[f])[:16]} -> {str(vals[f])[:16]}")
+        sell = vals["sell_point"]
+        variants.append(
+            Variant(
+                variant_id=f"v{idx:03d}",
+                parent_card_id=parent_card_id,
+                hook_type=vals["hook_type"],
+                sell_point=sell,
+                cta_type=vals["cta"],
+                expression_template="5镜头",
+                asset_variables=asset,
+                why_you_expression=sell,
+                why_now_expression=sell,
+                changed_field="+".join(dict.fromkeys("asset_var" if f.startswith("asset_var.") else f for f in changed)),
+                delta_desc="；".join(descs) if descs else "基线",
+            )
+        )
+    return variants
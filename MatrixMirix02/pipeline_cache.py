@@ -0,0 +1,419 @@
+"""
+决策流水线分阶段缓存：按内容哈希记忆 simulate / gate / element_scores / diagnosis 各阶段结果。
+
+- 键：阶段名 + 输入内容的稳定哈希（pydantic model_dump / dataclass / 基础类型规范化后 sha1）
+- 内存层：每阶段一个 LRU（OrderedDict），超出 maxsize 淘汰最久未用
+- 磁盘层：可选，pickle 写入 data/stage_cache/v<版本>-<模型 schema 指纹>/<stage>/<key>.pkl，多进程 / 多会话共享；
+  每阶段按文件数 / 字节数封顶，超出按 mtime 淘汰（命中时 touch，近似 LRU）；读不出的文件直接删除
+- 改一个变体只会让该变体的 metrics 与依赖它的 gate / 元素分 / 诊断失效，其余阶段直接命中
+"""
+from __future__ import annotations
+
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+try:
+    from path_config import REPO_ROOT
+except ImportError:
+    REPO_ROOT = Path(__file__).resolve().parent.parent
+
+T = TypeVar("T")
+
+# 阶段计算逻辑变更时递增，旧磁盘缓存自动失效（输出模型字段增删由 schema_fingerprint 兜底）
+STAGE_CACHE_VERSION = 3
+DEFAULT_MAXSIZE = 2048
+# 磁盘层每阶段上限；超出后按 mtime 淘汰到上限的 80%
+DISK_MAX_FILES = 4096
+DISK_MAX_BYTES = 64 * 1024 * 1024
+_DISK_LOW_WATER = 0.8
+# 环境变量 DS_STAGE_CACHE_DIR 可改磁盘目录；设为空串关闭磁盘层
+_env_dir = os.environ.get("DS_STAGE_CACHE_DIR")
+if _env_dir is None:
+    STAGE_CACHE_DIR: Path | None = REPO_ROOT / "data" / "stage_cache"
+else:
+    STAGE_CACHE_DIR = Path(_env_dir) if _env_dir else None
+
+
+# -------- 内容哈希 --------
+
+
+def _canonical(obj: Any) -> Any:
+    """转为可稳定 JSON 序列化的结构：模型 → dict，集合排序，元组 → list"""
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if hasattr(obj, "model_dump"):
+        return _canonical(obj.model_dump(mode="json"))
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return _canonical(dataclasses.asdict(obj))
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(x) for x in obj]
+    if isinstance(obj, (set, frozenset)):
+        return sorted((_canonical(x) for x in obj), key=lambda x: json.dumps(x, sort_keys=True, ensure_ascii=False))
+    return repr(obj)
+
+
+def content_hash(*parts: Any) -> str:
+    """多个输入的稳定内容哈希（与对象身份、dict 插入顺序无关）"""
+    payload = json.dumps([_canonical(p) for p in parts], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# 被缓存的输出模型；字段增删改后指纹变化，旧 pickle（反序列化后缺字段）不会再被读到
+_CACHED_MODELS = (
+    ("simulate_metrics", "SimulatedMetrics"),
+    ("explore_gate", "ExploreGateResult"),
+    ("validate_gate", "ValidateGateResult"),
+    ("element_scores", "ElementScore"),
+    ("diagnosis", "DiagnosisResult"),
+    ("variant_suggestions", "VariantSuggestion"),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def schema_fingerprint() -> str:
+    """缓存输出模型的字段名 + 类型注解指纹（pydantic 模型 / dataclass）"""
+    schema: dict[str, Any] = {}
+    for module, name in _CACHED_MODELS:
+        try:
+            cls = getattr(__import__(module), name)
+        except (ImportError, AttributeError):
+            continue
+        if hasattr(cls, "model_fields"):
+            schema[name] = {k: str(f.annotation) for k, f in cls.model_fields.items()}
+        elif dataclasses.is_dataclass(cls):
+            schema[name] = {f.name: str(f.type) for f in dataclasses.fields(cls)}
+    return content_hash(schema)[:12]
+
+
+def _disk_tag() -> str:
+    return f"v{STAGE_CACHE_VERSION}-{schema_fingerprint()}"
+
+
+# -------- LRU + 磁盘层 --------
+
+
+class StageCache:
+    """单阶段缓存：内存 LRU，未命中时回落磁盘层，再未命中才计算"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        maxsize: int = DEFAULT_MAXSIZE,
+        disk_dir: Path | None = None,
+        disk_max_files: int = DISK_MAX_FILES,
+        disk_max_bytes: int = DISK_MAX_BYTES,
+    ) -> None:
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        # 目录带版本号与 schema 指纹：版本递增或模型变化后旧 pickle 不会再被读到
+        self.disk_dir = (Path(disk_dir) / _disk_tag() / name) if disk_dir else None
+        self.disk_max_files = max(1, int(disk_max_files))
+        self.disk_max_bytes = max(1, int(disk_max_bytes))
+        self._data: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        # 磁盘占用的进程内估计；None 表示尚未扫描
+        self._disk_files: int | None = None
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path | None:
+        return (self.disk_dir / f"{key}.pkl") if self.disk_dir else None
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, self._data[key]
+        path = self._disk_path(key)
+        if path is not None and path.exists():
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except Exception:
+                # 截断 / 旧结构 / 非本程序写入的文件：删除，避免每次都重读
+                _unlink_quiet(path)
+            else:
+                self.disk_hits += 1
+                self._remember(key, value)
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return True, value
+        self.misses += 1
+        return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        self._remember(key, value)
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = tmp.stat().st_size
+            os.replace(tmp, path)
+        except Exception:
+            # 磁盘层仅为加速，写失败（只读文件系统等）不影响结果
+            return
+        self._account_disk(size)
+
+    def _scan_disk(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for p in self.disk_dir.glob("*.pkl"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        return entries
+
+    def _account_disk(self, size: int) -> None:
+        """记一笔写入；估计超出上限时重新扫描目录（含其他进程写入），按 mtime 从旧到新删到低水位"""
+        with self._disk_lock:
+            if self._disk_files is None:
+                entries = self._scan_disk()
+                self._disk_files = len(entries)
+                self._disk_bytes = sum(e[1] for e in entries)
+            else:
+                self._disk_files += 1
+                self._disk_bytes += size
+            if self._disk_files <= self.disk_max_files and self._disk_bytes <= self.disk_max_bytes:
+                return
+            entries = sorted(self._scan_disk(), key=lambda e: e[0])
+            n_files = len(entries)
+            n_bytes = sum(e[1] for e in entries)
+            max_files = int(self.disk_max_files * _DISK_LOW_WATER)
+            max_bytes = int(self.disk_max_bytes * _DISK_LOW_WATER)
+            for _, sz, p in entries:
+                if n_files <= max_files and n_bytes <= max_bytes:
+                    break
+                if _unlink_quiet(p):
+                    n_files -= 1
+                    n_bytes -= sz
+            self._disk_files = n_files
+            self._disk_bytes = n_bytes
+
+    def get_or_compute(self, key: str, compute: Callable[[], T]) -> T:
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self, *, disk: bool = False) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if disk and self.disk_dir and self.disk_dir.exists():
+            for p in self.disk_dir.glob("*.pkl"):
+                _unlink_quiet(p)
+            with self._disk_lock:
+                self._disk_files = None
+                self._disk_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+def _unlink_quiet(path: Path) -> bool:
+    try:
+        path.unlink()
+    except OSError:
+        return False
+    return True
+
+
+def _prune_stale_versions(root: Path) -> None:
+    """删除旧版本目录（v<N>[-指纹] 与早期无版本的 <stage>/）里的 pickle；只动 *.pkl / *.tmp，不删其他文件"""
+    if not root.is_dir():
+        return
+    current = _disk_tag()
+    for child in root.iterdir():
+        if not child.is_dir() or child.name == current:
+            continue
+        stage_dirs = [d for d in child.iterdir() if d.is_dir()] if re.fullmatch(r"v\d+(-[0-9a-f]+)?", child.name) else [child]
+        for d in stage_dirs:
+            for p in list(d.glob("*.pkl")) + list(d.glob("*.tmp")):
+                _unlink_quiet(p)
+            try:
+                d.rmdir()
+            except OSError:
+                pass
+        if child not in stage_dirs:
+            try:
+                child.rmdir()
+            except OSError:
+                pass
+
+
+_CACHES: dict[str, StageCache] = {}
+_CACHES_LOCK = threading.Lock()
+_PRUNED = False
+
+
+def get_stage_cache(stage: str, *, maxsize: int = DEFAULT_MAXSIZE) -> StageCache:
+    global _PRUNED
+    with _CACHES_LOCK:
+        if not _PRUNED and STAGE_CACHE_DIR is not None:
+            _PRUNED = True
+            try:
+                _prune_stale_versions(STAGE_CACHE_DIR)
+            except OSError:
+                pass
+        cache = _CACHES.get(stage)
+        if cache is None:
+            cache = _CACHES[stage] = StageCache(stage, maxsize=maxsize, disk_dir=STAGE_CACHE_DIR)
+        return cache
+
+
+def _config_version() -> str:
+    try:
+        from vertical_config import config_version
+    except ImportError:
+        return ""
+    return config_version()
+
+
+def _rng_mode() -> str:
+    try:
+        from rng_streams import DEFAULT_MODE
+    except ImportError:
+        return ""
+    return DEFAULT_MODE
+
+
+def memoize_stage(stage: str, key_parts: tuple, compute: Callable[[], T]) -> T:
+    """按 (阶段, 版本 + 模型指纹, 配置版本, 随机流模式, 输入内容哈希) 记忆 compute() 结果；词库热更新或切换 DS_RNG_MODE 后旧结果自然失效"""
+    key = content_hash(_disk_tag(), _config_version(), _rng_mode(), stage, *key_parts)
+    return get_stage_cache(stage).get_or_compute(key, compute)
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {name: c.stats() for name, c in sorted(_CACHES.items())}
+
+
+def clear_stage_caches(*, disk: bool = False) -> None:
+    for c in list(_CACHES.values()):
+        c.clear(disk=disk)
+
+
+# -------- 各阶段记忆化入口 --------
+
+
+def cached_simulate_metrics(variant: Any, os: str, *, baseline: bool = False, motivation_bucket: str = "", vertical: str = "casual_game", objective: str = ""):
+    """单变体 × 单 OS 指标：仅依赖该变体内容与上下文"""
+    from simulate_metrics import simulate_metrics
+
+    return memoize_stage(
+        "metrics", (variant, os, baseline, motivation_bucket, vertical, objective),
+        lambda: simulate_metrics(variant, os, baseline=baseline, motivation_bucket=motivation_bucket, vertical=vertical, objective=objective),
+    )
+
+
+def cached_card_metrics(variants: list, *, motivation_bucket: str, vertical: str) -> list:
+    """整卡 metrics：variants[0] 作 baseline，其余为变体，每个 (变体, OS) 单独命中缓存"""
+    metrics = []
+    for i, v in enumerate(variants):
+        for os_name in ("iOS", "Android"):
+            metrics.append(cached_simulate_metrics(v, os_name, baseline=(i == 0), motivation_bucket=motivation_bucket, vertical=vertical))
+    return metrics
+
+
+def cached_explore_gate(variant_metrics: list, baseline_metrics: Any, context: dict[str, Any], *, config: Any = None):
+    """单 OS 探索 Gate：键为该 OS 的变体 / baseline 指标 + context + 阈值"""
+    from explore_gate import evaluate_explore_gate
+
+    target_os = context.get("os", "")
+    key_vm = [m for m in variant_metrics if not target_os or getattr(m, "os", None) in (None, target_os)]
+    key_bl = [m for m in baseline_metrics if not target_os or getattr(m, "os", None) in (None, target_os)] if isinstance(baseline_metrics, list) else baseline_metrics
+    return memoize_stage(
+        "explore_gate", (key_vm, key_bl, context, config),
+        lambda: evaluate_explore_gate(variant_metrics, baseline_metrics, context, config=config),
+    )
+
+
+def cached_validate_gate(windowed_metrics: list, light_exploration_metrics: Any = None, *, config: Any = None):
+    from validate_gate import evaluate_validate_gate
+
+    return memoize_stage(
+        "validate_gate", (windowed_metrics, light_exploration_metrics, config),
+        lambda: evaluate_validate_gate(windowed_metrics, light_exploration_metrics, config=config),
+    )
+
+
+def cached_element_scores(variant_metrics: list, variants: list, *, mode: str = "raw", vertical: str | None = None):
+    """
+    整卡元素分：任一变体或其 metrics 变化才重算；多因子设计的变体走主效应最小二乘。
+    mode="eb" 时做经验贝叶斯收缩，知识库先验内容计入缓存键（新实验入库后自然失效）；
+    mode="bootstrap" 时附加按变体重抽样的百分位区间（固定次数、不限时：按时限截断的结果随机器负载变化，不能进共享缓存）；
+    mode="ridge" 时走元素指示变量 + OS 的稀疏岭回归（任意设计均可，优先于多因子判断）。
+    """
+    from element_scores import compute_element_scores, estimate_element_effects, load_priors
+    from ofaat_generator import is_factorial_design
+
+    if mode == "ridge":
+        from element_regression import element_effects_for_card
+
+        return memoize_stage(
+            "element_scores_ridge", (variant_metrics, variants),
+            lambda: element_effects_for_card(variant_metrics, variants),
+        )
+    if is_factorial_design(variants):
+        return memoize_stage(
+            "element_effects", (variant_metrics, variants),
+            lambda: estimate_element_effects(variant_metrics, variants),
+        )
+    if mode == "eb":
+        priors = load_priors(vertical)
+        return memoize_stage(
+            "element_scores_eb", (variant_metrics, variants, vertical, priors),
+            lambda: compute_element_scores(variant_metrics=variant_metrics, variants=variants, shrinkage="eb", priors=priors),
+        )
+    if mode == "bootstrap":
+        from element_bootstrap import bootstrap_card_element_scores
+
+        return memoize_stage(
+            "element_scores_bootstrap", (variant_metrics, variants),
+            lambda: bootstrap_card_element_scores(variant_metrics, variants, time_budget_s=None),
+        )
+    return memoize_stage(
+        "element_scores", (variant_metrics, variants),
+        lambda: compute_element_scores(variant_metrics=variant_metrics, variants=variants),
+    )
+
+
+def cached_diagnose(*, explore_ios: Any, explore_android: Any, validate_result: Any, metrics: list):
+    """整卡诊断：依赖双端 Gate、验证结果与 metrics"""
+    from diagnosis import diagnose
+
+    return memoize_stage(
+        "diagnosis", (explore_ios, explore_android, validate_result, metrics),
+        lambda: diagnose(explore_ios=explore_ios, explore_android=explore_android, validate_result=validate_result, metrics=metrics),
+    )
@@ -0,0 +1,287 @@
+"""
+决策看板增量重算 DAG：variants → metrics → explore gates → validate → diagnosis
+→ element scores → suggestions → card score → summary。
+
+- 每个节点记录输入指纹（依赖节点指纹的组合，输入节点为内容哈希）
+- 输入未变的节点直接复用上次结果，只重跑变更输入的下游
+- 每个节点记录耗时 / 运行次数 / 跳过次数，供 Health 页展示
+"""
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from pipeline_cache import content_hash
+
+
+@dataclass(frozen=True)
+class DagNode:
+    """DAG 节点：fn 以依赖节点的值作关键字参数调用"""
+
+    name: str
+    deps: tuple[str, ...]
+    fn: Callable[..., Any]
+
+
+@dataclass
+class NodeTiming:
+    name: str
+    runs: int = 0
+    skips: int = 0
+    last_ms: float = 0.0
+    total_ms: float = 0.0
+    last_status: str = "-"  # run / skip / input
+
+
+@dataclass
+class PipelineDAG:
+    """带脏标记的流水线 DAG；inputs 为外部输入名，nodes 为计算节点"""
+
+    inputs: tuple[str, ...]
+    nodes: list[DagNode]
+    _order: list[DagNode] = field(default_factory=list, init=False, repr=False)
+    _values: dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+    _fp: dict[str, str] = field(default_factory=dict, init=False, repr=False)
+    _timings: dict[str, NodeTiming] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        names = set(self.inputs)
+        by_name: dict[str, DagNode] = {}
+        for n in self.nodes:
+            if n.name in names or n.name in by_name:
+                raise ValueError(f"DAG 节点重名: {n.name}")
+            by_name[n.name] = n
+        known = names | set(by_name)
+        for n in self.nodes:
+            missing = [d for d in n.deps if d not in known]
+            if missing:
+                raise ValueError(f"DAG 节点 {n.name} 依赖未定义: {missing}")
+        # Kahn 拓扑排序，同层保持声明顺序
+        indeg = {n.name: sum(1 for d in n.deps if d in by_name) for n in self.nodes}
+        children: dict[str, list[str]] = defaultdict(list)
+        for n in self.nodes:
+            for d in n.deps:
+                children[d].append(n.name)
+        ready = [n.name for n in self.nodes if indeg[n.name] == 0]
+        while ready:
+            name = ready.pop(0)
+            self._order.append(by_name[name])
+            for c in children[name]:
+                indeg[c] -= 1
+                if indeg[c] == 0:
+                    ready.append(c)
+        if len(self._order) != len(self.nodes):
+            raise ValueError("DAG 存在环")
+        for name in (*self.inputs, *by_name):
+            self._timings[name] = NodeTiming(name=name)
+
+    # -------- 输入 --------
+
+    def set_inputs(self, **values: Any) -> list[str]:
+        """写入外部输入；返回内容实际变化的输入名"""
+        changed = []
+        for name, value in values.items():
+            if name not in self.inputs:
+                raise KeyError(f"未知 DAG 输入: {name}")
+            fp = content_hash(value)
+            if self._fp.get(name) != fp:
+                self._values[name] = value
+                self._fp[name] = fp
+                self._timings[name].last_status = "input"
+                changed.append(name)
+            else:
+                self._timings[name].last_status = "skip"
+        return changed
+
+    def invalidate(self, name: str | None = None) -> None:
+        """强制节点（None 为全部）下次重算"""
+        if name is None:
+            for n in self._order:
+                self._fp.pop(n.name, None)
+        else:
+            self._fp.pop(name, None)
+
+    # -------- 依赖关系 --------
+
+    def downstream(self, name: str) -> list[str]:
+        """name 的所有下游节点（拓扑序）"""
+        affected = {name}
+        out = []
+        for n in self._order:
+            if any(d in affected for d in n.deps):
+                affected.add(n.name)
+                out.append(n.name)
+        return out
+
+    def _node_fp(self, node: DagNode) -> str | None:
+        dep_fps = [self._fp.get(d) for d in node.deps]
+        if any(fp is None for fp in dep_fps):
+            return None
+        return content_hash(node.name, dep_fps)
+
+    def dirty_nodes(self) -> list[str]:
+        """按当前输入，run() 将重算的节点"""
+        dirty: set[str] = set()
+        for n in self._order:
+            if n.name not in self._fp or any(d in dirty for d in n.deps) or self._node_fp(n) != self._fp.get(n.name):
+                dirty.add(n.name)
+        return [n.name for n in self._order if n.name in dirty]
+
+    # -------- 执行 --------
+
+    def run(self) -> dict[str, Any]:
+        """按拓扑序执行；依赖指纹未变的节点跳过，返回全部输入 + 节点值"""
+        missing = [i for i in self.inputs if i not in self._fp]
+        if missing:
+            raise ValueError(f"DAG 输入未设置: {missing}")
+        for n in self._order:
+            fp = self._node_fp(n)
+            t = self._timings[n.name]
+            if fp is not None and self._fp.get(n.name) == fp and n.name in self._values:
+                t.skips += 1
+                t.last_status = "skip"
+                continue
+            t0 = time.perf_counter()
+            value = n.fn(**{d: self._values[d] for d in n.deps})
+            ms = (time.perf_counter() - t0) * 1000
+            self._values[n.name] = value
+            self._fp[n.name] = fp
+            t.runs += 1
+            t.last_ms = ms
+            t.total_ms += ms
+            t.last_status = "run"
+        return dict(self._values)
+
+    def timings(self) -> list[dict[str, Any]]:
+        """节点耗时表（输入在前，计算节点按拓扑序）"""
+        names = [*self.inputs, *(n.name for n in self._order)]
+        return [
+            {
+                "node": t.name, "status": t.last_status, "runs": t.runs, "skips": t.skips,
+                "last_ms": round(t.last_ms, 2), "total_ms": round(t.total_ms, 2),
+            }
+            for t in (self._timings[name] for name in names)
+        ]
+
+
+# -------- 决策看板 DAG --------
+
+
+# config_version：vertical_config 热更新时变化，依赖词库 / 权重的节点据此重算
+# element_mode：元素分估计方式（raw 原始均值差 / eb 经验贝叶斯收缩 / bootstrap 附重抽样区间 / ridge 稀疏岭回归）
+DECISION_DAG_INPUTS = ("card", "variants", "motivation_bucket", "vertical", "windows", "config_version", "element_mode")
+
+
+def _node_metrics(variants, motivation_bucket, vertical, config_version):
+    from pipeline_cache import cached_card_metrics
+
+    return cached_card_metrics(variants, motivation_bucket=motivation_bucket, vertical=vertical)
+
+
+def _explore_node(os_name: str) -> Callable[..., Any]:
+    def _node(metrics, card, motivation_bucket, vertical):
+        from pipeline_cache import cached_explore_gate
+
+        baseline_list = [m for m in metrics if m.baseline]
+        variant_list = [m for m in metrics if not m.baseline]
+        obj = (card.objective or "").strip() or ("purchase" if vertical == "ecommerce" else "install")
+        ctx = {"country": "CN", "objective": obj, "segment": card.segment, "motivation_bucket": motivation_bucket, "os": os_name}
+        return cached_explore_gate(variant_list, baseline_list, ctx)
+
+    return _node
+
+
+def _node_validate(windows):
+    from pipeline_cache import cached_validate_gate
+
+    windowed, light_exp = windows
+    return cached_validate_gate(list(windowed), light_exp)
+
+
+def _node_diagnosis(explore_ios, explore_android, validate_result, metrics):
+    from pipeline_cache import cached_diagnose
+
+    return cached_diagnose(explore_ios=explore_ios, explore_android=explore_android, validate_result=validate_result, metrics=metrics)
+
+
+def _node_element_scores(metrics, variants, vertical, element_mode):
+    from pipeline_cache import cached_element_scores
+
+    return cached_element_scores(metrics, variants, mode=element_mode, vertical=vertical)
+
+
+def _node_suggestions(element_scores, explore_android, metrics, variants, vertical, diagnosis, config_version):
+    import inspect
+
+    from eval_schemas import decompose_variant_to_element_tags
+    from variant_suggestions import next_variant_suggestions
+
+    kwargs = dict(
+        element_scores=element_scores, gate_result=explore_android, max_suggestions=3, variant_metrics=metrics,
+        variant_to_tags={v.variant_id: decompose_variant_to_element_tags(v) for v in variants}, variants=variants, vertical=vertical,
+    )
+    if "diagnosis" in inspect.signature(next_variant_suggestions).parameters:
+        kwargs["diagnosis"] = diagnosis
+    return next_variant_suggestions(**kwargs)
+
+
+def _node_variant_scores(metrics, vertical, config_version):
+    from scoring_eval import compute_variant_score
+
+    by_os: dict[str, list] = defaultdict(list)
+    for m in metrics:
+        by_os[m.os].append(m)
+    return {(m.variant_id, m.os): compute_variant_score(m, by_os[m.os], os=m.os, vertical=vertical) for m in metrics}
+
+
+def _node_card_score(variant_scores_by_row, explore_ios, explore_android, validate_result, card, vertical, config_version):
+    from scoring_eval import compute_card_score
+    from vertical_config import get_snapshot
+
+    by_vid: dict[str, list[float]] = defaultdict(list)
+    for (vid, _), s in variant_scores_by_row.items():
+        by_vid[vid].append(s)
+    variant_scores_agg = {vid: sum(s) / len(s) for vid, s in by_vid.items()}
+    eligible_all = list(dict.fromkeys((explore_ios.eligible_variants or []) + (explore_android.eligible_variants or [])))
+    stab_penalty = 5.0 if validate_result.validate_status == "FAIL" else 0.0
+    why_now_penalty = 0.0
+    snap = get_snapshot(vertical)
+    wn_trigger = getattr(card, "why_now_trigger", "") or ""
+    if wn_trigger in snap.why_now_strong_trigger_set:
+        why_now_penalty = snap.why_now_strong_stimulus_penalty
+    elif any(("why now" in n.lower() or "虚高" in n or "强刺激" in n) for n in validate_result.risk_notes):
+        why_now_penalty = snap.why_now_strong_stimulus_penalty * 0.5
+    return compute_card_score(
+        eligible_variants=eligible_all, variant_scores=variant_scores_agg, top_k=5,
+        stability_penalty=stab_penalty, why_now_strong_stimulus_penalty=why_now_penalty,
+    )
+
+
+def _node_summary(explore_ios, explore_android, validate_result, metrics, diagnosis):
+    from decision_summary import compute_decision_summary
+
+    return compute_decision_summary({
+        "explore_ios": explore_ios, "explore_android": explore_android,
+        "validate_result": validate_result, "metrics": metrics, "diagnosis": diagnosis,
+    })
+
+
+def build_decision_dag() -> PipelineDAG:
+    """决策看板 DAG；输出键与 app_demo 的 data dict 一致"""
+    return PipelineDAG(
+        inputs=DECISION_DAG_INPUTS,
+        nodes=[
+            DagNode("metrics", ("variants", "motivation_bucket", "vertical", "config_version"), _node_metrics),
+            DagNode("explore_ios", ("metrics", "card", "motivation_bucket", "vertical"), _explore_node("iOS")),
+            DagNode("explore_android", ("metrics", "card", "motivation_bucket", "vertical"), _explore_node("Android")),
+            DagNode("validate_result", ("windows",), _node_validate),
+            DagNode("diagnosis", ("explore_ios", "explore_android", "validate_result", "metrics"), _node_diagnosis),
+            DagNode("element_scores", ("metrics", "variants", "vertical", "element_mode"), _node_element_scores),
+            DagNode("suggestions", ("element_scores", "explore_android", "metrics", "variants", "vertical", "diagnosis", "config_version"), _node_suggestions),
+            DagNode("variant_scores_by_row", ("metrics", "vertical", "config_version"), _node_variant_scores),
+            DagNode("card_score_result", ("variant_scores_by_row", "explore_ios", "explore_android", "validate_result", "card", "vertical", "config_version"), _node_card_score),
+            DagNode("summary", ("explore_ios", "explore_android", "validate_result", "metrics", "diagnosis"), _node_summary),
+        ],
+    )
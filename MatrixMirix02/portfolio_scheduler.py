@@ -0,0 +1,236 @@
+"""
+组合级测试预算调度：把全局日预算分给上百~上万张卡，输出逐卡花费计划（每小时重跑）。
+
+模型（可分离凹收益 + 最低预算门槛）：
+- 每卡价值 v_i(x) = w_i · log(1 + x / scale)，w_i 由卡分、状态权重与 Gate 不确定性（探索价值）合成
+- 最低预算 m_i（ExploreGateConfig.min_spend × 待补数据的变体数）：要么给够 m_i，要么不投
+- 第一步：按 v_i(m_i) / m_i 密度贪心选卡（0-1 背包的 LP 松弛贪心）
+- 第二步：对入选卡做注水（water-filling）：x_i = clamp(w_i / λ - scale, m_i, cap_i)，二分 λ 使总额 = 剩余预算
+两步均为 O(n log n)，1 万张卡 < 1s。
+"""
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Sequence
+
+from pydantic import BaseModel, Field
+
+from explore_gate import ExploreGateConfig
+
+
+# -------- 配置 / 输入 --------
+
+
+@dataclass
+class SchedulerConfig:
+    """调度参数（金额单位 USD）"""
+
+    # 状态权重：越往后越接近放量，单位花费的确定收益越高
+    status_weight: dict[str, float] = field(default_factory=lambda: {"未测": 0.6, "探索中": 0.8, "进验证": 1.0, "可放量": 1.2})
+    # 单卡上限 = min_spend × 倍数
+    status_cap_multiple: dict[str, float] = field(default_factory=lambda: {"未测": 2.0, "探索中": 3.0, "进验证": 4.0, "可放量": 10.0})
+    exploration_bonus: float = 0.5  # Gate 不确定性（0~1）带来的探索价值
+    score_floor: float = 0.1  # 卡分为 0 的卡仍保留少量价值（未测卡常无分）
+    scale: float = 500.0  # 收益曲线尺度：花费 ≈ scale 时边际收益减半
+    bisect_iters: int = 60
+
+
+@dataclass(frozen=True)
+class CardBudgetInput:
+    """单卡调度输入"""
+
+    card_id: str
+    card_score: float  # 0~100（compute_card_score）
+    status: str  # 未测/探索中/进验证/可放量
+    uncertainty: float = 0.5  # 0~1，Gate INSUFFICIENT 越多越高
+    min_spend: float = 500.0
+    max_spend: float | None = None  # None 时按状态倍数
+
+
+# -------- 输出模型 --------
+
+
+class CardSpendPlan(BaseModel):
+    """单卡花费计划"""
+
+    card_id: str = Field(..., description="卡片 ID")
+    status: str = Field(..., description="卡片状态")
+    spend: float = Field(..., description="本期计划花费；0 表示本期不投")
+    min_spend: float = Field(..., description="最低预算门槛")
+    cap: float = Field(..., description="本期上限")
+    priority: float = Field(..., description="价值权重 w_i")
+    marginal_value: float = Field(0.0, description="计划花费处的边际价值")
+    reason: str = Field("", description="入选 / 未入选原因")
+
+
+class PortfolioPlan(BaseModel):
+    """全局预算分配结果"""
+
+    total_budget: float = Field(..., description="全局预算")
+    allocated: float = Field(..., description="已分配")
+    unallocated: float = Field(..., description="未分配（所有入选卡均达上限时）")
+    n_cards: int = Field(..., description="卡片数")
+    n_funded: int = Field(..., description="入选卡数")
+    water_level: float = Field(0.0, description="注水 λ（入选卡共同边际价值）")
+    plans: list[CardSpendPlan] = Field(default_factory=list, description="逐卡计划，按花费降序")
+    elapsed_ms: float = Field(0.0, description="求解耗时")
+
+
+# -------- 求解 --------
+
+
+def card_priority(card: CardBudgetInput, config: SchedulerConfig) -> float:
+    """w_i = 状态权重 × (卡分/100 ∨ score_floor) + 探索价值 × 不确定性"""
+    base = max(config.score_floor, min(1.0, card.card_score / 100.0))
+    return config.status_weight.get(card.status, 1.0) * base + config.exploration_bonus * max(0.0, min(1.0, card.uncertainty))
+
+
+def _card_cap(card: CardBudgetInput, config: SchedulerConfig) -> float:
+    if card.max_spend is not None:
+        return max(card.min_spend, card.max_spend)
+    return card.min_spend * config.status_cap_multiple.get(card.status, 3.0)
+
+
+def _fill(ws: Sequence[float], lows: Sequence[float], caps: Sequence[float], lam: float, scale: float) -> float:
+    total = 0.0
+    for w, lo, hi in zip(ws, lows, caps):
+        x = w / lam - scale
+        total += lo if x < lo else (hi if x > hi else x)
+    return total
+
+
+def schedule_portfolio(
+    cards: Sequence[CardBudgetInput],
+    total_budget: float,
+    *,
+    config: SchedulerConfig | None = None,
+) -> PortfolioPlan:
+    """
+    全局预算 → 逐卡花费计划。
+
+    - 入选：按最低预算的价值密度 v_i(m_i)/m_i 降序贪心，放不下的卡跳过（后面更小的卡仍可入选）
+    - 加码：入选卡在 [m_i, cap_i] 内注水，边际价值相等；全部触顶时剩余预算留作 unallocated
+    """
+    t0 = time.perf_counter()
+    cfg = config or SchedulerConfig()
+    scale = cfg.scale
+    n = len(cards)
+    ws = [card_priority(c, cfg) for c in cards]
+    mins = [max(0.0, c.min_spend) for c in cards]
+    caps = [_card_cap(c, cfg) for c in cards]
+
+    # 1. 最低预算：0-1 背包 LP 松弛贪心
+    def _density(i: int) -> float:
+        m = mins[i]
+        return ws[i] / scale if m <= 0 else ws[i] * math.log1p(m / scale) / m
+
+    order = sorted(range(n), key=_density, reverse=True)
+    remaining = float(total_budget)
+    funded: list[int] = []
+    funded_set: set[int] = set()
+    for i in order:
+        if mins[i] <= remaining:
+            funded.append(i)
+            funded_set.add(i)
+            remaining -= mins[i]
+
+    # 2. 注水：二分 λ，使 Σ clamp(w/λ - scale, m, cap) = Σ m + remaining
+    spend = [0.0] * n
+    lam = 0.0
+    if funded:
+        f_ws = [ws[i] for i in funded]
+        f_lo = [mins[i] for i in funded]
+        f_hi = [caps[i] for i in funded]
+        target = sum(f_lo) + remaining
+        if _fill(f_ws, f_lo, f_hi, 1e-12, scale) <= target:
+            alloc = f_hi  # 全部触顶
+            lam = min(w / (scale + hi) for w, hi in zip(f_ws, f_hi))
+        else:
+            lo_l, hi_l = 1e-12, max(f_ws) / scale + 1.0
+            for _ in range(cfg.bisect_iters):
+                mid = 0.5 * (lo_l + hi_l)
+                if _fill(f_ws, f_lo, f_hi, mid, scale) > target:
+                    lo_l = mid
+                else:
+                    hi_l = mid
+            lam = hi_l
+            alloc = [min(hi, max(lo, w / lam - scale)) for w, lo, hi in zip(f_ws, f_lo, f_hi)]
+        for i, x in zip(funded, alloc):
+            spend[i] = math.floor(x * 100) / 100
+
+    plans = []
+    for i, c in enumerate(cards):
+        if i in funded_set:
+            x = spend[i]
+            if x >= caps[i] - 0.01:
+                reason = "入选：已达本期上限"
+            elif x <= mins[i] + 0.01:
+                reason = "入选：仅最低预算"
+            else:
+                reason = "入选：按边际价值加码"
+        else:
+            x = 0.0
+            reason = "未入选：最低预算价值密度不足，全局预算已用尽"
+        plans.append(CardSpendPlan(
+            card_id=c.card_id, status=c.status, spend=x, min_spend=mins[i], cap=caps[i],
+            priority=round(ws[i], 4), marginal_value=round(ws[i] / (scale + x), 8) if i in funded_set else 0.0,
+            reason=reason,
+        ))
+    plans.sort(key=lambda p: p.spend, reverse=True)
+    allocated = round(sum(spend), 2)
+    return PortfolioPlan(
+        total_budget=float(total_budget),
+        allocated=allocated,
+        unallocated=round(float(total_budget) - allocated, 2),
+        n_cards=n,
+        n_funded=len(funded),
+        water_level=lam,
+        plans=plans,
+        elapsed_ms=round((time.perf_counter() - t0) * 1000, 2),
+    )
+
+
+# -------- 评测集接入 --------
+
+
+def _gate_uncertainty(*gates: Any) -> tuple[float, int]:
+    """Gate 不确定性 = INSUFFICIENT 变体占比；同时返回待补数据的变体数"""
+    total = insufficient = 0
+    for g in gates:
+        if g is None:
+            continue
+        details = getattr(g, "variant_details", None) or {}
+        total += len(details)
+        insufficient += sum(1 for s in details.values() if s == "INSUFFICIENT")
+        if not details and getattr(g, "gate_status", "") == "INSUFFICIENT":
+            total += 1
+            insufficient += 1
+    if total == 0:
+        return 1.0, 0
+    return insufficient / total, insufficient
+
+
+def card_inputs_from_records(
+    records: Iterable[Any],
+    *,
+    gate_config: ExploreGateConfig | None = None,
+) -> list[CardBudgetInput]:
+    """eval_set_generator.CardEvalRecord → CardBudgetInput；最低预算 = min_spend × 待补数据变体数（至少 1）"""
+    gcfg = gate_config or ExploreGateConfig()
+    out = []
+    for rec in records:
+        uncertainty, n_insufficient = _gate_uncertainty(rec.explore_ios, rec.explore_android)
+        if rec.status == "未测":
+            n_need = max(1, len(rec.variants))
+        else:
+            n_need = max(1, n_insufficient)
+        out.append(CardBudgetInput(
+            card_id=rec.card.card_id,
+            card_score=float(rec.card_score or 0.0),
+            status=rec.status,
+            uncertainty=uncertainty,
+            min_spend=gcfg.min_spend * n_need,
+        ))
+    return out
@@ -0,0 +1,136 @@
+"""
+计数器型随机流：按稳定 id 派生互不相关的流，跨进程可复现，可一次产出整段数组。
+
+- stable_key(*parts)：blake2b 64 位键（不依赖 PYTHONHASHSEED）
+- CounterStream：第 i 个 64 位输出 = SplitMix64 混合(key + (i+1)·γ)，random.Random 子类，
+  uniform / choice / choices / randint / shuffle / sample 等接口与标准库一致；split() 派生子流
+- seeded(seed)：按当前模式返回流；legacy 模式复现旧的 SHA-256 → random.Random 播种（默认，保持历史数据不变）
+- uniform_matrix(keys, n)：多个 id 各 n 个 [0,1) 抽样，供批量模拟使用
+
+模式：环境变量 DS_RNG_MODE=legacy|counter，或各函数 mode 参数覆盖。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+from array import array
+from typing import Sequence
+
+MASK64 = (1 << 64) - 1
+_GAMMA = 0x9E3779B97F4A7C15
+_INV_2_53 = 1.0 / (1 << 53)
+
+LEGACY = "legacy"
+COUNTER = "counter"
+DEFAULT_MODE = COUNTER if os.environ.get("DS_RNG_MODE", LEGACY).strip().lower() == COUNTER else LEGACY
+
+
+def _mix64(z: int) -> int:
+    """SplitMix64 finalizer"""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def stable_key(*parts: object) -> int:
+    """多个 id 片段 → 64 位稳定键"""
+    payload = "\x1f".join(str(p) for p in parts).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "little")
+
+
+class CounterStream(random.Random):
+    """计数器型随机流：状态只有 (key, counter)，任意位置可直接跳转"""
+
+    def __init__(self, key: int, counter: int = 0) -> None:
+        self._key = key & MASK64
+        self._ctr = counter
+        super().__init__(key)
+        self._ctr = counter
+
+    # -------- random.Random 子类接口 --------
+
+    def seed(self, a: object = None, version: int = 2) -> None:
+        if a is not None:
+            self._key = (a if isinstance(a, int) else stable_key(a)) & MASK64
+        self._ctr = 0
+        self.gauss_next = None
+
+    def getstate(self) -> tuple:
+        return (self._key, self._ctr, self.gauss_next)
+
+    def setstate(self, state: tuple) -> None:
+        self._key, self._ctr, self.gauss_next = state
+
+    def __reduce__(self) -> tuple:
+        # random.Random.__reduce__ 会以无参 cls() 重建，这里按 (key, counter) 重建以支持 pickle / deepcopy
+        return (CounterStream, (self._key, self._ctr), self.getstate())
+
+    def _next64(self) -> int:
+        self._ctr += 1
+        return _mix64((self._key + self._ctr * _GAMMA) & MASK64)
+
+    def random(self) -> float:
+        return (self._next64() >> 11) * _INV_2_53
+
+    def getrandbits(self, k: int) -> int:
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        out, bits = 0, 0
+        while bits < k:
+            out |= self._next64() << bits
+            bits += 64
+        return out & ((1 << k) - 1)
+
+    # -------- 扩展 --------
+
+    @property
+    def key(self) -> int:
+        return self._key
+
+    def split(self, *parts: object) -> "CounterStream":
+        """派生子流（与父流及其他子流互不相关，且不消耗父流）"""
+        return CounterStream(stable_key(self._key, *parts))
+
+    def randoms(self, n: int) -> array:
+        """连续 n 个 [0,1) 抽样"""
+        key, ctr = self._key, self._ctr
+        out = array("d", [0.0]) * n
+        for i in range(n):
+            z = (key + (ctr + i + 1) * _GAMMA) & MASK64
+            z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+            z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+            out[i] = ((z ^ (z >> 31)) >> 11) * _INV_2_53
+        self._ctr = ctr + n
+        return out
+
+
+def _legacy_random(seed: str) -> random.Random:
+    h = hashlib.sha256(seed.encode()).hexdigest()
+    return random.Random(int(h[:16], 16) % (2**32))
+
+
+def seeded(seed: str, *, mode: str | None = None) -> random.Random:
+    """按 seed 字符串取随机流；legacy 与历史 _seeded / _seeded_random 输出逐位一致"""
+    if (mode or DEFAULT_MODE) == LEGACY:
+        return _legacy_random(seed)
+    return CounterStream(stable_key(seed))
+
+
+def unit_hash(text: str, *, mode: str | None = None) -> float:
+    """无状态的 [0,1) 确定性值（质量系数 / 卖点因子等）"""
+    if (mode or DEFAULT_MODE) == LEGACY:
+        return int(hashlib.sha256(text.encode()).hexdigest()[:8], 16) / (16**8)
+    return (_mix64(stable_key(text)) >> 11) * _INV_2_53
+
+
+def uniform_matrix(keys: Sequence[str], n: int, *, mode: str | None = None) -> list[array]:
+    """每个 id 一行、各 n 个 [0,1) 抽样；行与 seeded(key) 前 n 次 random() 一致"""
+    rows = []
+    for k in keys:
+        rng = seeded(k, mode=mode)
+        if isinstance(rng, CounterStream):
+            rows.append(rng.randoms(n))
+        else:
+            rows.append(array("d", (rng.random() for _ in range(n))))
+    return rows
@@ -0,0 +1,32 @@
+"""
+自适应预算分配示例：评测集各卡以 simulate_metrics 指标为环境，对比 Thompson 采样与均匀分配。
+不调用任何模型 API。
+"""
+import argparse
+import json
+
+from budget_allocator import BanditConfig, benchmark_eval_set
+from eval_set_generator import generate_eval_set
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Thompson vs 均匀分配预算对比")
+    parser.add_argument("--cards", type=int, default=1000, help="卡片数")
+    parser.add_argument("--objective", choices=["cpi", "ipm"], default="cpi")
+    parser.add_argument("--round-budget", type=float, default=1000.0, help="每卡每轮预算（USD）")
+    parser.add_argument("--os", default="Android")
+    args = parser.parse_args()
+
+    records = generate_eval_set(n_cards=args.cards, variants_per_card=12)
+    cfg = BanditConfig(objective=args.objective, round_budget=args.round_budget)
+    result = benchmark_eval_set(records, config=cfg, os=args.os)
+
+    print("=" * 60)
+    print(f"Thompson vs 均匀分配（{result.n_cards} 张卡，目标 {result.objective}）")
+    print("=" * 60)
+    print(json.dumps(result.model_dump(exclude={"cards"}), ensure_ascii=False, indent=2))
+    print(f"\n节省预算 {result.budget_saved:,.0f} USD（{result.budget_saved_pct:.1%}）")
+
+
+if __name__ == "__main__":
+    main()
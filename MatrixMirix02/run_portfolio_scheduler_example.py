@@ -0,0 +1,33 @@
+"""
+组合级预算调度示例：评测集所有卡按卡分 / 状态 / Gate 不确定性分配全局日预算。
+不调用任何模型 API。
+"""
+import argparse
+from collections import Counter
+
+from eval_set_generator import generate_eval_set
+from portfolio_scheduler import card_inputs_from_records, schedule_portfolio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="全局预算 → 逐卡花费计划")
+    parser.add_argument("--cards", type=int, default=200, help="卡片数")
+    parser.add_argument("--budget", type=float, default=200_000.0, help="全局预算（USD）")
+    parser.add_argument("--top", type=int, default=15, help="打印前 N 张卡")
+    args = parser.parse_args()
+
+    records = generate_eval_set(n_cards=args.cards, variants_per_card=12)
+    plan = schedule_portfolio(card_inputs_from_records(records), args.budget)
+
+    print("=" * 60)
+    print(f"全局预算 {plan.total_budget:,.0f}：已分配 {plan.allocated:,.0f}，未分配 {plan.unallocated:,.0f}")
+    print(f"入选 {plan.n_funded}/{plan.n_cards} 张卡，求解 {plan.elapsed_ms} ms")
+    print("=" * 60)
+    funded_by_status = Counter(p.status for p in plan.plans if p.spend > 0)
+    print("入选卡状态分布:", dict(funded_by_status))
+    for p in plan.plans[: args.top]:
+        print(f"  {p.card_id:<12} {p.status:<4} spend={p.spend:>9,.2f}  min={p.min_spend:>7,.0f}  cap={p.cap:>8,.0f}  w={p.priority:.3f}  {p.reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+流式止损示例：模拟上千张卡的小时级窗口，部分卡在中途 CPI 抬升 / IPM 下滑，
+对比 CUSUM 告警与「每日重跑 Validate Gate 静态阈值」的发现时间。
+不调用任何模型 API。
+"""
+import argparse
+import time
+
+from rng_streams import seeded
+from stop_loss_monitor import StopLossMonitor, stop_loss_rule_text
+from validate_gate import ValidateGateConfig, WindowMetrics
+
+
+def _window(rng, hour: int, ipm: float, cpi: float, impressions: float) -> WindowMetrics:
+    imp = max(1, int(rng.gauss(impressions, impressions * 0.15)))
+    lam = imp * ipm / 1000.0
+    installs = max(0, int(round(rng.gauss(lam, lam ** 0.5))))
+    spend = installs * cpi * rng.uniform(0.95, 1.05)
+    return WindowMetrics(
+        window_id=f"h{hour:03d}", impressions=imp, installs=installs, spend=round(spend, 2),
+        ipm=round(installs / imp * 1000, 4), cpi=round(spend / installs, 4) if installs else 0.0,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="小时级 CUSUM 止损 vs 每日静态阈值")
+    parser.add_argument("--cards", type=int, default=2000, help="卡片数")
+    parser.add_argument("--hours", type=int, default=72, help="模拟小时数")
+    parser.add_argument("--change-hour", type=int, default=24, help="劣化开始小时")
+    parser.add_argument("--degrade-share", type=float, default=0.1, help="劣化卡占比")
+    args = parser.parse_args()
+
+    gcfg = ValidateGateConfig()
+    rng = seeded("stop_loss_example")
+    cards = []
+    for i in range(args.cards):
+        kind = "stable"
+        if rng.random() < args.degrade_share:
+            kind = rng.choice(["cpi", "ipm"])
+        cards.append((f"card_{i:05d}", kind, rng.uniform(15, 40), rng.uniform(2.0, 6.0), rng.uniform(3000, 20000)))
+
+    monitor = StopLossMonitor(gate_config=gcfg)
+    first_alert: dict[str, int] = {}
+    static_hit: dict[str, int] = {}
+    daily: dict[str, list[WindowMetrics]] = {c[0]: [] for c in cards}
+    n_updates = 0
+    t0 = time.perf_counter()
+    for hour in range(args.hours):
+        for cid, kind, ipm, cpi, imp in cards:
+            if hour >= args.change_hour and kind == "cpi":
+                cpi_h, ipm_h = cpi * 1.4, ipm
+            elif hour >= args.change_hour and kind == "ipm":
+                cpi_h, ipm_h = cpi, ipm * 0.6
+            else:
+                cpi_h, ipm_h = cpi, ipm
+            w = _window(rng, hour, ipm_h, cpi_h, imp)
+            n_updates += 1
+            for a in monitor.update(cid, w):
+                first_alert.setdefault(cid, hour)
+            daily[cid].append(w)
+            # 静态规则：每 24 小时按日汇总重跑一次「CPI 较首日涨幅 / IPM 较首日跌幅」
+            if (hour + 1) % 24 == 0 and cid not in static_hit:
+                days = [daily[cid][d * 24:(d + 1) * 24] for d in range((hour + 1) // 24)]
+                agg = [(sum(x.installs for x in d), sum(x.impressions for x in d), sum(x.spend for x in d)) for d in days]
+                ipms = [a[0] / a[1] * 1000 for a in agg]
+                cpis = [a[2] / a[0] for a in agg if a[0]]
+                if len(ipms) >= 2 and (
+                    (ipms[0] - min(ipms)) / ipms[0] > gcfg.ipm_drop_max_pct
+                    or (max(cpis) - cpis[0]) / cpis[0] > gcfg.cpi_increase_max_pct
+                ):
+                    static_hit[cid] = hour
+    elapsed = time.perf_counter() - t0
+
+    degraded = {c[0] for c in cards if c[1] != "stable"}
+    tp = [first_alert[c] - args.change_hour for c in degraded if c in first_alert and first_alert[c] >= args.change_hour]
+    st = [static_hit[c] - args.change_hour for c in degraded if c in static_hit]
+    fp = sum(1 for c in first_alert if c not in degraded or first_alert[c] < args.change_hour)
+
+    print("=" * 60)
+    print(stop_loss_rule_text(gate_config=gcfg))
+    print(f"{len(monitor)} 张卡 × {args.hours} 小时 = {n_updates:,} 次更新，耗时 {elapsed:.2f}s（{elapsed / n_updates * 1e6:.1f} µs/次）")
+    print("=" * 60)
+    print(f"劣化卡 {len(degraded)} 张：CUSUM 检出 {len(tp)}，平均延迟 {sum(tp) / max(len(tp), 1):.1f} 小时")
+    print(f"                 每日静态阈值检出 {len(st)}，平均延迟 {sum(st) / max(len(st), 1):.1f} 小时")
+    print(f"误报（稳定卡或变点前告警）：{fp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -102,7 +102,21 @@ def main() -> None:
         light_expansion_metrics=light_expansion_pass,
     )
 
-    # 5. 输出
+    # 5. 多人群轻扩：一次评估多个国家/人群，给出扩量顺序
+    expansion_segments = {
+        "US_new": WindowMetrics(window_id="US_new", impressions=20000, installs=760,
+                                spend=2280, ipm=38.0, cpi=3.0, early_roas=0.08),
+        "JP_new": WindowMetrics(window_id="JP_new", impressions=18000, installs=540,
+                                spend=2160, ipm=30.0, cpi=4.0, early_roas=0.07),
+        "BR_returning": WindowMetrics(window_id="BR_returning", impressions=25000, installs=900,
+                                      spend=2790, ipm=36.0, cpi=3.1, early_roas=0.08),
+    }
+    result_multi = evaluate_validate_gate(
+        windowed_metrics=windowed_pass,
+        expansion_segments=expansion_segments,
+    )
+
+    # 6. 输出
     output = {
         "description": "Validate Gate 评测示例",
         "scenarios": {
@@ -120,6 +134,13 @@ def main() -> None:
                 },
                 "result": result_pass.model_dump(),
             },
+            "PASS_多人群扩量": {
+                "input": {
+                    "windowed_metrics": [w.model_dump() for w in windowed_pass],
+                    "expansion_segments": {k: w.model_dump() for k, w in expansion_segments.items()},
+                },
+                "result": result_multi.model_dump(),
+            },
         },
     }
 
@@ -135,6 +156,8 @@ def main() -> None:
         print(f"  validate_status: {r['validate_status']}")
         print("  risk_notes:", r["risk_notes"])
         print("  scale_recommendation:", r["scale_recommendation"])
+        if r.get("expansion_ranking"):
+            print("  expansion_ranking:", r["expansion_ranking"])
     print(f"\n已写入: {OUTPUT_PATH}")
 
 
@@ -4,24 +4,15 @@
 """
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Mapping
 
 from simulate_metrics import SimulatedMetrics
-from vertical_config import get_metric_weights, use_refund_risk
+from vertical_config import get_snapshot
 
 
-def _get_weights(os: str, vertical: str) -> dict[str, float]:
-    """从 vertical_config 取权重，兼容 ctr、refund_risk"""
-    w = get_metric_weights(vertical, os)
-    # 若缺少某项，补默认
-    for k in ("ipm", "cpi", "early_roas", "ctr"):
-        if k not in w:
-            w = dict(w)
-            w.setdefault("ipm", 0.4)
-            w.setdefault("cpi", 0.35)
-            w.setdefault("early_roas", 0.25)
-            w.setdefault("ctr", 0.0)
-    return w
+def _get_weights(os: str, vertical: str) -> Mapping[str, float]:
+    """从 vertical_config 编译快照取权重（已补齐 ipm/cpi/early_roas/ctr 默认值，只读）"""
+    return get_snapshot(vertical).score_weights
 
 
 def compute_variant_score(
@@ -84,7 +75,7 @@ def compute_variant_score(
         + w.get("ctr", 0) * norm_ctr
     )
     # 电商：退款风险扣分
-    if use_refund_risk(vertical):
+    if get_snapshot(vertical).use_refund_risk:
         rr = getattr(m, "refund_risk", 0) or 0
         score -= rr * 15
     return round(min(100.0, max(0.0, score)), 1)
@@ -4,13 +4,16 @@ TikTok 投放评测原型：模拟投放数据生成器
 """
 from __future__ import annotations
 
-import hashlib
 import json
 import random
+from functools import lru_cache
 from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
+from rng_streams import seeded, unit_hash
+from vertical_config import config_version, get_motivation_bucket_matcher
+
 
 OS = Literal["iOS", "Android"]
 
@@ -59,17 +62,13 @@ _IMPRESSIONS_VARIANCE = 0.4  # ±40%
 
 
 def _seeded_random(seed_str: str) -> random.Random:
-    """基于字符串生成确定性随机数生成器"""
-    h = hashlib.sha256(seed_str.encode()).hexdigest()
-    seed = int(h[:16], 16) % (2**32)
-    return random.Random(seed)
+    """基于字符串生成确定性随机数生成器（rng_streams：legacy 模式与历史播种一致）"""
+    return seeded(seed_str)
 
 
 def _variant_quality(variant_id: str) -> float:
     """根据 variant_id 得出 0.85-1.15 的质量系数（确定性）"""
-    h = hashlib.sha256(f"quality_{variant_id}".encode()).hexdigest()
-    v = int(h[:8], 16) / (16**8)
-    return 0.85 + v * 0.3
+    return 0.85 + unit_hash(f"quality_{variant_id}") * 0.3
 
 
 def _motivation_bucket_factors(
@@ -81,32 +80,19 @@ def _motivation_bucket_factors(
     省钱桶：CTR 更敏感（+）；体验桶：early_roas 更敏感（+）；按 vertical 微调。
     返回 (ctr_ipm_factor, cpi_factor, roas_factor)，均为 ~0.9-1.15
     """
-    base = 1.0
-    ctr_ipm, cpi, roas = base, base, base
     mb = (motivation_bucket or "").strip() or "其他"
     v = (vertical or "casual_game").lower()
+    return _bucket_factors(mb, v, config_version())
+
+
+@lru_cache(maxsize=4096)
+def _bucket_factors(mb: str, v: str, version: str) -> tuple[float, float, float]:
+    """按 (描述, vertical, 配置版本) 记忆；配置热更新后版本变化自然失效"""
+    base = 1.0
+    ctr_ipm, cpi, roas = base, base, base
 
-    # 场景+动机：支持富描述（帐篷·雨季将至·防雨耐用 等），按关键词映射到因子
-    def _mb_key(s: str) -> str:
-        if "帐篷" in s or "车载" in s or "收纳" in s or "防雨" in s or "耐用" in s:
-            return "省钱"
-        if "宠物" in s or "油画" in s or "送礼" in s or "匹配" in s:
-            return "体验"
-        if "备忘录" in s or "省事" in s:
-            return "体验"
-        if "朋友" in s or "话题" in s or "社交" in s or "Gossip" in s or "Harbor" in s:
-            return "社交"
-        if "心流" in s or "成就感" in s or "帮助" in s or "无力" in s:
-            return "成就感"
-        if "爽" in s or "通勤" in s or "碎片" in s or "消消乐" in s or "连击" in s:
-            return "爽感"
-        if "贪吃蛇" in s or "怀旧" in s or "经典" in s:
-            return "爽感"
-        if "合成" in s or "闯关" in s or "收集" in s or "归属" in s:
-            return "收集"
-        return s
-
-    mk = _mb_key(mb)
+    # 场景+动机：支持富描述（帐篷·雨季将至·防雨耐用 等），按 vertical_config.motivation_bucket_rules 映射到桶
+    mk = get_motivation_bucket_matcher().classify(mb) or mb
     if mk == "省钱":
         ctr_ipm = 1.12
         cpi = 0.95
@@ -139,9 +125,7 @@ def _sell_point_factor(sell_point: str) -> float:
     """sell_point 对指标的影响因子，0.90-1.10（确定性）"""
     if not sell_point or not sell_point.strip():
         return 1.0
-    h = hashlib.sha256(f"sell_point_{sell_point}".encode()).hexdigest()
-    v = int(h[:8], 16) / (16**8)
-    return 0.90 + v * 0.20
+    return 0.90 + unit_hash(f"sell_point_{sell_point}") * 0.20
 
 
 def _add_noise(value: float, noise_pct: float, rng: random.Random) -> float:
@@ -0,0 +1,164 @@
+"""
+小规模数值工具（纯标准库）：正规方程、Cholesky、对称正定矩阵求逆，以及稀疏 0/1 设计矩阵的岭回归共轭梯度。
+实验设计（D-optimal）与元素效应估计共用；稠密部分 p 通常 < 50，稀疏部分只按非零元计算，无需 numpy。
+"""
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+Matrix = list[list[float]]
+
+
+def gram(X: Sequence[Sequence[float]], weights: Sequence[float] | None = None) -> Matrix:
+    """X'WX（W 为对角权重，缺省为 1）"""
+    p = len(X[0]) if X else 0
+    G = [[0.0] * p for _ in range(p)]
+    for r, row in enumerate(X):
+        w = weights[r] if weights is not None else 1.0
+        nz = [(j, x * w) for j, x in enumerate(row) if x]
+        for a, (i, xi) in enumerate(nz):
+            Gi = G[i]
+            for j, _ in nz[a:]:
+                Gi[j] += xi * row[j]
+    for i in range(p):
+        for j in range(i):
+            G[i][j] = G[j][i]
+    return G
+
+
+def xt_y(X: Sequence[Sequence[float]], ys: Sequence[Sequence[float]], weights: Sequence[float] | None = None) -> Matrix:
+    """对多个目标列 ys[k] 计算 X'W y_k，返回 [k][p]"""
+    p = len(X[0]) if X else 0
+    out = [[0.0] * p for _ in ys]
+    for r, row in enumerate(X):
+        w = weights[r] if weights is not None else 1.0
+        for k, y in enumerate(ys):
+            yk = y[r] * w
+            if yk:
+                ok = out[k]
+                for j, x in enumerate(row):
+                    if x:
+                        ok[j] += x * yk
+    return out
+
+
+def cholesky(A: Matrix, *, jitter: float = 0.0) -> Matrix:
+    """A = LL'；jitter 加到对角线以处理近奇异。非正定抛 ValueError"""
+    n = len(A)
+    L = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        Li = L[i]
+        for j in range(i + 1):
+            Lj = L[j]
+            s = A[i][j] - sum(Li[k] * Lj[k] for k in range(j))
+            if i == j:
+                s += jitter
+                if s <= 0.0:
+                    raise ValueError("矩阵非正定")
+                Li[j] = math.sqrt(s)
+            else:
+                Li[j] = s / Lj[j]
+    return L
+
+
+def cho_solve(L: Matrix, b: Sequence[float]) -> list[float]:
+    """解 LL'x = b"""
+    n = len(L)
+    z = [0.0] * n
+    for i in range(n):
+        Li = L[i]
+        z[i] = (b[i] - sum(Li[k] * z[k] for k in range(i))) / Li[i]
+    x = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        x[i] = (z[i] - sum(L[k][i] * x[k] for k in range(i + 1, n))) / L[i][i]
+    return x
+
+
+def spd_inverse(L: Matrix) -> Matrix:
+    """由 Cholesky 因子求 A⁻¹"""
+    n = len(L)
+    cols = [cho_solve(L, [1.0 if i == j else 0.0 for i in range(n)]) for j in range(n)]
+    return [[cols[j][i] for j in range(n)] for i in range(n)]
+
+
+def log_det_from_cholesky(L: Matrix) -> float:
+    return 2.0 * sum(math.log(L[i][i]) for i in range(len(L)))
+
+
+def least_squares(
+    X: Sequence[Sequence[float]],
+    ys: Sequence[Sequence[float]],
+    *,
+    ridge: float = 0.0,
+    weights: Sequence[float] | None = None,
+) -> tuple[list[list[float]], Matrix]:
+    """
+    多目标（共享设计矩阵）最小二乘：一次分解 X'WX + ridge·I，对每个 y 回代。
+    返回 (betas[k][p], Cholesky 因子)；奇异时自动加极小抖动。
+    """
+    G = gram(X, weights)
+    if ridge:
+        for i in range(len(G)):
+            G[i][i] += ridge
+    try:
+        L = cholesky(G)
+    except ValueError:
+        scale = max((G[i][i] for i in range(len(G))), default=1.0) or 1.0
+        L = cholesky(G, jitter=scale * 1e-8)
+    rhs = xt_y(X, ys, weights)
+    return [cho_solve(L, b) for b in rhs], L
+
+
+# -------- 稀疏 0/1 设计矩阵：岭回归 + 共轭梯度 --------
+
+
+def sparse_ridge_cg(
+    row_cols: Sequence[Sequence[int]],
+    n_cols: int,
+    y: Sequence[float],
+    *,
+    penalty: Sequence[float],
+    tol: float = 1e-8,
+    max_iter: int = 500,
+) -> tuple[list[float], int]:
+    """
+    解 (X'X + diag(penalty)) β = X'y，X 为 0/1 稀疏矩阵（row_cols[i] 为第 i 行非零列）。
+
+    Jacobi 预条件共轭梯度：每次迭代两次稀疏乘（Xv 按行、X'r 按列），代价 O(nnz)，
+    不显式构造 X'X，数万行 × 数千列也只占 O(nnz) 内存。返回 (β, 迭代次数)。
+    """
+    col_rows: list[list[int]] = [[] for _ in range(n_cols)]
+    for i, cols in enumerate(row_cols):
+        for c in cols:
+            col_rows[c].append(i)
+    diag = [len(rows) + penalty[c] for c, rows in enumerate(col_rows)]
+    inv_diag = [1.0 / d if d > 0 else 0.0 for d in diag]
+
+    def _normal_matvec(v: list[float]) -> list[float]:
+        xv = [sum(map(v.__getitem__, cols)) for cols in row_cols]
+        return [sum(map(xv.__getitem__, rows)) + pen * vc for rows, pen, vc in zip(col_rows, penalty, v)]
+
+    b = [sum(map(y.__getitem__, rows)) for rows in col_rows]
+    b_norm = math.sqrt(sum(x * x for x in b)) or 1.0
+    beta = [0.0] * n_cols
+    r = list(b)
+    z = [ri * di for ri, di in zip(r, inv_diag)]
+    p = list(z)
+    rz = sum(ri * zi for ri, zi in zip(r, z))
+    it = 0
+    for it in range(1, max_iter + 1):
+        Ap = _normal_matvec(p)
+        pAp = sum(pi * ai for pi, ai in zip(p, Ap))
+        if pAp <= 0.0:
+            break
+        alpha = rz / pAp
+        beta = [bi + alpha * pi for bi, pi in zip(beta, p)]
+        r = [ri - alpha * ai for ri, ai in zip(r, Ap)]
+        if math.sqrt(sum(x * x for x in r)) <= tol * b_norm:
+            break
+        z = [ri * di for ri, di in zip(r, inv_diag)]
+        rz_new = sum(ri * zi for ri, zi in zip(r, z))
+        p = [zi + (rz_new / rz) * pi for zi, pi in zip(z, p)]
+        rz = rz_new
+    return beta, it
@@ -0,0 +1,230 @@
+"""
+流式止损监控：逐卡消费小时级窗口 metrics，维护 CUSUM 统计量，CPI 抬升 / IPM 下滑在统计上成立时立即告警。
+
+- 参照期：每卡前 warmup_windows 个窗口，Welford 在线更新 IPM / CPI 均值与方差，结束后冻结
+  （参照值用汇总口径：Σinstalls/Σimpressions、Σspend/Σinstalls）
+- 监控期：单边 CUSUM，S_t = max(0, S_{t-1} + (x_t - μ0 - δ/2) / σ_t)，S_t > h 告警
+  - δ 取自 ValidateGateConfig：CPI 为 μ0 × cpi_increase_max_pct，IPM 为 μ0 × ipm_drop_max_pct
+  - σ_t² = 原假设下的抽样方差（IPM：μ0·1000/impressions；CPI：μ0³/spend）+ 参照期超额离散
+    → 小时量不同的窗口自动按信息量加权
+- 变点估计：最近一次 S 归零后的第一个窗口
+- 每次更新 O(1)；状态为 __slots__ 小对象，上万张卡常驻内存无压力；告警后锁存，reset 后重新参照
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from pydantic import BaseModel, Field
+
+from validate_gate import ValidateGateConfig, WindowMetrics
+
+
+# -------- 配置 --------
+
+
+@dataclass
+class StopLossConfig:
+    """CUSUM 参数（δ 由 ValidateGateConfig 的止损阈值给出）"""
+
+    warmup_windows: int = 6  # 参照期窗口数
+    threshold_h: float = 5.0  # 告警阈值（标准化单位；k=δ/2 时约 465 个窗口一次误报）
+    min_impressions: int = 100  # 曝光不足的窗口跳过
+
+
+# -------- 输出 --------
+
+
+class StopLossAlert(BaseModel):
+    """止损告警"""
+
+    card_id: str = Field(..., description="卡片 ID")
+    metric: str = Field(..., description="cpi_spike / ipm_drop")
+    window_id: str = Field(..., description="触发告警的窗口")
+    window_index: int = Field(..., description="触发告警的窗口序号（从 0 起，含参照期）")
+    changepoint_index: int = Field(..., description="估计变点窗口序号")
+    statistic: float = Field(..., description="CUSUM 统计量")
+    threshold: float = Field(..., description="告警阈值 h")
+    reference: float = Field(..., description="参照期均值 μ0")
+    recent: float = Field(..., description="变点以来的汇总值")
+    change_pct: float = Field(..., description="变点以来相对参照的变化（%）")
+    message: str = Field("", description="止损说明")
+
+
+# -------- 单卡状态 --------
+
+
+class _CardState:
+    """单卡 CUSUM 状态（O(1) 更新）"""
+
+    __slots__ = (
+        "n", "imp", "inst", "spend",
+        "w_n", "w_cpi_n", "w_ipm_mean", "w_ipm_m2", "w_cpi_mean", "w_cpi_m2", "w_inv_imp", "w_inv_spend",
+        "ipm0", "cpi0", "ipm_extra", "cpi_extra",
+        "s_cpi", "s_ipm", "cp_cpi", "cp_ipm",
+        "r_cpi_spend", "r_cpi_inst", "r_ipm_inst", "r_ipm_imp",
+        "alarm_cpi", "alarm_ipm",
+    )
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.imp = self.inst = 0
+        self.spend = 0.0
+        self.w_n = self.w_cpi_n = 0
+        self.w_ipm_mean = self.w_ipm_m2 = self.w_cpi_mean = self.w_cpi_m2 = 0.0
+        self.w_inv_imp = self.w_inv_spend = 0.0
+        self.ipm0 = self.cpi0 = 0.0
+        self.ipm_extra = self.cpi_extra = 0.0
+        self.s_cpi = self.s_ipm = 0.0
+        self.cp_cpi = self.cp_ipm = -1
+        self.r_cpi_spend = 0.0
+        self.r_cpi_inst = self.r_ipm_inst = self.r_ipm_imp = 0
+        self.alarm_cpi = self.alarm_ipm = False
+
+    @property
+    def warmed_up(self) -> bool:
+        return self.ipm0 > 0.0
+
+    def _warmup(self, w: WindowMetrics, warmup_windows: int) -> None:
+        """Welford：参照期 IPM / CPI 的均值与方差（CPI 只计 installs > 0 的窗口，单独计数）"""
+        self.imp += w.impressions
+        self.inst += w.installs
+        self.spend += w.spend
+        self.w_n += 1
+        ipm = w.installs / w.impressions * 1000.0
+        d = ipm - self.w_ipm_mean
+        self.w_ipm_mean += d / self.w_n
+        self.w_ipm_m2 += d * (ipm - self.w_ipm_mean)
+        if w.installs > 0 and w.spend > 0:
+            self.w_cpi_n += 1
+            cpi = w.spend / w.installs
+            d = cpi - self.w_cpi_mean
+            self.w_cpi_mean += d / self.w_cpi_n
+            self.w_cpi_m2 += d * (cpi - self.w_cpi_mean)
+            self.w_inv_spend += 1.0 / w.spend
+        self.w_inv_imp += 1.0 / w.impressions
+        if self.w_n >= warmup_windows and self.inst > 0 and self.spend > 0:
+            self.ipm0 = self.inst / self.imp * 1000.0
+            self.cpi0 = self.spend / self.inst
+            k, kc = self.w_n, self.w_cpi_n
+            var_ipm = self.w_ipm_m2 / (k - 1) if k > 1 else 0.0
+            var_cpi = self.w_cpi_m2 / (kc - 1) if kc > 1 else 0.0
+            # 超额离散 = 窗口间方差 - 平均抽样方差（泊松近似），不为负
+            self.ipm_extra = max(0.0, var_ipm - self.ipm0 * 1000.0 * self.w_inv_imp / k)
+            self.cpi_extra = max(0.0, var_cpi - self.cpi0 ** 3 * self.w_inv_spend / kc) if kc else 0.0
+
+
+# -------- 监控器 --------
+
+
+class StopLossMonitor:
+    """
+    多卡流式止损监控。
+
+    用法：monitor.update(card_id, window) 每来一个小时窗口调用一次，返回本次新触发的告警（通常为空）。
+    """
+
+    def __init__(self, *, config: StopLossConfig | None = None, gate_config: ValidateGateConfig | None = None) -> None:
+        self.config = config or StopLossConfig()
+        self.gate_config = gate_config or ValidateGateConfig()
+        self._states: dict[str, _CardState] = {}
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def reset(self, card_id: str) -> None:
+        """止损处理后（换素材 / 降预算）重新进入参照期"""
+        self._states.pop(card_id, None)
+
+    def update(self, card_id: str, window: WindowMetrics | dict | Any) -> list[StopLossAlert]:
+        cfg = self.config
+        w = window if isinstance(window, WindowMetrics) else WindowMetrics.model_validate(
+            window.model_dump() if hasattr(window, "model_dump") else window
+        )
+        st = self._states.get(card_id)
+        if st is None:
+            st = self._states[card_id] = _CardState()
+        idx = st.n
+        st.n += 1
+        if w.impressions < cfg.min_impressions:
+            return []
+        if not st.warmed_up:
+            st._warmup(w, cfg.warmup_windows)
+            return []
+
+        alerts: list[StopLossAlert] = []
+        h = cfg.threshold_h
+        # CPI 抬升（installs=0 时 CPI 无定义，跳过）
+        if w.installs > 0 and w.spend > 0:
+            delta = st.cpi0 * self.gate_config.cpi_increase_max_pct
+            sigma = math.sqrt(st.cpi0 ** 3 / w.spend + st.cpi_extra)
+            if st.s_cpi == 0.0:
+                st.cp_cpi, st.r_cpi_spend, st.r_cpi_inst = idx, 0.0, 0
+            st.s_cpi = max(0.0, st.s_cpi + (w.spend / w.installs - st.cpi0 - delta / 2.0) / sigma)
+            st.r_cpi_spend += w.spend
+            st.r_cpi_inst += w.installs
+            if st.s_cpi > h and not st.alarm_cpi:
+                st.alarm_cpi = True
+                recent = st.r_cpi_spend / max(st.r_cpi_inst, 1)
+                alerts.append(self._alert(card_id, "cpi_spike", w, idx, st.cp_cpi, st.s_cpi, st.cpi0, recent))
+        # IPM 下滑
+        delta = st.ipm0 * self.gate_config.ipm_drop_max_pct
+        sigma = math.sqrt(st.ipm0 * 1000.0 / w.impressions + st.ipm_extra)
+        if st.s_ipm == 0.0:
+            st.cp_ipm, st.r_ipm_inst, st.r_ipm_imp = idx, 0, 0
+        st.s_ipm = max(0.0, st.s_ipm + (st.ipm0 - w.installs / w.impressions * 1000.0 - delta / 2.0) / sigma)
+        st.r_ipm_inst += w.installs
+        st.r_ipm_imp += w.impressions
+        if st.s_ipm > h and not st.alarm_ipm:
+            st.alarm_ipm = True
+            recent = st.r_ipm_inst / st.r_ipm_imp * 1000.0
+            alerts.append(self._alert(card_id, "ipm_drop", w, idx, st.cp_ipm, st.s_ipm, st.ipm0, recent))
+        return alerts
+
+    def update_many(self, stream: Iterable[tuple[str, WindowMetrics | dict]]) -> list[StopLossAlert]:
+        """批量消费 (card_id, window)，按到达顺序返回全部新告警"""
+        alerts: list[StopLossAlert] = []
+        for card_id, w in stream:
+            alerts.extend(self.update(card_id, w))
+        return alerts
+
+    def _alert(
+        self, card_id: str, metric: str, w: WindowMetrics, idx: int, cp: int, stat: float, ref: float, recent: float,
+    ) -> StopLossAlert:
+        change = (recent - ref) / ref if ref else 0.0
+        if metric == "cpi_spike":
+            msg = f"CPI 自第 {cp} 个窗口起抬升 {change:+.1%}（{ref:.2f} → {recent:.2f}），建议立即降预算止损"
+        else:
+            msg = f"IPM 自第 {cp} 个窗口起下滑 {change:+.1%}（{ref:.2f} → {recent:.2f}），建议暂停加量并排查素材衰退"
+        return StopLossAlert(
+            card_id=card_id, metric=metric, window_id=w.window_id, window_index=idx, changepoint_index=cp,
+            statistic=round(stat, 3), threshold=self.config.threshold_h, reference=round(ref, 4),
+            recent=round(recent, 4), change_pct=round(change * 100, 2), message=msg,
+        )
+
+    def snapshot(self, card_id: str) -> dict[str, Any]:
+        """单卡当前状态（看板 / 调试用）"""
+        st = self._states.get(card_id)
+        if st is None:
+            return {}
+        return {
+            "windows": st.n,
+            "warmed_up": st.warmed_up,
+            "ipm_ref": round(st.ipm0, 4),
+            "cpi_ref": round(st.cpi0, 4),
+            "cusum_cpi": round(st.s_cpi, 3),
+            "cusum_ipm": round(st.s_ipm, 3),
+            "alarm_cpi": st.alarm_cpi,
+            "alarm_ipm": st.alarm_ipm,
+        }
+
+
+def stop_loss_rule_text(*, config: StopLossConfig | None = None, gate_config: ValidateGateConfig | None = None) -> str:
+    """scale_recommendation["stop_loss"] 的流式版本说明"""
+    cfg = config or StopLossConfig()
+    gcfg = gate_config or ValidateGateConfig()
+    return (
+        f"小时级 CUSUM 监控：以前 {cfg.warmup_windows} 个窗口为参照，"
+        f"CPI 抬升 {gcfg.cpi_increase_max_pct:.0%} 或 IPM 下滑 {gcfg.ipm_drop_max_pct:.0%} 累积证据超过 h={cfg.threshold_h:g} 即止损"
+    )
@@ -0,0 +1,90 @@
+"""
+分层抽样的配额与稀疏层合并（evalset_sampler 根目录版与 MatrixMirix02 版共用）。
+
+- allocate_capped：按权重一次性分配 n 个名额，层容量封顶、可设每层下限，最大余数法取整
+- collapse_strata：自底向上把卡数不足的层并入上一级（被合并维度记为 "*"），
+  层数仍超过上限时从最小的层开始继续上卷，保证评测集大小就是要求的 n
+"""
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from typing import Mapping, Sequence
+
+WILDCARD = "*"
+
+
+def allocate_capped(target_n: int, sizes: Sequence[int], weights: Sequence[float], *, min_per: int = 0) -> list[int]:
+    """
+    按权重分配 target_n 个名额，每层不超过 sizes[i]、不少于 min_per（容量允许时）。
+    溢出层先填满、剩余额度在其余层间按权重再分（至多层数轮）；取整用最大余数法。
+    """
+    n = len(sizes)
+    quota = [min(min_per, sz) for sz in sizes]
+    remaining = min(target_n, sum(sizes)) - sum(quota)
+    open_ = [i for i in range(n) if quota[i] < sizes[i]]
+    while remaining > 0 and open_:
+        total_w = sum(weights[i] for i in open_)
+        if total_w <= 0:
+            shares = {i: remaining / len(open_) for i in open_}
+        else:
+            shares = {i: remaining * weights[i] / total_w for i in open_}
+        full = [i for i in open_ if quota[i] + shares[i] >= sizes[i]]
+        if full:
+            # 先把会溢出的层填满，剩余额度下一轮再分
+            for i in full:
+                remaining -= sizes[i] - quota[i]
+                quota[i] = sizes[i]
+            open_ = [i for i in open_ if quota[i] < sizes[i]]
+            continue
+        floors = {i: int(math.floor(shares[i])) for i in open_}
+        for i in open_:
+            quota[i] += floors[i]
+        left = remaining - sum(floors.values())
+        for i in sorted(open_, key=lambda i: shares[i] - floors[i], reverse=True)[:left]:
+            quota[i] += 1
+        remaining = 0
+    return quota
+
+
+def collapse_strata(
+    counts: Mapping[tuple[str, ...], int],
+    *,
+    min_size: int,
+    max_strata: int | None = None,
+    keep_levels: int = 1,
+) -> dict[tuple[str, ...], tuple[str, ...]]:
+    """
+    叶层 → 合并后的层。维度按重要性从前到后排列，从最后一维开始逐级上卷：
+    - 卡数 < min_size 的层并入父层（该维及之后记为 "*"）
+    - 该级合并后层数仍 > max_strata 时，按卡数从小到大继续并入父层，直到不超过上限
+    前 keep_levels 维永不合并（如 vertical）；返回 {叶层: 合并后层}。
+    """
+    if not counts:
+        return {}
+    dims = len(next(iter(counts)))
+    key_of = {leaf: leaf for leaf in counts}
+    for depth in range(dims - 1, keep_levels - 1, -1):
+        sizes: dict[tuple[str, ...], int] = defaultdict(int)
+        for leaf, g in key_of.items():
+            sizes[g] += counts[leaf]
+
+        def _parent(g: tuple[str, ...]) -> tuple[str, ...]:
+            return g[:depth] + (WILDCARD,) * (dims - depth)
+
+        merge = {g for g, n in sizes.items() if n < min_size and g[depth] != WILDCARD}
+        if max_strata is not None:
+            parents = {_parent(g) for g in merge}
+            n_after = len(sizes) - len(merge) + len(parents)
+            for g in sorted((g for g in sizes if g not in merge and g[depth] != WILDCARD), key=lambda g: (sizes[g], g)):
+                if n_after <= max_strata:
+                    break
+                merge.add(g)
+                p = _parent(g)
+                n_after += (0 if p in parents else 1) - 1
+                parents.add(p)
+        if merge:
+            for leaf, g in key_of.items():
+                if g in merge:
+                    key_of[leaf] = _parent(g)
+    return key_of
@@ -66,6 +66,26 @@ class ValidateStabilityMetrics(BaseModel):
     learning_iterations: int = Field(default=0, description="学习反复次数（模拟）")
 
 
+class ExpansionSegmentRow(BaseModel):
+    """轻扩人群分段明细：单个扩量人群/国家相对主人群的劣化"""
+
+    segment_id: str = Field(..., description="扩量人群/国家标识")
+    ipm: float = 0.0
+    cpi: float = 0.0
+    early_roas: float = 0.0
+    impressions: int = 0
+    spend: float = 0.0
+    ipm_drop_pct: float = Field(default=0.0, description="IPM 相对主人群跌幅（%）")
+    cpi_increase_pct: float = Field(default=0.0, description="CPI 相对主人群涨幅（%）")
+    degradation_score: float = Field(
+        default=0.0,
+        description="劣化分：跌幅/涨幅按阈值归一后求和，越低越适合扩量",
+    )
+    status: str = Field(default="PASS", description="PASS / DEGRADED / INSUFFICIENT")
+    rank: int = Field(default=0, description="扩量优先级（1 起），0=不建议扩量")
+    notes: list[str] = Field(default_factory=list, description="劣化说明")
+
+
 class ValidateGateResult(BaseModel):
     """Validate Gate 评测结果"""
 
@@ -83,6 +103,18 @@ class ValidateGateResult(BaseModel):
         default_factory=ValidateStabilityMetrics,
         description="波动、回撤、learning 反复次数",
     )
+    expansion_segments: list[ExpansionSegmentRow] = Field(
+        default_factory=list,
+        description="多人群/国家轻扩明细（按输入顺序）",
+    )
+    expansion_ranking: list[str] = Field(
+        default_factory=list,
+        description="建议扩量顺序（segment_id，劣化最小在前）",
+    )
+    signal_flags: dict[str, bool] = Field(
+        default_factory=dict,
+        description="结构化风险信号：cpi_spike / ipm_drawdown / roas_mismatch（供 diagnosis 直接读取）",
+    )
 
 
 # -------- 评测逻辑 --------
@@ -96,11 +128,115 @@ def _parse_metrics(m: Any) -> WindowMetrics:
     return m
 
 
+def _parse_segments(
+    segments: list[WindowMetrics | dict] | dict[str, WindowMetrics | dict],
+) -> list[tuple[str, WindowMetrics]]:
+    """多人群输入统一为 [(segment_id, WindowMetrics)]；dict 输入以 key 为 segment_id"""
+    if isinstance(segments, dict):
+        return [(str(sid), _parse_metrics(m)) for sid, m in segments.items()]
+    parsed = [_parse_metrics(m) for m in segments]
+    return [(w.window_id, w) for w in parsed]
+
+
+def _rank_expansion_segments(
+    segments: list[tuple[str, WindowMetrics]],
+    mean_ipm: float,
+    mean_cpi: float,
+    cfg: ValidateGateConfig,
+) -> tuple[list[ExpansionSegmentRow], list[str]]:
+    """
+    一次性计算所有轻扩人群相对主人群的劣化（按列计算，不逐个重跑门禁）。
+    返回 (明细行, 扩量顺序)。
+    """
+    if not segments:
+        return [], []
+    ids = [sid for sid, _ in segments]
+    ipm_col = [w.ipm for _, w in segments]
+    cpi_col = [w.cpi for _, w in segments]
+
+    # 跌幅/涨幅列：主人群无数据或分段无数据时为 None
+    ipm_drop = [
+        (mean_ipm - x) / mean_ipm if (mean_ipm and x > 0) else None for x in ipm_col
+    ]
+    cpi_inc = [
+        (x - mean_cpi) / mean_cpi if (mean_cpi and x > 0) else None for x in cpi_col
+    ]
+    ipm_max = cfg.light_expansion_ipm_drop_max or 1.0
+    cpi_max = cfg.light_expansion_cpi_increase_max or 1.0
+    scores = [
+        max(0.0, d or 0.0) / ipm_max + max(0.0, c or 0.0) / cpi_max
+        for d, c in zip(ipm_drop, cpi_inc)
+    ]
+
+    rows: list[ExpansionSegmentRow] = []
+    for i, (sid, w) in enumerate(segments):
+        notes: list[str] = []
+        if ipm_drop[i] is None:
+            status = "INSUFFICIENT"
+            notes.append("该人群无有效 IPM 数据，暂不评估")
+        else:
+            status = "PASS"
+            if ipm_drop[i] > cfg.light_expansion_ipm_drop_max:
+                status = "DEGRADED"
+                notes.append("IPM 明显劣化，Why now 可能虚高")
+            if cpi_inc[i] is not None and cpi_inc[i] > cfg.light_expansion_cpi_increase_max:
+                status = "DEGRADED"
+                notes.append("CPI 抬升过大")
+        rows.append(
+            ExpansionSegmentRow(
+                segment_id=sid,
+                ipm=round(w.ipm, 2),
+                cpi=round(w.cpi, 2),
+                early_roas=round(w.early_roas, 4),
+                impressions=w.impressions,
+                spend=w.spend,
+                ipm_drop_pct=round((ipm_drop[i] or 0.0) * 100, 2),
+                cpi_increase_pct=round((cpi_inc[i] or 0.0) * 100, 2),
+                degradation_score=round(scores[i], 4),
+                status=status,
+                notes=notes,
+            )
+        )
+
+    # 排序：劣化分低优先，同分时曝光量大的优先（样本更可信）
+    order = sorted(
+        (i for i, r in enumerate(rows) if r.status == "PASS"),
+        key=lambda i: (scores[i], -rows[i].impressions),
+    )
+    for rank, i in enumerate(order, start=1):
+        rows[i].rank = rank
+    return rows, [ids[i] for i in order]
+
+
+def evaluate_expansion_segments(
+    windowed_metrics: list[WindowMetrics | dict],
+    expansion_segments: list[WindowMetrics | dict] | dict[str, WindowMetrics | dict],
+    *,
+    config: ValidateGateConfig | None = None,
+) -> tuple[list[ExpansionSegmentRow], list[str]]:
+    """
+    多人群轻扩评估：不跑完整门禁，只给出每个人群的劣化表 + 扩量顺序。
+
+    输入：
+    - windowed_metrics: 主人群时间窗口 metrics（用于计算主人群 IPM/CPI 均值）
+    - expansion_segments: 轻扩人群 metrics 列表（window_id 作为 segment_id），或 {segment_id: metrics}
+    - config: 阈值沿用 light_expansion_ipm_drop_max / light_expansion_cpi_increase_max
+    """
+    cfg = config or ValidateGateConfig()
+    windows = [_parse_metrics(w) for w in windowed_metrics]
+    ipms = [w.ipm for w in windows if w.impressions > 0]
+    cpis = [w.cpi for w in windows if w.installs > 0]
+    mean_ipm = sum(ipms) / len(ipms) if ipms else 0
+    mean_cpi = sum(cpis) / len(cpis) if cpis else 0
+    return _rank_expansion_segments(_parse_segments(expansion_segments), mean_ipm, mean_cpi, cfg)
+
+
 def evaluate_validate_gate(
     windowed_metrics: list[WindowMetrics | dict],
     light_expansion_metrics: WindowMetrics | dict | None = None,
     *,
     config: ValidateGateConfig | None = None,
+    expansion_segments: list[WindowMetrics | dict] | dict[str, WindowMetrics | dict] | None = None,
 ) -> ValidateGateResult:
     """
     Validate Gate 评测：基于多时间窗口 + 轻扩人群，判断是否可加量。
@@ -109,12 +245,14 @@ def evaluate_validate_gate(
     - windowed_metrics: ≥2 个时间窗口的 metrics，每个窗口一条
     - light_expansion_metrics: 轻扩人群 variant 的 metrics（可选）
     - config: 可配置阈值
+    - expansion_segments: 可选，多个轻扩人群/国家的 metrics，一次评估并给出扩量顺序
 
     判断：
     1. IPM 波动是否在可接受范围
     2. CPI 是否回撤（涨幅超阈值）
     3. early_event / early_ROAS 是否方向一致
     4. 轻扩人群是否明显劣化（若有）
+    5. 多人群轻扩：全部劣化时视为失败，否则按劣化分排序给出扩量顺序
     """
     cfg = config or ValidateGateConfig()
     risk_notes: list[str] = []
@@ -147,6 +285,7 @@ def evaluate_validate_gate(
     mean_ipm = sum(ipms) / len(ipms)
     mean_cpi = sum(cpis) / len(cpis) if cpis else 0
     fail_count = 0
+    flags = {"cpi_spike": False, "ipm_drawdown": False, "roas_mismatch": False}
 
     # 1. IPM 波动
     ipm_cv = (sum((x - mean_ipm) ** 2 for x in ipms) ** 0.5 / mean_ipm) if mean_ipm else 0
@@ -158,6 +297,7 @@ def evaluate_validate_gate(
     ipm_drop = (ipm_first - min(ipms)) / ipm_first if ipm_first else 0
     if ipm_drop > cfg.ipm_drop_max_pct:
         risk_notes.append("IPM 回撤超出可接受范围，可能 Hook 依赖强刺激")
+        flags["ipm_drawdown"] = True
         fail_count += 1
 
     # 2. CPI 回撤
@@ -166,6 +306,7 @@ def evaluate_validate_gate(
     cpi_increase = (cpi_max - cpi_first) / cpi_first if cpi_first else 0
     if cpi_increase > cfg.cpi_increase_max_pct:
         risk_notes.append("CPI 回撤，成本抬升明显")
+        flags["cpi_spike"] = True
         fail_count += 1
 
     # 3. early_event / early_ROAS 方向一致
@@ -176,6 +317,7 @@ def evaluate_validate_gate(
         total = min(len(ev_dirs), len(roas_dirs))
         if total > 0 and matches / total < 0.5:
             risk_notes.append("early_event 与 early_ROAS 方向不一致，转化质量存疑")
+            flags["roas_mismatch"] = True
             fail_count += 1
 
     # 4. 轻扩人群
@@ -190,15 +332,30 @@ def evaluate_validate_gate(
             le_cpi_inc = (le.cpi - mean_cpi) / mean_cpi
             if le_cpi_inc > cfg.light_expansion_cpi_increase_max:
                 risk_notes.append("轻扩人群 CPI 抬升过大")
+                flags["cpi_spike"] = True
                 fail_count += 1
 
+    # 5. 多人群轻扩
+    expansion_rows: list[ExpansionSegmentRow] = []
+    expansion_ranking: list[str] = []
+    if expansion_segments:
+        expansion_rows, expansion_ranking = _rank_expansion_segments(
+            _parse_segments(expansion_segments), mean_ipm, mean_cpi, cfg
+        )
+        evaluated = [r for r in expansion_rows if r.status != "INSUFFICIENT"]
+        if evaluated and not expansion_ranking:
+            risk_notes.append("轻扩人群全部明显劣化，暂无可扩量人群")
+            fail_count += 1
+
     # 风险备注生成规则补充
     if ipm_cv > 0.4:
         risk_notes.append("IPM 波动过大，建议延长观察窗口")
     if ipm_drop > 0.25 and "Hook" not in " ".join(risk_notes):
         risk_notes.append("IPM 回撤明显，可能 Hook 依赖强刺激")
+        flags["ipm_drawdown"] = True
     if cpi_increase > 0.2:
         risk_notes.append("CPI 抬升过快，需关注人群质量")
+        flags["cpi_spike"] = True
 
     # 模拟 learning_iterations：基于波动与回撤
     learning_iterations = 0
@@ -256,13 +413,20 @@ def evaluate_validate_gate(
         scale_up_pct = "10%" if fail_count <= 1 else "暂不加量"
         stop_loss_line = "收紧止损：CPI +15% 或 IPM -20% 即停"
 
+    scale_recommendation = {
+        "scale_up_step": f"建议加量步长 {scale_up_pct}",
+        "stop_loss": stop_loss_line,
+    }
+    if expansion_ranking:
+        scale_recommendation["expansion_order"] = "优先扩量：" + " > ".join(expansion_ranking[:5])
+
     return ValidateGateResult(
         validate_status=validate_status,
         risk_notes=risk_notes if risk_notes else ["无显著风险"],
-        scale_recommendation={
-            "scale_up_step": f"建议加量步长 {scale_up_pct}",
-            "stop_loss": stop_loss_line,
-        },
+        scale_recommendation=scale_recommendation,
         detail_rows=detail_rows,
         stability_metrics=stability_metrics,
+        expansion_segments=expansion_rows,
+        expansion_ranking=expansion_ranking,
+        signal_flags=flags,
     )
@@ -4,16 +4,21 @@
 from __future__ import annotations
 
 import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, Sequence
 
 from pydantic import BaseModel, Field
 
 from element_scores import ElementScore
-from eval_schemas import Variant, decompose_variant_to_element_tags
+from eval_schemas import Variant, element_id, tag_element_id, variant_element_ids
 from explore_gate import ExploreGateResult
 from simulate_metrics import SimulatedMetrics
-from vertical_config import get_pool, get_why_now_pool
+from vertical_config import VerticalSnapshot, config_version, get_snapshot
 
 # element_type -> 层级（策略/表达/行动/素材）
 _LAYER_MAP = {
@@ -71,62 +76,218 @@ class VariantSuggestion(BaseModel):
     experiment_recipe: str = Field(default="", description="OFAAT 处方")
     target_os: str = Field(default="", description="端内修正 target_os")
     sample_size: int = Field(default=0, description="样本数")
-
-
-def _load_candidate_pool(config_path: Path | None = None) -> dict[str, Any]:
-    """加载候选池配置"""
-    if config_path is None:
-        try:
-            from path_config import SAMPLES_DIR
-        except ImportError:
-            SAMPLES_DIR = Path(__file__).resolve().parent.parent / "samples"
-        config_path = SAMPLES_DIR / "candidate_pool.json"
-    if not config_path.exists():
-        return {"hook_type": [], "sell_point": [], "cta": [], "asset_var": {}}
+    os_coverage: list[str] = Field(default_factory=list, description="含该元素的变体已有数据的 OS")
+
+
+# -------- 候选池（按配置版本缓存索引）--------
+#
+# 批量建议 / 看板每次重跑都会对每张卡调用 next_variant_suggestions：
+# 候选池 JSON 按文件 (mtime, size) 只解析一次；每个 vertical 的候选列表按 (config_version, 候选池文件) 预建索引，
+# 取替代值时只看前 n 个 + 需跳过的当前值位置，不再逐次遍历整条语料。
+
+_EMPTY_POOL: Mapping[str, Any] = MappingProxyType({"hook_type": (), "sell_point": (), "cta": (), "asset_var": MappingProxyType({})})
+_pool_cache: dict[Path, tuple[tuple[int, int], Mapping[str, Any]]] = {}
+_index_cache: dict[tuple, "CandidateIndex"] = {}
+_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _default_pool_path() -> Path:
+    try:
+        from path_config import SAMPLES_DIR
+    except ImportError:
+        SAMPLES_DIR = Path(__file__).resolve().parent.parent / "samples"
+    return SAMPLES_DIR / "candidate_pool.json"
+
+
+def _pool_stamp(config_path: Path) -> tuple[int, int] | None:
+    try:
+        st = config_path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_candidate_pool(config_path: Path | None = None) -> Mapping[str, Any]:
+    """加载候选池配置（按文件 mtime/size 缓存，返回只读视图）"""
+    config_path = config_path or _default_pool_path()
+    stamp = _pool_stamp(config_path)
+    if stamp is None:
+        return _EMPTY_POOL
+    key = config_path
+    hit = _pool_cache.get(key)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
     with open(config_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        raw = json.load(f)
+    pool = MappingProxyType({
+        k: MappingProxyType({kk: tuple(vv) if isinstance(vv, list) else vv for kk, vv in v.items()}) if isinstance(v, dict)
+        else tuple(v) if isinstance(v, list) else v
+        for k, v in raw.items()
+    })
+    with _cache_lock:
+        _pool_cache[key] = (stamp, pool)
+    return pool
+
+
+@dataclass(frozen=True)
+class _FieldCandidates:
+    """单字段候选：原顺序取值 + strip 后取值 → 出现位置"""
+
+    values: tuple[Any, ...]
+    positions: Mapping[str, frozenset[int]]
+
+    @classmethod
+    def build(cls, values: Sequence[Any]) -> "_FieldCandidates":
+        positions: dict[str, set[int]] = {}
+        for i, x in enumerate(values):
+            positions.setdefault(str(x).strip(), set()).add(i)
+        return cls(tuple(values), MappingProxyType({k: frozenset(v) for k, v in positions.items()}))
+
+    def alternatives(self, current_value: str, n: int) -> list[Any]:
+        """去掉当前值后的前 n 个（O(n + 当前值重复次数)）"""
+        skip = self.positions.get(str(current_value).strip())
+        if not skip:
+            return list(self.values[:n])
+        out: list[Any] = []
+        for i, x in enumerate(self.values):
+            if len(out) >= n:
+                break
+            if i not in skip:
+                out.append(x)
+        return out
+
+
+_NO_CANDIDATES = _FieldCandidates((), MappingProxyType({}))
+
+
+@dataclass(frozen=True)
+class CandidateIndex:
+    """单个 vertical 的候选索引（element_type → 候选；asset 按 asset_var 子键）"""
+
+    vertical: str
+    version: str
+    fields: Mapping[str, _FieldCandidates]
+    asset: Mapping[str, _FieldCandidates]
+
+    def alternatives(self, element_type: str, current_value: str, n: int = 3) -> list[Any]:
+        if element_type == "asset":
+            parts = current_value.split("=", 1)
+            if len(parts) != 2:
+                return []
+            return self.asset.get(parts[0], _NO_CANDIDATES).alternatives(parts[1], n)
+        return self.fields.get(element_type, _NO_CANDIDATES).alternatives(current_value, n)
+
+
+def _candidate_sources(snap: VerticalSnapshot) -> dict[str, Sequence[Any]]:
+    """各 element_type 的候选来源（vertical_config 语料决定器，严禁跨行业词）"""
+    key_map = {
+        "hook": "hook_type", "sell_point": "sell_point", "cta": "cta",
+        "why_you": "why_you_bucket", "why_now": "why_now_trigger",
+    }
+    return {et: snap.pool_labels.get(key, ()) for et, key in key_map.items()}
+
+
+def candidate_index(vertical: str = "casual_game", *, candidate_pool_path: Path | None = None) -> CandidateIndex:
+    """该 vertical 的候选索引；配置版本或候选池文件变化时重建"""
+    path = candidate_pool_path or _default_pool_path()
+    snap = get_snapshot(vertical)
+    key = (snap.vertical, config_version(), path, _pool_stamp(path))
+    idx = _index_cache.get(key)
+    if idx is not None:
+        return idx
+    pool = _load_candidate_pool(path)
+    # asset：vertical_config corpus.asset_var 优先，否则取候选池
+    sub = snap.asset_var if isinstance(snap.corpus.get("asset_var"), Mapping) else (pool.get("asset_var") or {})
+    asset = {
+        k: _FieldCandidates.build(lst) for k, lst in (sub.items() if isinstance(sub, Mapping) else ())
+        if isinstance(lst, (list, tuple))
+    }
+    idx = CandidateIndex(
+        vertical=snap.vertical,
+        version=key[1],
+        fields=MappingProxyType({et: _FieldCandidates.build(lst) for et, lst in _candidate_sources(snap).items()}),
+        asset=MappingProxyType(asset),
+    )
+    with _cache_lock:
+        # 旧版本的索引不会再命中，整体丢弃
+        if any(k[1] != key[1] for k in _index_cache):
+            _index_cache.clear()
+        _index_cache[key] = idx
+    return idx
 
 
 def _get_candidates(
-    pool: dict[str, Any],
+    index: CandidateIndex,
     element_type: str,
     current_value: str,
     n: int = 3,
-    vertical: str = "casual_game",
 ) -> list[str]:
-    """从候选池取 2-3 个替代值。优先使用 vertical_config 语料（严禁跨行业词）。"""
-    # 语料决定器：hook/sell_point/cta/why_you/why_now 来自 vertical_config
-    key_map = {
-        "hook": "hook_type", "sell_point": "sell_point", "cta": "cta",
-        "why_you": "why_you_bucket", "why_now": "why_now_trigger",
-    }
-    if element_type in key_map:
-        lst = get_pool(vertical, key_map[element_type])
-        if isinstance(lst, list):
-            labels = []
-            for x in lst:
-                if isinstance(x, dict):
-                    labels.append(x.get("label", x.get("key", "")))
-                else:
-                    labels.append(str(x))
-            others = [x for x in labels if str(x).strip() != str(current_value).strip()]
-            return others[:n]
-    if element_type == "asset":
-        # asset: 从 vertical_config corpus.asset_var 或 pool 取
-        parts = current_value.split("=", 1)
-        if len(parts) == 2:
-            k, v = parts[0], parts[1]
-            sub = get_pool(vertical, "asset_var")
-            if not isinstance(sub, dict):
-                sub = pool.get("asset_var", {}) or {}
-            lst = sub.get(k, []) if isinstance(sub, dict) else []
-            if isinstance(lst, list):
-                others = [x for x in lst if str(x).strip() != str(v).strip()]
-            else:
-                others = []
-            return others[:n]
-        return []
-    return []
+    """从候选索引取 2-3 个替代值"""
+    return index.alternatives(element_type, current_value, n)
+
+
+# -------- 元素 OS 覆盖 --------
+
+
+_NO_OS: frozenset[str] = frozenset()
+
+
+class ElementOsCoverage:
+    """
+    卡内元素 → 含该元素的变体出现过的 OS。
+    构造时一次遍历 metrics，把同一 OS 组合的变体并成一组（通常整卡只有「双端」一组，元素 id 来自
+    variant_element_ids 缓存）；查询某元素只做组内成员判断，不再逐元素重扫 metrics / tags。
+    """
+
+    __slots__ = ("_groups",)
+
+    def __init__(self, groups: Sequence[tuple[frozenset[str], frozenset[int]]] = ()) -> None:
+        self._groups = tuple(groups)
+
+    def __bool__(self) -> bool:
+        return bool(self._groups)
+
+    def get(self, eid: int) -> frozenset[str]:
+        out = _NO_OS
+        for os_set, eids in self._groups:
+            if eid in eids:
+                out = os_set if not out else out | os_set
+        return out
+
+    def to_dict(self) -> dict[int, frozenset[str]]:
+        """展开为 元素 id → OS 集合（报表用）"""
+        return {eid: self.get(eid) for _, eids in self._groups for eid in eids}
+
+
+def element_os_coverage(
+    variant_metrics: Sequence[SimulatedMetrics | dict] | None,
+    *,
+    variants: Sequence[Variant] | None = None,
+    variant_to_tags: Mapping[str, Sequence[Any]] | None = None,
+) -> ElementOsCoverage:
+    """整卡元素 OS 覆盖（variants 优先；否则用 variant_to_tags）"""
+    if not variant_metrics:
+        return ElementOsCoverage()
+    if variants:
+        ids_of = {v.variant_id: variant_element_ids(v) for v in variants}
+    elif variant_to_tags:
+        ids_of = {vid: tuple(tag_element_id(t) for t in tags) for vid, tags in variant_to_tags.items()}
+    else:
+        return ElementOsCoverage()
+    os_by_variant: dict[str, set[str]] = {}
+    for m in variant_metrics:
+        if isinstance(m, dict):
+            vid, os_name = m.get("variant_id"), m.get("os")
+        else:
+            vid, os_name = m.variant_id, m.os
+        os_by_variant.setdefault(vid, set()).add(os_name)
+    groups: dict[frozenset[str], set[int]] = {}
+    for vid, os_set in os_by_variant.items():
+        ids = ids_of.get(vid)
+        if ids:
+            groups.setdefault(frozenset(os_set), set()).update(ids)
+    return ElementOsCoverage([(os_set, frozenset(eids)) for os_set, eids in groups.items()])
 
 
 def _cross_os_consistent(
@@ -139,19 +300,11 @@ def _cross_os_consistent(
     是否跨 OS 一致：含该元素的变体是否有 iOS 和 Android 双端数据。
     若有至少 2 个 OS 的样本，视为跨 OS 覆盖。
     """
-    if not variant_metrics or not variant_to_tags:
-        return False
-    os_set = set()
-    for m in variant_metrics:
-        obj = SimulatedMetrics.model_validate(m) if isinstance(m, dict) else m
-        tags = variant_to_tags.get(obj.variant_id, [])
-        has_el = any(
-            getattr(t, "element_type", "") == element_type and getattr(t, "element_value", "") == element_value
-            for t in tags
-        )
-        if has_el:
-            os_set.add(obj.os)
-    return len(os_set) >= 2
+    coverage = element_os_coverage(variant_metrics, variant_to_tags=variant_to_tags)
+    return len(coverage.get(element_id(element_type, element_value))) >= 2
+
+
+# -------- 单卡建议 --------
 
 
 def next_variant_suggestions(
@@ -176,12 +329,25 @@ def next_variant_suggestions(
     - rationale: 引用 element_score + sample_size + 跨OS一致
     - expected_improvement: IPM / CPI / early_roas
     """
-    pool = _load_candidate_pool(candidate_pool_path)
     vertical = (vertical or "casual_game").lower()
+    index = candidate_index(vertical, candidate_pool_path=candidate_pool_path)
     scores = [
         ElementScore.model_validate(s) if isinstance(s, dict) else s
         for s in element_scores
     ]
+    coverage = element_os_coverage(variant_metrics, variants=variants, variant_to_tags=variant_to_tags)
+    return _suggest_for_card(scores, index, diagnosis=diagnosis, max_suggestions=max_suggestions, os_coverage=coverage)
+
+
+def _suggest_for_card(
+    scores: list[ElementScore],
+    index: CandidateIndex,
+    *,
+    diagnosis: Any = None,
+    max_suggestions: int = 3,
+    os_coverage: ElementOsCoverage | None = None,
+) -> list[VariantSuggestion]:
+    """单卡建议主体（单卡接口与批量接口共用；候选索引与 OS 覆盖由调用方预先算好）"""
 
     def _badness_score(s: ElementScore) -> float:
         return max(0, -s.avg_IPM_delta_vs_card_mean) + max(0, s.avg_CPI_delta_vs_card_mean)
@@ -190,10 +356,6 @@ def next_variant_suggestions(
         r = {"high": 2, "medium": 1, "low": 0}.get(getattr(s, "confidence_level", "low"), 0)
         return r
 
-    if variant_to_tags is None and variants:
-        variant_to_tags = {v.variant_id: decompose_variant_to_element_tags(v) for v in variants}
-    variant_to_tags = variant_to_tags or {}
-
     prescription_order: list[str] = []
     prescription_by_field: dict[str, Any] = {}
     if diagnosis and hasattr(diagnosis, "recommended_actions"):
@@ -262,7 +424,7 @@ def next_variant_suggestions(
         layer = _LAYER_MAP.get(s.element_type, "表达")
         current_val = s.element_value.split("=", 1)[-1] if s.element_type == "asset" and "=" in s.element_value else s.element_value
 
-        candidates = _get_candidates(pool, s.element_type, s.element_value, n=3, vertical=vertical)
+        candidates = _get_candidates(index, s.element_type, s.element_value, n=3)
         if len(candidates) < 2 and candidates:
             candidates = candidates * 2
         candidates = list(dict.fromkeys(candidates))[:3]
@@ -316,6 +478,74 @@ def next_variant_suggestions(
             experiment_recipe=getattr(pres, "experiment_recipe", f"OFAAT：仅改{field}") if pres else f"OFAAT：仅改{field}",
             target_os=getattr(pres, "target_os", "") if pres else "",
             sample_size=getattr(s, "sample_size", 0),
+            os_coverage=sorted(os_coverage.get(element_id(s.element_type, s.element_value))) if os_coverage else [],
         ))
 
     return suggestions
+
+
+# -------- 批量建议（整库「下一步测什么」）--------
+
+
+@dataclass
+class CardSuggestionInput:
+    """批量建议的单卡输入（字段同 next_variant_suggestions；vertical 为空时用批量默认值）"""
+
+    card_id: str
+    element_scores: list[ElementScore | dict]
+    gate_result: ExploreGateResult | dict | None = None
+    diagnosis: Any = None
+    variant_metrics: list[SimulatedMetrics | dict] | None = None
+    variants: list[Variant] | None = None
+    vertical: str | None = None
+
+
+def _suggest_chunk(
+    cards: list[CardSuggestionInput],
+    max_suggestions: int,
+    candidate_pool_path: Path | None,
+    default_vertical: str,
+) -> list[tuple[str, list[VariantSuggestion]]]:
+    """一块卡的建议（进程池 worker 也走这里）：候选索引按 vertical 只取一次"""
+    indexes: dict[str, CandidateIndex] = {}
+    out = []
+    for c in cards:
+        vertical = (c.vertical or default_vertical or "casual_game").lower()
+        index = indexes.get(vertical)
+        if index is None:
+            index = indexes[vertical] = candidate_index(vertical, candidate_pool_path=candidate_pool_path)
+        scores = [ElementScore.model_validate(s) if isinstance(s, dict) else s for s in c.element_scores]
+        coverage = element_os_coverage(c.variant_metrics, variants=c.variants)
+        out.append((c.card_id, _suggest_for_card(
+            scores, index, diagnosis=c.diagnosis, max_suggestions=max_suggestions, os_coverage=coverage,
+        )))
+    return out
+
+
+def batch_next_variant_suggestions(
+    cards: Iterable[CardSuggestionInput | Mapping[str, Any]],
+    *,
+    max_suggestions: int = 3,
+    candidate_pool_path: Path | None = None,
+    vertical: str = "casual_game",
+    workers: int = 0,
+    chunk_size: int = 256,
+) -> dict[str, list[VariantSuggestion]]:
+    """
+    整库批量生成变体建议：card_id → 与 next_variant_suggestions 逐卡调用相同的建议列表（按输入顺序）。
+
+    - 每卡 OS 覆盖一次遍历算好（element_os_coverage），候选索引按 vertical 只取一次
+    - workers > 0：按 chunk_size 张卡分块交给进程池；结果与块的完成顺序无关
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size 须 ≥ 1: {chunk_size}")
+    items = [c if isinstance(c, CardSuggestionInput) else CardSuggestionInput(**c) for c in cards]
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results: list[list[tuple[str, list[VariantSuggestion]]]]
+    if workers and workers > 0 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_suggest_chunk, ch, max_suggestions, candidate_pool_path, vertical) for ch in chunks]
+            results = [f.result() for f in futures]
+    else:
+        results = [_suggest_chunk(ch, max_suggestions, candidate_pool_path, vertical) for ch in chunks]
+    return {card_id: sugg for chunk in results for card_id, sugg in chunk}
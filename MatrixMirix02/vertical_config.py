@@ -3,17 +3,29 @@ Vertical 语料决定器：ecommerce / casual_game 两套词库，切换后内
 """
 from __future__ import annotations
 
+import hashlib
 import json
+import marshal
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Mapping
 
 try:
     from path_config import SAMPLES_DIR
 except ImportError:
     SAMPLES_DIR = Path(__file__).resolve().parent.parent / "samples"
 CONFIG_PATH = SAMPLES_DIR / "vertical_config.json"
+# 预编译缓存：marshal 序列化的解析结果，按源文件 (mtime_ns, size) 校验，冷启动免 JSON 解析
+COMPILED_PATH = SAMPLES_DIR.parent / "data" / "config_cache" / "vertical_config.marshal"
+_COMPILED_FORMAT = 2
+# 热更新：访问时最多每隔该秒数 stat 一次源文件，变化则重建快照并原子替换
+RELOAD_CHECK_INTERVAL = 1.0
 
-_config: dict[str, Any] | None = None
 _VERTICALS = ("ecommerce", "casual_game")
 
 
@@ -25,15 +37,241 @@ def _normalize_vertical(v: str) -> str:
     return "casual_game"
 
 
+# -------- 预编译缓存 --------
+
+
+def _source_stamp(path: Path) -> list[int]:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _compiled_path(path: Path) -> Path:
+    """源文件对应的预编译缓存路径（默认源用 COMPILED_PATH，其他源按路径哈希分文件，互不覆盖）"""
+    if Path(path) == CONFIG_PATH:
+        return COMPILED_PATH
+    tag = hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:8]
+    return COMPILED_PATH.with_name(f"{Path(path).stem}.{tag}.marshal")
+
+
+def _read_compiled(path: Path) -> dict[str, Any] | None:
+    """读取 path 的预编译缓存；格式 / 源文件 / 时间戳任一不符即视为失效"""
+    try:
+        with open(_compiled_path(path), "rb") as f:
+            payload = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (
+        not isinstance(payload, dict)
+        or payload.get("format") != _COMPILED_FORMAT
+        or payload.get("source") != str(path)
+        or payload.get("stamp") != _source_stamp(path)
+    ):
+        return None
+    return payload
+
+
+def _compile_payload(path: Path) -> dict[str, Any]:
+    raw = path.read_bytes()
+    payload = {
+        "format": _COMPILED_FORMAT, "source": str(path), "stamp": _source_stamp(path),
+        "digest": hashlib.sha1(raw).hexdigest()[:12], "config": json.loads(raw.decode("utf-8")),
+    }
+    target = _compiled_path(path)
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            marshal.dump(payload, f)
+        os.replace(tmp, target)
+    except OSError:
+        pass
+    return payload
+
+
+def compile_vertical_config(path: Path = CONFIG_PATH) -> dict[str, Any]:
+    """解析 JSON 并写入 marshal 预编译缓存（部署构建步骤可预先执行；写失败不影响返回）"""
+    return _compile_payload(path)["config"]
+
+
+# -------- 编译快照 --------
+
+
+def _freeze(obj: Any) -> Any:
+    """dict → 只读 MappingProxy，list → tuple（递归）"""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(x) for x in obj)
+    return obj
+
+
+def _label(item: Any) -> str:
+    if isinstance(item, dict):
+        return str(item.get("label", item.get("key", "")))
+    return str(item)
+
+
+@dataclass(frozen=True)
+class VerticalSnapshot:
+    """单个 vertical 的只读编译配置：热路径直接读字段，不再逐次遍历 / 复制嵌套 dict"""
+
+    vertical: str
+    version: str
+    corpus: Mapping[str, Any]
+    metric_weights: Mapping[str, Any]
+    score_weights: Mapping[str, float]
+    use_refund_risk: bool
+    early_roas_as_proxy: bool
+    why_now_strong_stimulus_penalty: float
+    why_now_strong_triggers: tuple[str, ...]
+    why_now_strong_trigger_set: frozenset[str]
+    pool_labels: Mapping[str, tuple[str, ...]]
+    asset_var: Mapping[str, tuple[str, ...]]
+    why_now_pool: tuple[Any, ...]
+    why_you_phrase_list: tuple[str, ...]
+    sell_point_options: tuple[str, ...]
+
+
+def _compile_snapshot(cfg: dict[str, Any], v: str, version: str) -> VerticalSnapshot:
+    corpus = dict(cfg.get("corpus", {}).get(v, {}))
+
+    def pool(key: str) -> Any:
+        val = corpus.get(key)
+        return val if isinstance(val, (list, dict)) else []
+
+    w = dict(cfg.get("metric_weights", {}).get(v, {"ipm": 0.4, "cpi": 0.35, "early_roas": 0.25, "ctr": 0.0}))
+    if "ctr" not in w:
+        w["ctr"] = w.get("ipm", 0.4) * 0.5
+    score_w = dict(w)
+    for k, d in (("ipm", 0.4), ("cpi", 0.35), ("early_roas", 0.25), ("ctr", 0.0)):
+        score_w.setdefault(k, d)
+    rules = cfg.get("risk_rules", {}).get(v, {})
+    triggers = tuple(rules.get("why_now_strong_triggers", []))
+
+    phrases = corpus.get("why_you_phrases") or {}
+    why_you: list[str] = []
+    if isinstance(phrases, dict):
+        for val in phrases.values():
+            if isinstance(val, list):
+                why_you.extend(x for x in val if isinstance(x, str))
+    if not why_you:
+        why_you = list(pool("why_you_bucket")) or ["省钱", "体验更好", "更省时间"]
+    sell = pool("sell_point")
+    asset = pool("asset_var")
+
+    return VerticalSnapshot(
+        vertical=v,
+        version=version,
+        corpus=_freeze(corpus),
+        metric_weights=MappingProxyType(w),
+        score_weights=MappingProxyType(score_w),
+        use_refund_risk=bool(w.get("use_refund_risk", False)),
+        early_roas_as_proxy=bool(w.get("early_roas_as_proxy", True)),
+        why_now_strong_stimulus_penalty=float(rules.get("why_now_strong_stimulus_penalty", 3.0)),
+        why_now_strong_triggers=triggers,
+        why_now_strong_trigger_set=frozenset(triggers),
+        pool_labels=MappingProxyType({k: tuple(_label(x) for x in val) for k, val in corpus.items() if isinstance(val, list)}),
+        asset_var=MappingProxyType({k: tuple(val) for k, val in asset.items() if isinstance(val, list)} if isinstance(asset, dict) else {}),
+        why_now_pool=tuple(pool("why_now_trigger")),
+        why_you_phrase_list=tuple(why_you),
+        sell_point_options=tuple(x for x in sell if isinstance(x, str)) if isinstance(sell, list) else (),
+    )
+
+
+class KeywordBucketMatcher:
+    """
+    关键词 → 桶 规则（motivation_bucket_rules，按顺序即优先级）编译成单个正则：
+    每条规则一个 (?=.*?(kw1|kw2…))() 分支，从头 match 时首个成立的分支即最高优先级规则。
+    """
+
+    __slots__ = ("_pattern", "_buckets")
+
+    def __init__(self, rules: list[dict[str, Any]]) -> None:
+        branches: list[str] = []
+        buckets: list[str] = []
+        for rule in rules or []:
+            bucket = str(rule.get("bucket") or "").strip()
+            keywords = [k for k in rule.get("keywords", []) if isinstance(k, str) and k]
+            if not bucket or not keywords:
+                continue
+            alt = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+            branches.append(f"(?=.*?(?:{alt}))()")
+            buckets.append(bucket)
+        self._buckets = tuple(buckets)
+        self._pattern = re.compile("|".join(branches), re.DOTALL) if branches else None
+
+    def classify(self, text: str) -> str | None:
+        """返回命中的最高优先级桶；无命中返回 None"""
+        if self._pattern is None or not text:
+            return None
+        m = self._pattern.match(text)
+        return self._buckets[m.lastindex - 1] if m and m.lastindex else None
+
+
+@dataclass(frozen=True)
+class _ConfigState:
+    config: dict[str, Any]
+    stamp: list[int] | None
+    version: str
+    snapshots: Mapping[str, VerticalSnapshot]
+    mb_matcher: KeywordBucketMatcher
+
+
+_state: _ConfigState | None = None
+_state_lock = threading.Lock()
+_last_check = 0.0
+
+
+def _build_state(stamp: list[int] | None) -> _ConfigState:
+    if stamp is None:
+        config, version = {}, "empty"
+    else:
+        payload = _read_compiled(CONFIG_PATH) or _compile_payload(CONFIG_PATH)
+        config, version = payload["config"], payload["digest"]
+    snapshots = {v: _compile_snapshot(config, v, version) for v in _VERTICALS}
+    return _ConfigState(
+        config=config, stamp=stamp, version=version, snapshots=MappingProxyType(snapshots),
+        mb_matcher=KeywordBucketMatcher(config.get("motivation_bucket_rules") or []),
+    )
+
+
+def _current_state(*, force: bool = False) -> _ConfigState:
+    """当前配置状态；源文件变化时重建并整体替换（读者只会看到旧或新快照，不会看到半成品）"""
+    global _state, _last_check
+    state = _state
+    now = time.monotonic()
+    if state is not None and not force and now - _last_check < RELOAD_CHECK_INTERVAL:
+        return state
+    with _state_lock:
+        stamp = _source_stamp(CONFIG_PATH) if CONFIG_PATH.exists() else None
+        if force or _state is None or _state.stamp != stamp:
+            _state = _build_state(stamp)
+        _last_check = now
+        return _state
+
+
+def reload_vertical_config() -> str:
+    """强制重新加载配置，返回新的 config_version"""
+    return _current_state(force=True).version
+
+
+def config_version() -> str:
+    """配置版本（源文件内容摘要），跨进程稳定，可作缓存键的一部分"""
+    return _current_state().version
+
+
+def get_snapshot(vertical: str) -> VerticalSnapshot:
+    """该 vertical 的只读编译快照（热路径用）"""
+    return _current_state().snapshots[_normalize_vertical(vertical)]
+
+
+def get_motivation_bucket_matcher() -> KeywordBucketMatcher:
+    """场景+动机富描述 → 动机桶 的编译匹配器（随配置热更新替换）"""
+    return _current_state().mb_matcher
+
+
 def load_vertical_config() -> dict[str, Any]:
-    global _config
-    if _config is None:
-        if CONFIG_PATH.exists():
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                _config = json.load(f)
-        else:
-            _config = {}
-    return _config
+    return _current_state().config
 
 
 def get_corpus(vertical: str) -> dict[str, Any]:
@@ -108,73 +346,45 @@ def get_why_you_examples(vertical: str) -> dict[str, list[str]]:
 
 def get_why_now_pool(vertical: str) -> list[str]:
     """获取 Why now 触发器候选池"""
-    return list(get_pool(vertical, "why_now_trigger") or [])
+    return list(get_snapshot(vertical).why_now_pool)
 
 
 def get_metric_weights(vertical: str, os: str = "") -> dict[str, float]:
     """获取指标权重"""
-    cfg = load_vertical_config()
-    weights = cfg.get("metric_weights", {})
-    v = _normalize_vertical(vertical)
-    w = dict(weights.get(v, {"ipm": 0.4, "cpi": 0.35, "early_roas": 0.25, "ctr": 0.0}))
-    if "ctr" not in w:
-        w["ctr"] = w.get("ipm", 0.4) * 0.5
-    return w
+    return dict(get_snapshot(vertical).metric_weights)
 
 
 def get_why_now_strong_stimulus_penalty(vertical: str) -> float:
     """why_now 强刺激风险扣分"""
-    cfg = load_vertical_config()
-    rules = cfg.get("risk_rules", {})
-    v = _normalize_vertical(vertical)
-    r = rules.get(v, {})
-    return float(r.get("why_now_strong_stimulus_penalty", 3.0))
+    return get_snapshot(vertical).why_now_strong_stimulus_penalty
 
 
 def get_why_now_strong_triggers(vertical: str) -> list[str]:
     """why_now 强刺激触发器列表"""
-    cfg = load_vertical_config()
-    rules = cfg.get("risk_rules", {})
-    v = _normalize_vertical(vertical)
-    r = rules.get(v, {})
-    return list(r.get("why_now_strong_triggers", []))
+    return list(get_snapshot(vertical).why_now_strong_triggers)
 
 
 def get_why_you_phrase_list(vertical: str = "casual_game") -> list[str]:
     """给 variant_suggestions 用的 why_you 短语列表"""
-    c = get_corpus(vertical) or {}
-    phrases = c.get("why_you_phrases") or {}
-    if isinstance(phrases, dict):
-        out = []
-        for v in phrases.values() if phrases else []:
-            if isinstance(v, list):
-                out.extend(x for x in v if isinstance(x, str))
-        if out:
-            return out
-    return list(get_pool(vertical, "why_you_bucket") or []) or ["省钱", "体验更好", "更省时间"]
+    return list(get_snapshot(vertical).why_you_phrase_list)
 
 
 def get_sell_point_options(vertical: str = "casual_game") -> list[str]:
     """给 variant_suggestions 用的 sell_point 列表"""
-    v = get_pool(vertical, "sell_point")
-    if isinstance(v, list):
-        return [x for x in v if isinstance(x, str)]
-    return []
+    return list(get_snapshot(vertical).sell_point_options)
 
 
 def use_refund_risk(vertical: str) -> bool:
     """是否使用退款风险字段（ecommerce）"""
-    cfg = load_vertical_config()
-    weights = cfg.get("metric_weights", {})
-    v = _normalize_vertical(vertical)
-    w = weights.get(v, {})
-    return bool(w.get("use_refund_risk", False))
+    return get_snapshot(vertical).use_refund_risk
 
 
 def early_roas_as_proxy(vertical: str) -> bool:
     """early_roas 是否作为 proxy"""
-    cfg = load_vertical_config()
-    weights = cfg.get("metric_weights", {})
-    v = _normalize_vertical(vertical)
-    w = weights.get(v, {})
-    return bool(w.get("early_roas_as_proxy", True))
+    return get_snapshot(vertical).early_roas_as_proxy
+
+
+if __name__ == "__main__":
+    # 构建镜像时预编译：python vertical_config.py
+    compile_vertical_config()
+    print(f"compiled {CONFIG_PATH} -> {COMPILED_PATH}")
@@ -4,9 +4,11 @@
 """
 from __future__ import annotations
 
+import importlib
 import inspect
 import json
 import sys
+import time
 import traceback
 from collections import defaultdict
 from pathlib import Path
@@ -27,43 +29,55 @@ if _nested_path and _nested_path not in sys.path:
     sys.path.append(_nested_path)
 
 # ========================= 1) 导入 =========================
+# 冷启动只加载轻量模块（schema / 词库）；流水线模块在首次使用时经 _lazy_import 加载并计时，
+# Health / 复盘检索页不触发流水线导入。
+_SCRIPT_T0 = time.perf_counter()
+
+
+@st.cache_resource
+def _import_profile() -> dict:
+    """进程级导入耗时记录（脚本每次 rerun 都会重新执行，需跨 rerun 保留）"""
+    return {"imports": {}, "startup_ms": None}
+
+
+def _lazy_import(module: str):
+    """按需导入并记录首次导入耗时（ms），供 Health 页展示"""
+    mod = sys.modules.get(module)
+    if mod is None:
+        t0 = time.perf_counter()
+        mod = importlib.import_module(module)
+        _import_profile()["imports"].setdefault(module, (time.perf_counter() - t0) * 1000)
+    return mod
+
+
 try:
-    from element_scores import ElementScore, compute_element_scores
+    _t0 = time.perf_counter()
     from eval_schemas import StrategyCard, Variant
-    from eval_set_generator import CardEvalRecord, generate_eval_set
-    from explore_gate import evaluate_explore_gate
-    from ofaat_generator import generate_ofaat_variants
-    from scoring_eval import compute_card_score, compute_variant_score
-    from simulate_metrics import SimulatedMetrics, simulate_metrics
-    from vertical_config import (
-        get_corpus,
-        get_why_now_pool,
-        get_why_now_strong_stimulus_penalty,
-        get_why_now_strong_triggers,
-        get_why_you_examples,
-    )
-    from validate_gate import WindowMetrics, evaluate_validate_gate
-    from variant_suggestions import next_variant_suggestions
-    from decision_summary import compute_decision_summary
+    from vertical_config import get_corpus
+    _import_profile()["imports"].setdefault("eval_schemas + vertical_config", (time.perf_counter() - _t0) * 1000)
 
     try:
         from ui.styles import get_global_styles
     except Exception:
         get_global_styles = lambda: _FALLBACK_STYLES
-
-    _RESOLVED_PATHS = {}
-    for k in ("element_scores", "eval_schemas", "decision_summary", "variant_suggestions"):
-        if k in sys.modules and hasattr(sys.modules[k], "__file__") and sys.modules[k].__file__:
-            _RESOLVED_PATHS[k] = sys.modules[k].__file__
-    if "ui.styles" in sys.modules and hasattr(sys.modules["ui.styles"], "__file__"):
-        _RESOLVED_PATHS["ui.styles"] = sys.modules["ui.styles"].__file__ or "(built-in)"
-    else:
-        _RESOLVED_PATHS["ui.styles"] = "(fallback _FALLBACK_STYLES)"
 except Exception as e:
     st.error(f"导入失败: {e}")
     st.code(traceback.format_exc(), language="text")
     st.stop()
 
+
+def _resolved_paths() -> dict[str, str]:
+    """已加载模块的实际路径（根目录 / MatrixMirix02 二选一）；未加载的标注按需"""
+    paths = {}
+    for k in ("element_scores", "eval_schemas", "decision_summary", "variant_suggestions"):
+        mod = sys.modules.get(k)
+        paths[k] = (getattr(mod, "__file__", None) or "(built-in)") if mod is not None else "(未加载，按需导入)"
+    if "ui.styles" in sys.modules and hasattr(sys.modules["ui.styles"], "__file__"):
+        paths["ui.styles"] = sys.modules["ui.styles"].__file__ or "(built-in)"
+    else:
+        paths["ui.styles"] = "(fallback _FALLBACK_STYLES)"
+    return paths
+
 try:
     from path_config import SAMPLES_DIR
 except ImportError:
@@ -177,6 +191,17 @@ def build_experiment_package(suggestion, platforms=None, suggested_n=None, scale
     return pkg
 
 
+def _package_context(data: dict) -> dict:
+    """实验包附带的卡片上下文（后台 worker 据此复现同一张卡的门禁 / 诊断口径）"""
+    card = data.get("card")
+    ctx = {"vertical": data.get("vertical") or getattr(card, "vertical", "") or "casual_game"}
+    if card is not None:
+        ctx["card"] = card.model_dump() if hasattr(card, "model_dump") else dict(card)
+        ctx["motivation_bucket"] = getattr(card, "motivation_bucket", "") or ""
+    ctx["element_mode"] = st.session_state.get(f"{K}element_mode", "raw")
+    return ctx
+
+
 def _queue_item_to_export_row(item: dict) -> dict:
     alts = item.get("candidate_alternatives", [])
     return {
@@ -235,13 +260,8 @@ def _safe_load_strategy_card(raw: dict, source: str = "") -> tuple[StrategyCard,
         return fallback, {"source": source, "missing": [err.get("loc", ()) for err in e.errors()], "msg": str(e), "fallback": True}
 
 
-@st.cache_data(ttl=120)
-def _load_mock_data_cached(vertical: str, motivation_bucket: str, variants_json: str | None) -> dict:
-    """仅当 variants_json 为 None（从文件加载）时缓存；generated 不缓存"""
-    return _load_mock_data_impl(vertical, motivation_bucket, variants_json)
-
-
-def _load_mock_data_impl(vertical: str, motivation_bucket: str, variants_json: str | None) -> dict:
+def _load_mock_data_impl(vertical: str, motivation_bucket: str, variants: list | None) -> dict:
+    """加载卡片与变体后交给决策 DAG；改一个变体只重算受其影响的阶段"""
     vert = (vertical or "casual_game").lower()
     if vert not in ("ecommerce", "casual_game"):
         vert = "casual_game"
@@ -254,7 +274,7 @@ def _load_mock_data_impl(vertical: str, motivation_bucket: str, variants_json: s
 
     use_fallback = not card_path.exists() or not variant_path.exists()
     if use_fallback:
-        records = generate_eval_set(n_cards=1, variants_per_card=12)
+        records = _lazy_import("eval_set_generator").generate_eval_set(n_cards=1, variants_per_card=12)
         if records:
             return _build_from_record(records[0], vert, motivation_bucket)
         raise ValueError("fallback generate_eval_set 失败")
@@ -277,8 +297,8 @@ def _load_mock_data_impl(vertical: str, motivation_bucket: str, variants_json: s
         except Exception:
             card = card.model_copy(update=upd)
 
-    if variants_json:
-        variants = [Variant.model_validate(v) for v in json.loads(variants_json)]
+    if variants:
+        variants = [v if isinstance(v, Variant) else Variant.model_validate(v.model_dump() if hasattr(v, "model_dump") else v) for v in variants]
         variants = [v.model_copy(update={"parent_card_id": card.card_id}) if v.parent_card_id != card.card_id else v for v in variants]
     else:
         with open(variant_path, "r", encoding="utf-8") as f:
@@ -294,71 +314,39 @@ def _load_mock_data_impl(vertical: str, motivation_bucket: str, variants_json: s
             raise ValueError(f"无有效变体: {variant_path}")
 
     mb = motivation_bucket or getattr(card, "motivation_bucket", "") or ("帐篷·雨季将至·防雨耐用" if vert == "ecommerce" else "消消乐·通勤碎片·连击爽感")
-    metrics = []
-    metrics.append(simulate_metrics(variants[0], "iOS", baseline=True, motivation_bucket=mb, vertical=vert))
-    metrics.append(simulate_metrics(variants[0], "Android", baseline=True, motivation_bucket=mb, vertical=vert))
-    for v in variants[1:]:
-        metrics.append(simulate_metrics(v, "iOS", baseline=False, motivation_bucket=mb, vertical=vert))
-        metrics.append(simulate_metrics(v, "Android", baseline=False, motivation_bucket=mb, vertical=vert))
-
-    baseline_list = [m for m in metrics if m.baseline]
-    variant_list = [m for m in metrics if not m.baseline]
-    obj = (card.objective or "").strip() or ("purchase" if vert == "ecommerce" else "install")
-    ctx_base = {"country": "CN", "objective": obj, "segment": card.segment, "motivation_bucket": mb}
-    explore_ios = evaluate_explore_gate(variant_list, baseline_list, context={**ctx_base, "os": "iOS"})
-    explore_android = evaluate_explore_gate(variant_list, baseline_list, context={**ctx_base, "os": "Android"})
-    element_scores = compute_element_scores(variant_metrics=metrics, variants=variants)
-
+    WindowMetrics = _lazy_import("validate_gate").WindowMetrics
     windowed = [
         WindowMetrics(window_id="window_1", impressions=50000, clicks=800, installs=2000, spend=6000, early_events=1200, early_revenue=480, ipm=40.0, cpi=3.0, early_roas=0.08),
         WindowMetrics(window_id="window_2", impressions=55000, clicks=880, installs=2090, spend=6270, early_events=1250, early_revenue=500, ipm=38.0, cpi=3.0, early_roas=0.08),
     ]
     light_exp = WindowMetrics(window_id="expand_segment", impressions=20000, clicks=288, installs=720, spend=2160, early_events=430, early_revenue=172, ipm=36.0, cpi=3.0, early_roas=0.08)
-    validate_result = evaluate_validate_gate(windowed, light_exp)
+    from vertical_config import config_version
+    return _run_decision_dag(
+        card=card, variants=variants, motivation_bucket=mb, vertical=vert, windows=(windowed, light_exp),
+        config_version=config_version(), element_mode=st.session_state.get(f"{K}element_mode", "raw"),
+    )
 
-    from diagnosis import diagnose
-    from eval_schemas import decompose_variant_to_element_tags
-    diagnosis_result = diagnose(explore_ios=explore_ios, explore_android=explore_android, validate_result=validate_result, metrics=metrics)
-    variant_to_tags = {v.variant_id: decompose_variant_to_element_tags(v) for v in variants}
-    _kwargs = dict(element_scores=element_scores, gate_result=explore_android, max_suggestions=3, variant_metrics=metrics, variant_to_tags=variant_to_tags, variants=variants, vertical=vert)
-    if "diagnosis" in inspect.signature(next_variant_suggestions).parameters:
-        _kwargs["diagnosis"] = diagnosis_result
-    suggestions = next_variant_suggestions(**_kwargs)
 
-    variant_scores_by_row = {}
-    for m in metrics:
-        cohort = [x for x in metrics if x.os == m.os]
-        variant_scores_by_row[(m.variant_id, m.os)] = compute_variant_score(m, cohort, os=m.os, vertical=vert)
-    by_vid = defaultdict(list)
-    for (vid, _), s in variant_scores_by_row.items():
-        by_vid[vid].append(s)
-    variant_scores_agg = {vid: sum(s) / len(s) for vid, s in by_vid.items()}
-    eligible_all = list(dict.fromkeys((explore_ios.eligible_variants or []) + (explore_android.eligible_variants or [])))
-    stab_penalty = 5.0 if validate_result.validate_status == "FAIL" else 0.0
-    why_now_penalty = 0.0
-    strong_triggers = get_why_now_strong_triggers(vert)
-    wn_trigger = getattr(card, "why_now_trigger", "") or ""
-    if wn_trigger in strong_triggers:
-        why_now_penalty = get_why_now_strong_stimulus_penalty(vert)
-    elif any(("why now" in n.lower() or "虚高" in n or "强刺激" in n) for n in validate_result.risk_notes):
-        why_now_penalty = get_why_now_strong_stimulus_penalty(vert) * 0.5
-    card_score_result = compute_card_score(eligible_variants=eligible_all, variant_scores=variant_scores_agg, top_k=5, stability_penalty=stab_penalty, why_now_strong_stimulus_penalty=why_now_penalty)
-    return {"card": card, "vertical": vert, "variants": variants, "metrics": metrics, "explore_ios": explore_ios, "explore_android": explore_android, "element_scores": element_scores, "suggestions": suggestions, "validate_result": validate_result, "variant_scores_by_row": variant_scores_by_row, "card_score_result": card_score_result, "diagnosis": diagnosis_result}
+def _run_decision_dag(**inputs) -> dict:
+    """session 级 DAG：只重跑输入变化的下游节点（节点内部再走 pipeline_cache 跨会话缓存）"""
+    dag = st.session_state.get(f"{K}dag")
+    if dag is None:
+        dag = _lazy_import("pipeline_dag").build_decision_dag()
+        st.session_state[f"{K}dag"] = dag
+    dag.set_inputs(**inputs)
+    return dag.run()
 
 
 def _build_from_record(rec, vert: str, motivation_bucket: str) -> dict:
     card, variants = rec.card, rec.variants
     mb = motivation_bucket or card.motivation_bucket or ("帐篷·雨季将至·防雨耐用" if vert == "ecommerce" else "消消乐·通勤碎片·连击爽感")
-    metrics = []
-    metrics.append(simulate_metrics(variants[0], "iOS", baseline=True, motivation_bucket=mb, vertical=vert))
-    metrics.append(simulate_metrics(variants[0], "Android", baseline=True, motivation_bucket=mb, vertical=vert))
-    for v in variants[1:]:
-        metrics.append(simulate_metrics(v, "iOS", baseline=False, motivation_bucket=mb, vertical=vert))
-        metrics.append(simulate_metrics(v, "Android", baseline=False, motivation_bucket=mb, vertical=vert))
-    element_scores = compute_element_scores(variant_metrics=metrics, variants=variants)
-    from diagnosis import diagnose
     from eval_schemas import decompose_variant_to_element_tags
-    diag = diagnose(explore_ios=rec.explore_ios, explore_android=rec.explore_android, validate_result=rec.validate_result, metrics=metrics)
+    from pipeline_cache import cached_card_metrics, cached_diagnose, cached_element_scores
+    from scoring_eval import compute_card_score, compute_variant_score
+    from variant_suggestions import next_variant_suggestions
+    metrics = cached_card_metrics(variants, motivation_bucket=mb, vertical=vert)
+    element_scores = cached_element_scores(metrics, variants, mode=st.session_state.get(f"{K}element_mode", "raw"), vertical=vert)
+    diag = cached_diagnose(explore_ios=rec.explore_ios, explore_android=rec.explore_android, validate_result=rec.validate_result, metrics=metrics)
     _kwargs = dict(element_scores=element_scores, gate_result=rec.explore_android, max_suggestions=3, variant_metrics=metrics, variant_to_tags={v.variant_id: decompose_variant_to_element_tags(v) for v in variants}, variants=variants, vertical=vert)
     if "diagnosis" in inspect.signature(next_variant_suggestions).parameters:
         _kwargs["diagnosis"] = diag
@@ -379,13 +367,8 @@ def _build_from_record(rec, vert: str, motivation_bucket: str) -> dict:
 def load_mock_data(variants=None, vertical_override=None, motivation_bucket_override=None):
     vert = (vertical_override or "casual_game").lower()
     mb = motivation_bucket_override or "成就感"
-    variants_json = None
-    if variants:
-        variants_json = json.dumps([v.model_dump() if hasattr(v, "model_dump") else (v.dict() if hasattr(v, "dict") else {}) for v in variants], ensure_ascii=False)
     try:
-        if variants_json is None:
-            return _load_mock_data_cached(vert, mb, None)
-        return _load_mock_data_impl(vert, mb, variants_json)
+        return _load_mock_data_impl(vert, mb, list(variants) if variants else None)
     except Exception as e:
         st.session_state[f"{K}load_error"] = str(e)
         st.session_state[f"{K}load_trace"] = traceback.format_exc()
@@ -397,12 +380,23 @@ def _render_health_page():
     rows = [("Python", f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"), ("Streamlit", st.__version__)]
     for name in ["pydantic", "element_scores", "eval_schemas", "decision_summary", "diagnosis"]:
         try:
-            __import__(name)
+            _lazy_import(name)
             rows.append((f"import {name}", "✓"))
         except Exception as e:
             rows.append((f"import {name}", f"✗ {str(e)[:60]}"))
+    dag = st.session_state.get(f"{K}dag")
+    if dag is not None:
+        st.markdown("**决策 DAG 节点耗时**")
+        st.dataframe(dag.timings(), hide_index=True)
+    if "pipeline_cache" in sys.modules:
+        for stage, s in sys.modules["pipeline_cache"].cache_stats().items():
+            rows.append((f"cache {stage}", f"size={s['size']} hits={s['hits']} disk_hits={s['disk_hits']} misses={s['misses']}"))
     for k, v in rows:
         st.write(f"**{k}**: {v}")
+    profile = _import_profile()
+    st.markdown("**导入耗时（进程内首次加载，ms）**")
+    st.dataframe([{"module": k, "ms": round(v, 1)} for k, v in sorted(profile["imports"].items(), key=lambda kv: -kv[1])], hide_index=True)
+    st.caption(f"冷启动首屏脚本耗时：{profile['startup_ms']:.0f} ms" if profile["startup_ms"] is not None else "冷启动耗时未记录")
     st.success("健康检查完成")
 
 
@@ -454,7 +448,11 @@ def _render_decision_summary_card(summary: dict):
     diag_line = f'<div class="summary-row"><b>诊断：</b>failure_type: {failure_type} | primary_signal: {primary_signal}</div>' if failure_type or primary_signal else ""
     act_strs = [f"{a.get('action','')}({a.get('change_field','')})" if isinstance(a, dict) else f"{getattr(a,'action','')}({getattr(a,'change_field','')})" for a in actions[:3] if a]
     actions_line = f'<div class="summary-row"><b>处方：</b>{"; ".join(act_strs)}</div>' if act_strs else ""
-    html = f"""<div class="decision-summary-hero {status_class}"><div class="summary-label">📌 决策结论 Summary</div><div class="summary-status">{status_text}</div><div class="summary-row"><b>原因：</b>{reason}</div><div class="summary-row"><b>风险：</b>{risk}</div><div class="summary-row"><b>下一步：</b>{next_step}</div>{diag_line}{actions_line}</div>"""
+    fc = summary.get("forecast") or {}
+    forecast_line = ""
+    if fc and (fc.get("additional_spend") or fc.get("windows_needed") or fc.get("hopeless_variants")):
+        forecast_line = f'<div class="summary-row"><b>决策预测：</b>追加 ${fc.get("additional_spend", 0):,.0f} · 还需 {fc.get("windows_needed", 0)} 个窗口 · 预计 {fc.get("expected_date") or "预算内无法下结论"}（停投候选 {len(fc.get("hopeless_variants") or [])} 个）</div>'
+    html = f"""<div class="decision-summary-hero {status_class}"><div class="summary-label">📌 决策结论 Summary</div><div class="summary-status">{status_text}</div><div class="summary-row"><b>原因：</b>{reason}</div><div class="summary-row"><b>风险：</b>{risk}</div><div class="summary-row"><b>下一步：</b>{next_step}</div>{diag_line}{actions_line}{forecast_line}</div>"""
     st.markdown(html, unsafe_allow_html=True)
     bc = st.columns([1, 1, 1, 5])
     with bc[0]:
@@ -469,11 +467,66 @@ def _render_decision_summary_card(summary: dict):
     st.divider()
 
 
+def _job_queue():
+    """进程级 SQLite 任务队列 + worker 池（首次访问时启动；rerun / 刷新页面复用，进程重启后未完成任务重新排队）"""
+    return _lazy_import("experiment_jobs").get_worker_pool().queue
+
+
+JOB_STATUS_LABELS = {"queued": "⏳ 排队", "running": "⚙️ 执行中", "done": "✅ 完成", "failed": "❌ 失败", "cancelled": "⏹ 已取消"}
+
+
+def _render_job_status():
+    """后台任务状态（只读 SQLite，不阻塞脚本线程）"""
+    jq = _job_queue()
+    counts = jq.counts()
+    st.caption(" · ".join(f"{JOB_STATUS_LABELS[k]} {v}" for k, v in counts.items() if v) or "暂无后台任务")
+    for job in jq.list_jobs(limit=8):
+        st.caption(f"{JOB_STATUS_LABELS.get(job.status, job.status)} {job.label}" + (f"（{job.stage}）" if job.status == "running" and job.stage else ""))
+        if job.status in ("queued", "running"):
+            if st.button("取消", key=f"{K}job_cancel_{job.job_id}"):
+                jq.cancel(job.job_id)
+                st.rerun()
+        elif job.status == "done" and job.result:
+            r = job.result
+            gates = " / ".join(f"{os_name}:{g.get('gate_status', '-')}" for os_name, g in (r.get("explore") or {}).items())
+            diag = (r.get("diagnosis") or {}).get("failure_type", "")
+            st.caption(f"　{r.get('n_variants', 0)} 个变体 | Explore {gates} | Validate {r.get('validate_status') or '-'} | 诊断 {diag or '-'} | {r.get('elapsed_ms', 0):.0f} ms")
+        elif job.status == "failed":
+            st.caption(f"　{(job.error or '').splitlines()[0][:80] if job.error else ''}")
+            if st.button("重试", key=f"{K}job_retry_{job.job_id}"):
+                jq.retry(job.job_id)
+                st.rerun()
+    c1, c2 = st.columns(2)
+    with c1:
+        if st.button("刷新", key=f"{K}job_refresh"):
+            st.rerun()
+    with c2:
+        if st.button("清理已结束", key=f"{K}job_purge"):
+            jq.purge()
+            st.rerun()
+
+
+def _render_job_section():
+    """有未结束任务且 Streamlit 支持 fragment 时每 2 秒局部刷新，否则手动刷新"""
+    st.markdown("**■ 后台任务**")
+    try:
+        active = any(_job_queue().counts()[k] for k in ("queued", "running"))
+    except Exception as e:
+        st.caption(f"任务队列不可用: {e}")
+        return
+    fragment = getattr(st, "fragment", None)
+    if active and fragment is not None:
+        fragment(run_every="2s")(_render_job_status)()
+    else:
+        _render_job_status()
+
+
 def _render_experiment_queue_sidebar():
     q = st.session_state.get(f"{K}experiment_queue", [])
     st.markdown("**■ 实验队列**")
     if not q:
         st.caption("暂无实验，从「变体建议」或「元素贡献」加入")
+        _render_job_section()
         return
     for idx, item in enumerate(q):
         field = item.get("changed_field", "-")
@@ -483,6 +536,11 @@ def _render_experiment_queue_sidebar():
         if st.button("移除", key=f"{K}q_rm_{idx}"):
             st.session_state[f"{K}experiment_queue"] = [x for i, x in enumerate(q) if i != idx]
             st.rerun()
+    if st.button("▶ 后台执行", key=f"{K}q_submit", type="primary", help="提交到本地任务队列，由后台 worker 跑 OFAAT 生成 / 模拟 / 门禁 / 诊断；刷新页面不丢失"):
+        _job_queue().enqueue_many(q)
+        st.session_state[f"{K}experiment_queue"] = []
+        st.toast(f"已提交 {len(q)} 个实验")
+        st.rerun()
     if st.button("清空队列", key=f"{K}q_clear"):
         st.session_state[f"{K}experiment_queue"] = []
         st.rerun()
@@ -490,6 +548,8 @@ def _render_experiment_queue_sidebar():
     st.caption("导出")
     st.download_button("⬇ JSON", data=export_queue_json(q), file_name="experiment_queue.json", mime="application/json", key=f"{K}dl_json")
     st.download_button("⬇ CSV", data=export_queue_csv(q), file_name="experiment_queue.csv", mime="text/csv", key=f"{K}dl_csv")
+    st.divider()
+    _render_job_section()
 
 
 def _multiselect_safe(label: str, options: list[str], key: str, default_all: bool = True):
@@ -515,6 +575,45 @@ def _multiselect_safe(label: str, options: list[str], key: str, default_all: boo
         return st.multiselect(label, options=options, key=wk, placeholder="选 1 项以上…")
 
 
+def _safe_snapshot_name(name: str) -> str:
+    """快照名只保留文件名部分：去掉路径分隔符与 ".."，避免写出快照目录"""
+    cleaned = name.replace("/", "_").replace("\\", "_").replace("..", "_").strip().strip(".")
+    return cleaned or "eval_set"
+
+
+def _render_eval_snapshot_controls():
+    """评测集快照：保存当前评测集 / 加载已有快照（按需构建记录，大评测集免重新模拟）"""
+    try:
+        snap = _lazy_import("evalset_snapshot")
+    except ImportError:
+        return
+    with st.expander("💾 评测集快照"):
+        col_save, col_load = st.columns(2)
+        with col_save:
+            records = st.session_state.get(f"{K}eval_records", [])
+            name = st.text_input("快照名", value=f"eval_set_{len(records)}", key=f"{K}snapshot_name")
+            if st.button("保存当前评测集", key=f"{K}snapshot_save", disabled=not records):
+                path = snap.DEFAULT_SNAPSHOT_DIR / f"{_safe_snapshot_name(name)}{snap.SNAPSHOT_SUFFIX}"
+                try:
+                    snap.save_eval_set(records, path)
+                    st.success(f"已保存 {len(records)} 张卡 → {path.name}（{path.stat().st_size / 1024:.0f} KB）")
+                except (OSError, ValueError) as e:
+                    st.error(f"保存失败：{e}")
+        with col_load:
+            paths = snap.list_snapshots()
+            chosen = st.selectbox("已有快照", paths, format_func=lambda p: p.name, key=f"{K}snapshot_pick") if paths else None
+            if st.button("加载快照", key=f"{K}snapshot_load", disabled=chosen is None):
+                try:
+                    # 加载时一次性构建为完整记录：懒快照 / 紧凑记录每次访问 .card / .variants 都重新校验，
+                    # 评测集各 tab 每行要读好几次这些属性
+                    with snap.load_eval_set(chosen) as loaded:
+                        st.session_state[f"{K}eval_records"] = loaded.to_list()
+                    st.session_state.pop(f"{K}eval_error", None)
+                    st.rerun()
+                except (OSError, ValueError) as e:
+                    st.error(f"加载失败：{e}")
+
+
 def render_eval_set_view():
     st.session_state.setdefault(f"{K}evalset_size", 50)
     col_n, col_btn, _ = st.columns([1, 1, 4])
@@ -524,7 +623,7 @@ def render_eval_set_view():
         if st.button("生成 / 重新生成评测集", type="primary", key=f"{K}eval_gen"):
             try:
                 with st.spinner("生成评测集中..."):
-                    records = generate_eval_set(n_cards=int(st.session_state.get(f"{K}evalset_size", 50)), variants_per_card=12)
+                    records = _lazy_import("eval_set_generator").generate_eval_set(n_cards=int(st.session_state.get(f"{K}evalset_size", 50)), variants_per_card=12)
                     st.session_state[f"{K}eval_records"] = records
                     st.session_state.pop(f"{K}eval_error", None)
                 st.rerun()
@@ -550,6 +649,7 @@ def render_eval_set_view():
                     st.rerun()
         except ImportError:
             pass
+    _render_eval_snapshot_controls()
 
     records = st.session_state.get(f"{K}eval_records", [])
     if st.session_state.get(f"{K}eval_error"):
@@ -672,6 +772,12 @@ def _render_element_scores_section(data: dict):
         key = f"{K}elem_{et_key}_{idx}"
         with st.expander(f"{s.element_value[:36]}{'…' if len(s.element_value) > 36 else ''} | 倾向:{tendency} | IPMΔ:{ipm_d} CPIΔ:{cpi_d} | {sample_lbl}"):
             st.caption(f"维度: {dim}")
+            if getattr(s, "ipm_delta_ci", None) and getattr(s, "cpi_delta_ci", None):
+                method_lbl = {"eb": "EB 可信区间", "bootstrap": f"Bootstrap 区间（{s.interval_samples or 0} 次）"}.get(s.interval_method or "", s.interval_method or "区间")
+                st.caption(
+                    f"{method_lbl} · IPMΔ {s.avg_IPM_delta_vs_card_mean:+.2f} [{s.ipm_delta_ci[0]:+.2f}, {s.ipm_delta_ci[1]:+.2f}]"
+                    f" · CPIΔ {s.avg_CPI_delta_vs_card_mean:+.3f} [{s.cpi_delta_ci[0]:+.3f}, {s.cpi_delta_ci[1]:+.3f}]"
+                )
             btn_col = st.columns(2)
             with btn_col[0]:
                 if st.button("复制 Prompt", key=f"{key}_copy"):
@@ -680,7 +786,7 @@ def _render_element_scores_section(data: dict):
             with btn_col[1]:
                 if st.button("加入实验队列", key=f"{key}_queue"):
                     q = st.session_state.get(f"{K}experiment_queue", [])
-                    q.append({"changed_field": et_key, "current_value": s.element_value, "candidate_alternatives": []})
+                    q.append({"changed_field": et_key, "current_value": s.element_value, "candidate_alternatives": [], **_package_context(data)})
                     st.session_state[f"{K}experiment_queue"] = q
                     st.toast("已加入")
                     st.rerun()
@@ -720,6 +826,7 @@ def _render_suggestions_section(data: dict):
                 with bc2:
                     if st.button("加入实验队列", key=f"{K}sug_queue_{i}"):
                         pkg = build_experiment_package(s, diagnosis=data.get("diagnosis"))
+                        pkg.update(_package_context(data))
                         q = st.session_state.get(f"{K}experiment_queue", [])
                         q.append(pkg)
                         st.session_state[f"{K}experiment_queue"] = q
@@ -789,10 +896,15 @@ def main():
         section = st.radio("section", ["sec-0", "sec-1", "sec-2", "sec-3", "sec-4", "sec-5"], format_func=lambda x: {"sec-0": "0 决策结论", "sec-1": "1 结构卡片", "sec-2": "2 实验对照表", "sec-3": "3 门禁状态", "sec-4": "4 元素贡献", "sec-5": "5 变体建议"}.get(x, x), key=f"{K}section", label_visibility="collapsed")
         st.divider()
         _render_experiment_queue_sidebar()
+        st.selectbox(
+            "元素分估计", ["raw", "eb", "bootstrap", "ridge"], key=f"{K}element_mode",
+            format_func=lambda x: {"raw": "原始均值差", "eb": "EB 收缩（历史先验）", "bootstrap": "Bootstrap 区间", "ridge": "岭回归（元素+OS）"}.get(x, x),
+            help="EB：按同 vertical 历史实验收缩小样本元素的 Δ，并给出 95% 可信区间；Bootstrap：按变体重抽样给出 95% 区间；岭回归：多元素同时变化时分开归因，并剔除 OS 差异",
+        )
         st.checkbox("Debug", key=f"{K}debug")
         if st.session_state.get(f"{K}debug"):
             with st.expander("模块路径"):
-                for k, v in _RESOLVED_PATHS.items():
+                for k, v in _resolved_paths().items():
                     st.caption(f"{k}: {v}")
             with st.expander("数据规模"):
                 st.caption(f"evalset_size: {st.session_state.get(f'{K}evalset_size', 50)}")
@@ -834,15 +946,20 @@ def main():
             with r1[1]: sells = _multiselect_safe("卖点", sell_opts, f"sell_{vertical_choice}")
             with r1[2]: ctas = _multiselect_safe("CTA", cta_opts, f"cta_{vertical_choice}")
             with r1[3]: st.selectbox("场景+动机", mb_opts, key=f"{K}filter_mb")
-        r2 = st.columns([1, 0.3, 1.8])
+        r2 = st.columns([1, 1, 0.3, 1.8])
         with r2[0]:
             st.number_input("N", min_value=1, max_value=24, step=1, key=f"{K}n_gen", help="生成变体数量")
         with r2[1]:
+            st.selectbox(
+                "设计", ["OFAAT", "D-optimal", "部分因子"], key=f"{K}design_method",
+                help="OFAAT：每次只改一个元素；D-optimal / 部分因子：多元素同时变化，用更少变体估全部主效应",
+            )
+        with r2[2]:
             if st.session_state.get(f"{K}use_generated") and st.button("恢复示例", type="secondary"):
                 st.session_state[f"{K}use_generated"] = False
                 st.session_state[f"{K}generated_variants"] = None
                 st.rerun()
-        with r2[2]:
+        with r2[3]:
             if st.button("生成并评测", type="primary"):
                 if not hooks or not sells or not ctas:
                     st.error("请至少各选 1 项 hook、卖点、CTA")
@@ -858,7 +975,13 @@ def main():
                     card, _ = _safe_load_strategy_card(raw, str(card_path))
                     asset_pool = corp.get("asset_var") or {}
                     n_gen = st.session_state.get(f"{K}n_gen", 12)
-                    vs = generate_ofaat_variants(card.card_id, hooks, sell_points_for_gen, ctas, n=n_gen, asset_pool=asset_pool)
+                    gen = _lazy_import("ofaat_generator")
+                    design = st.session_state.get(f"{K}design_method", "OFAAT")
+                    if design == "OFAAT":
+                        vs = gen.generate_ofaat_variants(card.card_id, hooks, sell_points_for_gen, ctas, n=n_gen, asset_pool=asset_pool)
+                    else:
+                        method = "d_optimal" if design == "D-optimal" else "fractional"
+                        vs = gen.generate_design_variants(card.card_id, hooks, sell_points_for_gen, ctas, n=n_gen, asset_pool=asset_pool, method=method)
                     st.session_state[f"{K}generated_variants"] = vs
                     st.session_state[f"{K}use_generated"] = True
                     st.success(f"已生成 {len(vs)} 个变体")
@@ -880,7 +1003,7 @@ def main():
     vert = data.get("vertical", getattr(card, "vertical", "casual_game") or "casual_game")
 
     st.markdown('<span id="sec-0"></span>', unsafe_allow_html=True)
-    summary = compute_decision_summary(data)
+    summary = data.get("summary") or _lazy_import("decision_summary").compute_decision_summary(data)
     _render_decision_summary_card(summary)
 
     st.markdown('<span id="sec-1"></span>', unsafe_allow_html=True)
@@ -929,6 +1052,8 @@ def main():
 if __name__ == "__main__":
     try:
         main()
+        if _import_profile()["startup_ms"] is None:
+            _import_profile()["startup_ms"] = (time.perf_counter() - _SCRIPT_T0) * 1000
     except Exception as e:
         st.error(f"运行错误: {e}")
         with st.expander("错误详情"):
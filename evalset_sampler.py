@@ -1,11 +1,15 @@
 """
 评测集设计：分层抽样 + 抗噪 baseline。
 评测集 = 结构卡片集合，可迁移、抗噪、跨国家/人群/渠道可对比。
+mode="collapsed" 时稀疏层逐级并入上一级（strata_alloc），合成卡封顶；卡库稀疏时可能少于 N（见 shortfall）。
+配置比例预编译为 Walker/Vose 别名表（单维 + 联合层），加权抽样 O(1)；draw_synthetic_cards 批量合成压测卡。
 """
 from __future__ import annotations
 
+import gc
 import hashlib
 import json
+import math
 import random
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -29,11 +33,137 @@ def _load_config() -> dict:
     return {}
 
 
+try:
+    from rng_streams import seeded as _stream_seeded
+except ImportError:
+    _stream_seeded = None
+
+
 def _seeded(seed: str) -> random.Random:
+    if _stream_seeded is not None:
+        return _stream_seeded(seed)
     h = hashlib.sha256(seed.encode()).hexdigest()
     return random.Random(int(h[:16], 16) % (2**32))
 
 
+# -------- 别名表（Walker / Vose）：按配置比例 O(1) 加权抽样 --------
+
+
+class AliasTable:
+    """Vose 别名法：O(n) 预处理，每次抽样一次均匀数 + 一次比较"""
+
+    __slots__ = ("values", "prob", "alias")
+
+    def __init__(self, weights: dict[Any, float] | list[tuple[Any, float]]) -> None:
+        items = list(weights.items()) if isinstance(weights, dict) else list(weights)
+        items = [(v, float(w)) for v, w in items if w > 0]
+        if not items:
+            raise ValueError("别名表至少需要一个正权重")
+        n = len(items)
+        total = sum(w for _, w in items)
+        self.values = [v for v, _ in items]
+        scaled = [w * n / total for _, w in items]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, x in enumerate(scaled) if x < 1.0]
+        large = [i for i, x in enumerate(scaled) if x >= 1.0]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # 剩余（浮点误差）概率记 1
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def draw(self, rng: random.Random) -> Any:
+        i = int(rng.random() * len(self.values))
+        return self.values[i if rng.random() < self.prob[i] else self.alias[i]]
+
+    def draw_many(self, rng: random.Random, k: int) -> list:
+        n, values, prob, alias, rand = len(self.values), self.values, self.prob, self.alias, rng.random
+        out = []
+        for _ in range(k):
+            i = int(rand() * n)
+            out.append(values[i if rand() < prob[i] else alias[i]])
+        return out
+
+
+@dataclass
+class _EvalsetDims:
+    """配置解析后的分层维度与比例"""
+
+    vertical: dict[str, float]
+    channel: dict[str, float]
+    country: list[str]
+    os: dict[str, float]
+    segment: dict[str, float]
+    mb_ecom: list[str]
+    mb_game: list[str]
+    fallback: dict[str, str]
+
+    def mb_for(self, vertical: str) -> list[str]:
+        return self.mb_ecom if vertical == "ecommerce" else self.mb_game
+
+
+def _config_dims(cfg: dict) -> _EvalsetDims:
+    mb_cfg = cfg.get("motivation_bucket", {})
+    return _EvalsetDims(
+        vertical=cfg.get("vertical", {"ecommerce": 0.7, "casual_game": 0.3}),
+        channel=cfg.get("channel", {"Meta": 0.45, "TikTok": 0.35, "Google": 0.2}),
+        country=cfg.get("country", ["US", "JP", "KR", "TH", "VN", "BR"]),
+        os=cfg.get("os", {"Android": 0.6, "iOS": 0.4}),
+        segment=cfg.get("segment", {"new": 0.6, "returning": 0.25, "retargeting": 0.15}),
+        mb_ecom=mb_cfg.get("ecommerce", ["deal_discount", "compare", "gift", "pain_relief", "social_proof"]),
+        mb_game=mb_cfg.get("game", ["boredom", "competition", "collection", "reward"]),
+        fallback=cfg.get("fallback", {"country": "US", "segment": "new", "motivation_bucket": "deal_discount"}),
+    )
+
+
+@dataclass
+class EvalsetAliasTables:
+    """单维别名表 + 联合层 (vertical, channel, country, segment, os) 别名表；mb 按 vertical 均匀"""
+
+    segment: AliasTable
+    os: AliasTable
+    mb: dict[str, AliasTable]
+    joint: AliasTable
+
+
+_ALIAS_CACHE: dict[str, EvalsetAliasTables] = {}
+
+
+def alias_tables(cfg: dict | None = None) -> EvalsetAliasTables:
+    """按配置内容缓存的别名表（配置不变只建一次）"""
+    cfg = _load_config() if cfg is None else cfg
+    ck = json.dumps(cfg, sort_keys=True, ensure_ascii=False)
+    tables = _ALIAS_CACHE.get(ck)
+    if tables is not None:
+        return tables
+    d = _config_dims(cfg)
+    seg = d.segment or {"new": 1.0}
+    os_w = d.os or {"Android": 1.0}
+    countries = d.country or ["US"]
+    joint = [
+        ((v, ch, c, s, o), wv * wch * ws * wo / len(countries))
+        for v, wv in d.vertical.items()
+        for ch, wch in d.channel.items()
+        for c in countries
+        for s, ws in seg.items()
+        for o, wo in os_w.items()
+    ]
+    tables = EvalsetAliasTables(
+        segment=AliasTable(seg),
+        os=AliasTable(os_w),
+        mb={v: AliasTable({m: 1.0 for m in (d.mb_for(v) or ["deal_discount"])}) for v in d.vertical},
+        joint=AliasTable(joint),
+    )
+    _ALIAS_CACHE[ck] = tables
+    return tables
+
+
 @dataclass
 class StructureEvaluationSet:
     """评测集：一组 StrategyCard + 每层 baseline"""
@@ -41,6 +171,8 @@ class StructureEvaluationSet:
     cards: list = field(default_factory=list)
     baseline_by_stratum: dict[str, Any] = field(default_factory=dict)
     stratum_keys: list[str] = field(default_factory=list)
+    # 实际张数比目标少的数量（collapsed 模式下卡库稀疏且合成卡已达上限时 > 0）
+    shortfall: int = 0
 
 
 def _stratum_key(v: str, ch: str, c: str, s: str, o: str, mb: str) -> str:
@@ -85,6 +217,111 @@ def _make_card(
     )
 
 
+def _pool_key(c: Any) -> tuple[str, str, str, str, str, str]:
+    """卡库卡片 → 分层键（缺省值与 fallback 一致）"""
+    ch = getattr(c, "channel", "") or getattr(c, "source_channel", "") or ""
+    mb = getattr(c, "motivation_bucket", "") or ""
+    mb_en = next((k for k, vv in _MB_MAP.items() if vv == mb), "deal_discount")
+    return (
+        getattr(c, "vertical", "") or "",
+        ch or "Meta",
+        getattr(c, "country", "") or "US",
+        getattr(c, "segment", "") or "new",
+        getattr(c, "os", "") or "all",
+        mb_en,
+    )
+
+
+def _take(items: list, k: int, rng: random.Random) -> list:
+    """部分 Fisher–Yates：原地把随机 k 个换到前面"""
+    n = len(items)
+    for i in range(min(k, n)):
+        j = rng.randrange(i, n)
+        items[i], items[j] = items[j], items[i]
+    return items[:k]
+
+
+def _sample_collapsed(
+    N: int,
+    *,
+    dims: tuple[list[str], ...],
+    mb_by_vertical: dict[str, list[str]],
+    card_pool: list,
+    min_stratum_size: int,
+    max_synthetic: int,
+    rng: random.Random,
+) -> StructureEvaluationSet:
+    """
+    稀疏层合并版：只枚举卡库中出现的层 + 每个 vertical×channel 的覆盖层，
+    卡数 < min_stratum_size 的层按 mb → os → segment → country 逐级上卷，层数 ≤ N。
+    卡库 + 合成卡上限仍凑不满 N 时不再补，缺口记入 shortfall。
+    """
+    from strata_alloc import WILDCARD, allocate_capped, collapse_strata
+
+    allowed = [set(d) for d in dims[:5]]
+    pool: dict[tuple[str, ...], list] = {}
+    seen: set = set()
+    for c in card_pool:
+        cid = getattr(c, "card_id", id(c))
+        if cid in seen:
+            continue
+        seen.add(cid)
+        key = _pool_key(c)
+        # os=all 的卡双端通用，不按 os 过滤
+        if all(k in a for k, a in zip(key[:4], allowed)) and (key[4] == "all" or key[4] in allowed[4]):
+            pool.setdefault(key, []).append(c)
+    counts = {k: len(v) for k, v in pool.items()}
+    for v in dims[0]:
+        for ch in dims[1]:
+            if not any(k[0] == v and k[1] == ch for k in counts):
+                counts[(v, ch) + (WILDCARD,) * 4] = 0
+    key_of = collapse_strata(counts, min_size=min_stratum_size, max_strata=N, keep_levels=2)
+    groups: dict[tuple[str, ...], list] = {}
+    for leaf, g in key_of.items():
+        groups.setdefault(g, []).extend(pool.get(leaf, ()))
+
+    keys = sorted(groups)
+    sizes = [len(groups[k]) for k in keys]
+    synth = [0] * len(keys)
+    budget = max_synthetic
+    for i, sz in enumerate(sizes):
+        if sz == 0 and budget > 0 and sum(synth) < N:
+            synth[i] = 1
+            budget -= 1
+    pool_target = N - sum(synth)
+    n_populated = sum(1 for sz in sizes if sz)
+    quotas = allocate_capped(pool_target, sizes, [float(sz) for sz in sizes], min_per=1 if pool_target >= n_populated else 0)
+    shortfall = min(budget, N - sum(quotas) - sum(synth))
+    if shortfall > 0:
+        extra = allocate_capped(shortfall, [shortfall] * len(keys), [float(max(sz, 1)) for sz in sizes])
+        synth = [a + b for a, b in zip(synth, extra)]
+
+    cards: list = []
+    baseline_by_stratum: dict[str, Any] = {}
+    quota_keys: list[str] = []
+    idx = 0
+    for key, q, n_syn in zip(keys, quotas, synth):
+        if q + n_syn <= 0:
+            continue
+        chosen = _take(groups[key], q, rng) if q else []
+        for _ in range(n_syn):
+            idx += 1
+            v, ch, c, s, o, mb = [rng.choice(vals) if x == WILDCARD else x for x, vals in zip(key[:5], dims)] + [key[5]]
+            if mb == WILDCARD:
+                mb = rng.choice(mb_by_vertical.get(v) or ["deal_discount"])
+            chosen.append(_make_card(f"sc_{v[:3]}_{idx:04d}", v, ch, c, s, o, mb, rng))
+        skey = _stratum_key(*key)
+        cards.extend(chosen)
+        baseline_by_stratum[skey] = chosen[0]
+        quota_keys.append(skey)
+    return StructureEvaluationSet(
+        cards=cards,
+        baseline_by_stratum=baseline_by_stratum,
+        stratum_keys=quota_keys,
+        shortfall=max(0, N - len(cards)),
+    )
+
+
 def sample_structure_evalset(
     N: int = 80,
     *,
@@ -92,36 +329,53 @@ def sample_structure_evalset(
     card_pool: list | None = None,
     use_card_library: bool = True,
     seed: str = "evalset",
+    mode: str = "uniform",
+    min_stratum_size: int = 5,
+    max_synthetic: int | None = None,
 ) -> StructureEvaluationSet:
     """
     分层抽样生成评测集。
     每层至少 1 张；不足则回退到 country=US / segment=new / motivation_bucket=deal_discount。
     每个分层单元指定 baseline。
+    mode="collapsed"：不再把 N 抬到层数，稀疏层合并、合成卡至多 max_synthetic 张（默认 N 的 10%）；
+    卡库稀疏时张数可能不足 N，缺口见返回值 shortfall。
     """
+    if mode not in ("uniform", "collapsed"):
+        raise ValueError(f"未知 mode: {mode}")
     cfg = _load_config() if config_path is None else json.loads((config_path if isinstance(config_path, Path) else Path(config_path)).read_text(encoding="utf-8"))
     rng = _seeded(seed)
 
-    vert_ratio = cfg.get("vertical", {"ecommerce": 0.7, "casual_game": 0.3})
-    ch_ratio = cfg.get("channel", {"Meta": 0.45, "TikTok": 0.35, "Google": 0.2})
-    countries = cfg.get("country", ["US", "JP", "KR", "TH", "VN", "BR"])
-    os_ratio = cfg.get("os", {"Android": 0.6, "iOS": 0.4})
-    seg_ratio = cfg.get("segment", {"new": 0.6, "returning": 0.25, "retargeting": 0.15})
-    mb_cfg = cfg.get("motivation_bucket", {})
-    mb_ecom = mb_cfg.get("ecommerce", ["deal_discount", "compare", "gift", "pain_relief", "social_proof"])
-    mb_game = mb_cfg.get("game", ["boredom", "competition", "collection", "reward"])
-    fallback = cfg.get("fallback", {"country": "US", "segment": "new", "motivation_bucket": "deal_discount"})
+    dims = _config_dims(cfg)
+    vert_ratio, ch_ratio, countries = dims.vertical, dims.channel, dims.country
+    os_ratio, seg_ratio = dims.os, dims.segment
+    mb_ecom, mb_game = dims.mb_ecom, dims.mb_game
+
+    if mode == "collapsed":
+        if card_pool is None and use_card_library:
+            try:
+                from card_library import load_cards
+                card_pool = load_cards()
+            except Exception:
+                card_pool = []
+        return _sample_collapsed(
+            N,
+            dims=(list(vert_ratio), list(ch_ratio), list(countries), list(seg_ratio), list(os_ratio)),
+            mb_by_vertical={"ecommerce": mb_ecom, "casual_game": mb_game},
+            card_pool=card_pool or [],
+            min_stratum_size=min_stratum_size,
+            max_synthetic=math.ceil(0.1 * N) if max_synthetic is None else max_synthetic,
+            rng=rng,
+        )
 
     # 构建分层单元：vertical × channel × country（约 2×3×6=36 层，可生成 50–100 张）
+    # segment / os / mb 按配置比例从别名表抽取（O(1)）
+    tables = alias_tables(cfg)
     strata: list[tuple[str, str, str, str, str, str]] = []
-    seg_list = list(seg_ratio.keys())
-    os_list = list(os_ratio.keys())
     for v in vert_ratio:
+        mb_table = tables.mb[v]
         for ch in ch_ratio:
             for c in countries:
-                s = rng.choice(seg_list) if seg_list else "new"
-                o = rng.choices(os_list, weights=[os_ratio.get(x, 0.5) for x in os_list], k=1)[0] if os_list else "Android"
-                mb = rng.choice(mb_ecom) if v == "ecommerce" else rng.choice(mb_game)
-                strata.append((v, ch, c, s, o, mb))
+                strata.append((v, ch, c, tables.segment.draw(rng), tables.os.draw(rng), mb_table.draw(rng)))
     n_strata = len(strata)
     if N < n_strata:
         N = n_strata
@@ -163,19 +417,16 @@ def sample_structure_evalset(
     for (v, ch, c, s, o, mb) in strata:
         key = _stratum_key(v, ch, c, s, o, mb)
         q = quota.get(key, 1)
-        pool = pool_by_key.get(key, [])
-
-        for _ in range(q):
-            if pool:
-                cand = [x for x in pool if getattr(x, "card_id", id(x)) not in used]
-                if cand:
-                    chosen = rng.choice(cand)
-                    used.add(getattr(chosen, "card_id", id(chosen)))
-                    cards.append(chosen)
-                    if key not in baseline_by_stratum:
-                        baseline_by_stratum[key] = chosen
-                    continue
+        pool = [x for x in pool_by_key.get(key, []) if getattr(x, "card_id", id(x)) not in used]
+        # 每层一次部分洗牌取 q 张，不足部分再合成
+        taken = _take(pool, q, rng)
+        for chosen in taken:
+            used.add(getattr(chosen, "card_id", id(chosen)))
+        cards.extend(taken)
+        if taken and key not in baseline_by_stratum:
+            baseline_by_stratum[key] = taken[0]
 
+        for _ in range(q - len(taken)):
             idx += 1
             cid = f"sc_{v[:3]}_{idx:04d}"
             synth = _make_card(cid, v, ch, c, s, o, mb, rng)
@@ -184,3 +435,77 @@ def sample_structure_evalset(
                 baseline_by_stratum[key] = synth
 
     return StructureEvaluationSet(cards=cards, baseline_by_stratum=baseline_by_stratum, stratum_keys=list(quota.keys()))
+
+
+# -------- 批量合成（压测）--------
+
+
+_WHY_NOW_BUCKETS = ("限时稀缺", "节点事件", "机会出现", "其他")
+_WHY_YOU_BUCKETS = (("price_advantage", "更省钱"), ("need_based", "更省事"), ("experience_upgrade", "更好体验"), ("other", "其他"))
+
+
+def draw_synthetic_cards(
+    n: int,
+    *,
+    config_path: Path | None = None,
+    seed: str = "evalset_batch",
+    validate: bool = False,
+    id_prefix: str = "syn",
+) -> list:
+    """
+    按配置比例批量合成 n 张卡（压测下游流水线用）：联合层一次别名抽样 + mb 别名抽样，每张 O(1)。
+    validate=False 时从已校验原型卡浅拷贝（字段已是规范形态），几十万张秒级；
+    eval_schemas 不可用时返回 dict。
+    """
+    cfg = _load_config() if config_path is None else json.loads(Path(config_path).read_text(encoding="utf-8"))
+    tables = alias_tables(cfg)
+    rng = _seeded(seed)
+    try:
+        from eval_schemas import StrategyCard
+    except ImportError:
+        StrategyCard = None
+    # 不校验时从一张已校验的原型卡浅拷贝 + 覆盖字段（比 model_construct 逐字段取默认值快数倍），
+    # default_factory 字段（列表等）每张卡重新生成，避免共享可变对象
+    build = None
+    factories: list = []
+    if StrategyCard is not None:
+        if validate:
+            build = StrategyCard
+        else:
+            proto = StrategyCard(card_id=f"{id_prefix}_proto")
+            factories = [(name, f.default_factory) for name, f in StrategyCard.model_fields.items() if f.default_factory is not None]
+
+            def build(**fields: Any) -> Any:
+                return proto.model_copy(update=fields)
+    rand = rng.random
+    strata = tables.joint.draw_many(rng, n)
+    out: list = []
+    # 批量创建大量容器对象时暂停分代 GC（否则每代阈值都会扫描整个新列表）
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i, (v, ch, c, s, o) in enumerate(strata):
+            wy_key, wy_label = _WHY_YOU_BUCKETS[int(rand() * 4)]
+            fields = {
+                "card_id": f"{id_prefix}_{i:07d}",
+                "vertical": v,
+                "country": c,
+                "os": o,
+                "objective": "purchase" if v == "ecommerce" else "install",
+                "segment": s,
+                "motivation_bucket": _MB_MAP.get(tables.mb[v].draw(rng), "其他"),
+                "why_you_key": wy_key,
+                "why_you_label": wy_label,
+                "why_now_trigger": _WHY_NOW_BUCKETS[int(rand() * 4)],
+            }
+            if build is None:
+                fields["channel"] = ch
+                out.append(fields)
+                continue
+            for name, factory in factories:
+                fields[name] = factory()
+            out.append(build(**fields))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return out
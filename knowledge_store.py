@@ -102,6 +102,15 @@ def init_schema(conn: sqlite3.Connection | None = None) -> None:
             created_at TEXT
         )
     """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS variant_elements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exp_id TEXT,
+            variant_id TEXT,
+            element_type TEXT,
+            element_value TEXT
+        )
+    """)
     c.execute("""
         CREATE TABLE IF NOT EXISTS decisions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -114,7 +123,7 @@ def init_schema(conn: sqlite3.Connection | None = None) -> None:
         )
     """)
 
-    for t in ("variant_metrics", "diagnosis", "element_scores", "decisions"):
+    for t in ("variant_metrics", "variant_elements", "diagnosis", "element_scores", "decisions"):
         c.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_exp_id ON {t}(exp_id)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_experiments_vertical ON experiments(vertical)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_experiments_channel ON experiments(channel)")
@@ -137,6 +146,27 @@ def _next_exp_id() -> str:
         conn.close()
 
 
+def _variant_element_rows(exp_id: str, variants: list[Any]) -> list[tuple]:
+    """变体 → (exp_id, variant_id, element_type, element_value) 行（与 compute_element_scores 同口径拆解）"""
+    try:
+        from eval_schemas import decompose_variant_to_element_tags
+    except ImportError:
+        return []
+    rows = []
+    for v in variants or []:
+        try:
+            tags = decompose_variant_to_element_tags(v)
+        except Exception:
+            continue
+        seen = set()
+        for t in tags:
+            key = (t.element_type, t.element_value)
+            if key not in seen:
+                seen.add(key)
+                rows.append((exp_id, getattr(v, "variant_id", ""), t.element_type, t.element_value))
+    return rows
+
+
 def write_experiment(
     card: Any,
     variants: list[Any],
@@ -202,6 +232,9 @@ def write_experiment(
                 getattr(obj, "ipm", 0), getattr(obj, "cpi", 0), getattr(obj, "ctr", 0), getattr(obj, "early_roas", 0),
                 now,
             ))
+        c.executemany("""
+            INSERT INTO variant_elements (exp_id, variant_id, element_type, element_value) VALUES (?,?,?,?)
+        """, _variant_element_rows(exp_id, variants))
 
         if diagnosis:
             diag = diagnosis
@@ -227,11 +260,15 @@ def write_experiment(
             obj = s if hasattr(s, "element_type") else type("S", (), s)()
             ipm_d = getattr(obj, "avg_IPM_delta_vs_card_mean", 0) or getattr(obj, "avg_ipm_delta", 0)
             cpi_d = getattr(obj, "avg_CPI_delta_vs_card_mean", 0) or getattr(obj, "avg_cpi_delta", 0)
-            c.execute("""
-                INSERT INTO element_scores (exp_id, element_type, element_value, metric, delta, confidence, cross_os, created_at)
-                VALUES (?,?,?,?,?,?,?,?)
-            """, (exp_id, getattr(obj, "element_type", ""), getattr(obj, "element_value", ""),
-                  "IPM", ipm_d, getattr(obj, "confidence_level", ""), getattr(obj, "cross_os_consistency", ""), now))
+            # 原始均值差入库（EB 收缩后的后验值不回写，避免先验自我强化）
+            raw_ipm = getattr(obj, "avg_IPM_delta_raw", None)
+            raw_cpi = getattr(obj, "avg_CPI_delta_raw", None)
+            for metric, delta in (("IPM", ipm_d if raw_ipm is None else raw_ipm), ("CPI", cpi_d if raw_cpi is None else raw_cpi)):
+                c.execute("""
+                    INSERT INTO element_scores (exp_id, element_type, element_value, metric, delta, confidence, cross_os, created_at)
+                    VALUES (?,?,?,?,?,?,?,?)
+                """, (exp_id, getattr(obj, "element_type", ""), getattr(obj, "element_value", ""),
+                      metric, delta, getattr(obj, "confidence_level", ""), getattr(obj, "cross_os_consistency", ""), now))
 
         d = decision_summary or {}
         risk = d.get("risk", "")
@@ -337,3 +374,83 @@ def query_review(
         }
     finally:
         conn.close()
+
+
+def load_element_priors(vertical: str | None = None, *, min_value_experiments: int = 2) -> dict[str, dict]:
+    """
+    元素分经验贝叶斯先验：同 vertical 历史实验的元素 Δ 分布（SQL 聚合，一次查询）。
+
+    返回：
+    - by_type: {(element_type, metric): {"mean", "var", "n"}}，metric 为 IPM / CPI
+    - by_value: {(element_type, element_value, metric): {"mean", "n"}}，仅保留 ≥ min_value_experiments 次实验出现的取值
+    历史 Δ 含各卡抽样噪声，var 偏大（收缩偏保守）。
+    """
+    init_schema()
+    conn = _get_conn()
+    try:
+        c = conn.cursor()
+        where_sql, params = ("e.vertical=?", [vertical]) if vertical else ("1=1", [])
+        c.execute(f"""
+            SELECT es.element_type, es.metric, COUNT(*) AS n, AVG(es.delta) AS m, AVG(es.delta * es.delta) AS m2
+            FROM element_scores es
+            JOIN experiments e ON es.exp_id=e.exp_id
+            WHERE {where_sql} AND es.delta IS NOT NULL
+            GROUP BY es.element_type, es.metric
+        """, params)
+        by_type = {}
+        for row in c.fetchall():
+            n, m, m2 = row["n"], row["m"] or 0.0, row["m2"] or 0.0
+            var = max(0.0, m2 - m * m) * n / (n - 1) if n > 1 else 0.0
+            by_type[(row["element_type"], (row["metric"] or "IPM").upper())] = {"mean": m, "var": var, "n": n}
+        c.execute(f"""
+            SELECT es.element_type, es.element_value, es.metric, COUNT(DISTINCT es.exp_id) AS n, AVG(es.delta) AS m
+            FROM element_scores es
+            JOIN experiments e ON es.exp_id=e.exp_id
+            WHERE {where_sql} AND es.delta IS NOT NULL
+            GROUP BY es.element_type, es.element_value, es.metric
+            HAVING n >= ?
+        """, params + [min_value_experiments])
+        by_value = {
+            (row["element_type"], row["element_value"], (row["metric"] or "IPM").upper()): {"mean": row["m"] or 0.0, "n": row["n"]}
+            for row in c.fetchall()
+        }
+        return {"by_type": by_type, "by_value": by_value}
+    finally:
+        conn.close()
+
+
+def load_element_rows(vertical: str | None = None, *, limit_experiments: int | None = None) -> list[dict[str, Any]]:
+    """
+    元素回归用的行级数据：每个 (实验, 变体, OS) 一行，附该变体的元素列表。
+    返回 [{"exp_id", "variant_id", "os", "ipm", "cpi", "elements": [(element_type, element_value), ...]}]；
+    未记录 variant_elements 的旧实验跳过。
+    """
+    init_schema()
+    conn = _get_conn()
+    try:
+        c = conn.cursor()
+        where_sql, params = ("e.vertical=?", [vertical]) if vertical else ("1=1", [])
+        exp_sql = f"SELECT e.exp_id FROM experiments e WHERE {where_sql} ORDER BY e.created_at DESC"
+        if limit_experiments:
+            exp_sql += f" LIMIT {int(limit_experiments)}"
+        c.execute(f"""
+            SELECT ve.exp_id, ve.variant_id, ve.element_type, ve.element_value
+            FROM variant_elements ve
+            WHERE ve.exp_id IN ({exp_sql})
+        """, params)
+        elements: dict[tuple[str, str], list[tuple[str, str]]] = {}
+        for row in c.fetchall():
+            elements.setdefault((row["exp_id"], row["variant_id"]), []).append((row["element_type"], row["element_value"]))
+        c.execute(f"""
+            SELECT vm.exp_id, vm.variant_id, vm.os, vm.ipm, vm.cpi
+            FROM variant_metrics vm
+            WHERE vm.exp_id IN ({exp_sql})
+        """, params)
+        return [
+            {"exp_id": row["exp_id"], "variant_id": row["variant_id"], "os": row["os"], "ipm": row["ipm"] or 0.0,
+             "cpi": row["cpi"] or 0.0, "elements": elements[(row["exp_id"], row["variant_id"])]}
+            for row in c.fetchall()
+            if (row["exp_id"], row["variant_id"]) in elements
+        ]
+    finally:
+        conn.close()